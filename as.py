@@ -1,9 +1,20 @@
 import yfinance as yf
 import pandas as pd
-import matplotlib.pyplot as plt
 from fpdf import FPDF
 from datetime import date
 
+import build_cache
+import pdf_compact
+import rl_charts
+import market_analytics
+import indicators
+import correlation
+import report_export
+import run_trace
+
+# Stage timings and counters for this run (see run_trace.py)
+run_trace.start("weekly_market_report")
+
 # --- 1️⃣ Define assets ---
 stocks = ["AAPL", "MSFT", "TSLA", "NVDA", "AMZN", "GOOG"]
 futures = ["GC=F", "CL=F", "ES=F", "NQ=F"]   # Gold, Oil, S&P 500, Nasdaq
@@ -11,44 +22,48 @@ cryptos = ["BTC-USD", "ETH-USD"]
 
 all_assets = stocks + futures + cryptos
 
-# --- 2️⃣ Download weekly data safely ---
-data = yf.download(all_assets, period="7d", interval="1d", group_by='ticker')
-
-# --- 3️⃣ Extract Adjusted Close safely ---
-adj_close = pd.DataFrame()
-for ticker in all_assets:
-    try:
-        # Some tickers (like crypto) might have only 'Close', not 'Adj Close'
-        if 'Adj Close' in data[ticker]:
-            adj_close[ticker] = data[ticker]['Adj Close']
-        else:
-            adj_close[ticker] = data[ticker]['Close']
-    except KeyError:
-        print(f"Warning: Could not find data for {ticker}")
-
-# --- 4️⃣ Drop any columns that are completely NaN ---
-adj_close = adj_close.dropna(axis=1, how='all')
-
-# --- 5️⃣ Calculate weekly performance ---
-performance = (adj_close.iloc[-1] - adj_close.iloc[0]) / adj_close.iloc[0] * 100
-performance = performance.sort_values(ascending=False)
+# --- 2️⃣ Download a year of daily data (weekly figures plus 1M/3M/YTD and risk) ---
+data = run_trace.fetch(f"daily bars ({len(all_assets)} assets)", yf.download, all_assets,
+                      period="1y", interval="1d", group_by='ticker')
+
+# --- 3️⃣ Price matrix: Adj Close where available (crypto has only Close), in one pass ---
+with run_trace.span("parse", "price matrix"):
+    adj_close = market_analytics.price_matrix(data, all_assets)
+for ticker in sorted(set(all_assets) - set(adj_close.columns)):
+    print(f"Warning: Could not find data for {ticker}")
+
+# --- 4️⃣ Align 24/7 crypto with exchange trading days ---
+with run_trace.span("transform", "align calendar"):
+    adj_close = market_analytics.align_calendar(adj_close, "exchange")
+
+# --- 5️⃣ Returns and risk for every asset (see market_analytics.py) ---
+with run_trace.span("transform", "returns and risk", rows=adj_close.size):
+    risk = market_analytics.analytics(adj_close)
+    performance = risk["1W"].sort_values(ascending=False)
+
+# --- 5️⃣b Technical indicators on raw OHLC, resumed from the saved state (see indicators.py) ---
+with run_trace.span("transform", "technicals"):
+    ohlc = {field: market_analytics.price_matrix(data, adj_close.columns, field, adjusted=False)
+            .reindex(adj_close.index) for field in ("Close", "High", "Low")}
+    technicals = indicators.technicals(ohlc["Close"], ohlc["High"], ohlc["Low"],
+                                       state_path=".asset_indicators.npz")
+    technicals.insert(0, "Close", ohlc["Close"].ffill().iloc[-1])
+
+# --- 5️⃣c Cross-asset co-movement: shrunk correlation of daily returns, clustered (see correlation.py) ---
+with run_trace.span("transform", "correlation"):
+    corr = correlation.clustered(correlation.correlation(correlation.log_returns(adj_close)))
 
 # --- 6️⃣ Identify top performer ---
 top_asset = performance.index[0]
 top_value = performance.iloc[0]
 
-# --- 7️⃣ Create performance chart ---
-plt.figure(figsize=(10,5))
-bars = plt.bar(performance.index, performance.values, color="skyblue")
-# Highlight best performer
-bars[0].set_color("green")
-plt.title("Weekly Market Performance (%)")
-plt.ylabel("Percentage Change (%)")
-plt.xticks(rotation=45)
-plt.grid(axis="y", linestyle="--", alpha=0.6)
-plt.tight_layout()
-plt.savefig("weekly_performance.png")
-plt.close()
+# PDF is rebuilt only when its inputs change (see build_cache.py)
+cache = build_cache.BuildCache()
+
+# --- 7️⃣ Create performance chart (vector, drawn into the PDF) ---
+with run_trace.span("chart", "weekly performance"):
+    chart = rl_charts.bar_chart(list(performance.index), performance.values,
+                                title="Weekly Market Performance (%)", highlight=0)
 
 # --- 8️⃣ Prepare summary DataFrame ---
 summary = pd.DataFrame({
@@ -56,33 +71,95 @@ summary = pd.DataFrame({
     "Performance (%)": performance.values.round(2)
 })
 
+risk_table = risk.loc[performance.index]
+tech_table = technicals.loc[performance.index]
+
 # --- 9️⃣ Generate PDF report ---
-pdf = FPDF()
-pdf.add_page()
-pdf.set_font("Helvetica", "B", 16)
-pdf.cell(0, 10, "Weekly Market Performance Report", ln=True, align="C")
-pdf.ln(8)
-pdf.set_font("Helvetica", "", 12)
-pdf.cell(0, 8, f"Report Date: {date.today()}", ln=True)
-pdf.ln(5)
-
-pdf.multi_cell(0, 8, f"Top Performer: {top_asset} ({top_value:.2f}%)", align="L")
-pdf.ln(5)
-
-pdf.set_font("Helvetica", "B", 12)
-pdf.cell(0, 8, "Performance Summary:", ln=True)
-pdf.set_font("Helvetica", "", 11)
-for i, row in summary.iterrows():
-    line = f"{row['Asset']:<10} {row['Performance (%)']:>10}%"
-    pdf.cell(0, 8, line, ln=True)
-
-pdf.ln(10)
-pdf.image("weekly_performance.png", x=15, y=None, w=180)
-pdf.ln(10)
-
-pdf.set_font("Helvetica", "I", 10)
-pdf.cell(0, 10, "Data Source: Yahoo Finance", ln=True, align="C")
-
-pdf.output("weekly_market_report.pdf")
+report_date = date.today()
+def write_report(path):
+    pdf = pdf_compact.configure_fpdf(FPDF())
+    pdf.add_page()
+    pdf.set_font("Helvetica", "B", 16)
+    pdf.cell(0, 10, "Weekly Market Performance Report", ln=True, align="C")
+    pdf.ln(8)
+    pdf.set_font("Helvetica", "", 12)
+    pdf.cell(0, 8, f"Report Date: {report_date}", ln=True)
+    pdf.ln(5)
+
+    pdf.multi_cell(0, 8, f"Top Performer: {top_asset} ({top_value:.2f}%)", align="L")
+    pdf.ln(5)
+
+    pdf.set_font("Helvetica", "B", 12)
+    pdf.cell(0, 8, "Performance Summary:", ln=True)
+    pdf.set_font("Helvetica", "", 11)
+    for i, row in summary.iterrows():
+        line = f"{row['Asset']:<10} {row['Performance (%)']:>10}%"
+        pdf.cell(0, 8, line, ln=True)
+
+    pdf.ln(6)
+    pdf.set_font("Helvetica", "B", 12)
+    pdf.cell(0, 8, "Returns & Risk (1Y daily, exchange calendar):", ln=True)
+    pdf.set_font("Helvetica", "B", 9)
+    widths = [26] + [19] * 8
+    for w, h in zip(widths, ["Asset"] + list(risk_table.columns)):
+        pdf.cell(w, 6, h, border=1, align="C")
+    pdf.ln()
+    pdf.set_font("Helvetica", "", 9)
+    for asset, row in risk_table.iterrows():
+        pdf.cell(widths[0], 6, asset, border=1)
+        for w, v in zip(widths[1:], row.values):
+            pdf.cell(w, 6, "n/a" if pd.isna(v) else f"{v:.2f}", border=1, align="R")
+        pdf.ln()
+
+    pdf.ln(6)
+    pdf.set_font("Helvetica", "B", 12)
+    pdf.cell(0, 8, "Technical Indicators (daily, 20/14-day windows):", ln=True)
+    pdf.set_font("Helvetica", "B", 9)
+    widths = [26] + [22] * 7
+    headers = ["Asset", "Close", "SMA 20", "EMA 20", "RSI 14", "BB Upper", "BB Lower", "ATR 14"]
+    for w, h in zip(widths, headers):
+        pdf.cell(w, 6, h, border=1, align="C")
+    pdf.ln()
+    pdf.set_font("Helvetica", "", 9)
+    for asset, row in tech_table.iterrows():
+        pdf.cell(widths[0], 6, asset, border=1)
+        for w, v in zip(widths[1:], row.values):
+            pdf.cell(w, 6, "n/a" if pd.isna(v) else f"{v:,.2f}", border=1, align="R")
+        pdf.ln()
+
+    pdf.ln(10)
+    if pdf.get_y() + 85 > pdf.page_break_trigger:
+        pdf.add_page()
+    pdf.set_y(rl_charts.draw_on_fpdf(chart, pdf, 15, pdf.get_y(), 180))
+    pdf.ln(10)
+
+    pdf.set_font("Helvetica", "I", 10)
+    pdf.cell(0, 10, "Data Source: Yahoo Finance", ln=True, align="C")
+
+    pdf.add_page()
+    pdf.set_font("Helvetica", "B", 14)
+    pdf.cell(0, 10, "Cross-Asset Correlation (1Y daily log returns)", ln=True, align="C")
+    pdf.set_font("Helvetica", "", 10)
+    pdf.multi_cell(0, 6, f"Ledoit-Wolf shrinkage {corr.attrs['shrinkage']:.2f}; assets ordered so "
+                         "that co-moving assets sit together.", align="C")
+    pdf.ln(4)
+    heat = rl_charts.heatmap(corr.values, corr.index, width=180 / 25.4 * 72, height=180 / 25.4 * 72)
+    rl_charts.draw_on_fpdf(heat, pdf, 15, pdf.get_y(), 180)
+
+    with pdf_compact.output(path, label="weekly_market_report.pdf"):
+        pdf.output(path)
+cache.build("weekly_market_report.pdf", write_report,
+            inputs=[summary, risk_table, tech_table, corr, top_asset, report_date, pdf_compact.COMPACT],
+            sources=[__file__, rl_charts.__file__])
+cache.save()
+
+# Typed tables with REPORT_EXPORT=arrow,parquet,ndjson (see report_export.py)
+report_export.export("weekly_market_report", {
+    "performance": summary,
+    "risk": risk_table.rename_axis("Asset"),
+    "technicals": tech_table.rename_axis("Asset"),
+    "correlation": corr.rename_axis("Asset"),
+    "prices": adj_close.rename_axis("Date"),
+})
 
 print("✅ Report generated successfully: weekly_market_report.pdf")
@@ -0,0 +1,661 @@
+#!/usr/bin/env python3
+"""
+Offline Benchmark Suite for the Report Pipelines
+Times each stage of the market, SNAP and car-sales pipelines without
+network access, tracks memory, and compares every number with a stored
+baseline so a change that slows a stage shows up as a regression.
+
+Suites (sizes are what each stage is scaled by):
+- market   tickers (10 → 10k): minute-bar parsing, intraday summary and
+           resampling, ranking + day-over-day diff, snapshot append,
+           option analytics, sparklines and a reportlab table PDF
+- snap     areas (53 states → 3,000 counties): ingest to the Parquet
+           cache, state/county totals, growth statistics, dashboard PDF
+- car      registration records (20 → 1M): streaming aggregation, maker
+           classification, maker summary, HTML dashboard
+- reports  the scripts end to end (cl, sr, ip, we, as, dd,
+           car_sales_report) in a subprocess each. Stage seconds come from
+           the run's trace (see run_trace.py) and "startup" is imports
+           plus interpreter start. dd and car_sales_report also run on
+           the largest scaled SNAP / car dataset.
+
+Market data is replayed offline: yfinance and requests.get are replaced
+in the benchmarked process by a replay of the fixtures in bench_fixtures/.
+The committed set is synthetic and deterministic (--make-fixtures: a year
+of bars, a session of minute bars, option chains and a most-active page
+for every symbol the scripts ask for); --record replaces it with real
+data while online. Symbols with no fixture get synthetic data seeded by
+the symbol (see synthetic_data.py). Fixture dates are shifted so the
+last session is today.
+
+Stage timings are the best of --repeat runs (a stage slower than 1s runs
+once). Memory is the peak traced by tracemalloc over one extra run:
+Python and NumPy allocations, not Arrow buffers. End-to-end runs report
+the report process's own peak RSS (VmHWM on Linux) instead.
+
+Baseline: bench_baseline.json holds the reference numbers; runs compare
+against it and exit 1 when a stage is slower (or uses more memory) by
+more than --threshold (default 15%) and by more than MIN_SECONDS / MIN_MB,
+so millisecond noise does not count. The committed baseline was measured
+on the machine recorded in its "machine" field; timings only compare on
+like hardware, so on another machine bootstrap your own first: check out
+the commit to compare against (any commit with this file), run
+--save-baseline with a --baseline path outside the tree, then compare the
+change with the same --baseline.
+
+Usage:
+  python bench.py --save-baseline --baseline ~/bench_main.json   # on main
+  python bench.py --baseline ~/bench_main.json                   # on the change
+  python bench.py                          # against the committed baseline
+  python bench.py --suite market,car --quick
+  python bench.py --sizes market=10,1000 --sizes car=1000000
+  python bench.py --record                 # online: real fixtures
+  python bench.py --make-fixtures          # offline: the synthetic set
+  python bench.py --run cl.py --fixtures market_data   # one report, offline, in a temp dir
+
+Scaled inputs come from synthetic_data.py, which also writes fixture
+directories for --fixtures.
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import types
+import shutil
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import subprocess
+import contextlib
+
+import numpy as np
+import pandas as pd
+
+import synthetic_data
+
+REPO = os.path.dirname(os.path.abspath(__file__))
+FIXTURE_DIR = os.path.join(REPO, "bench_fixtures")
+BASELINE = os.environ.get("BENCH_BASELINE", os.path.join(REPO, "bench_baseline.json"))
+SIZES = {
+    "market": [10, 100, 1000, 10000],
+    "snap": [53, 300, 3000],
+    "car": [20, 10_000, 1_000_000],
+}
+QUICK = {"market": [10, 100], "snap": [53, 300], "car": [20, 10_000]}
+THRESHOLD = 0.15
+MIN_SECONDS = 0.05
+MIN_MB = 10
+PERIODS = {"1d": 1, "2d": 2, "5d": 5, "1mo": 22, "3mo": 64, "6mo": 126, "1y": 252, "ytd": 200}
+FIELDS = ["Open", "High", "Low", "Close", "Volume"]
+
+# Every symbol the market scripts ask for (recorded by --record)
+RECORD_SYMBOLS = sorted(set(
+    ["^DJI", "^GSPC", "^NDX", "SPY", "QQQ", "IWM", "META", "T", "GC=F", "CL=F", "ES=F", "NQ=F",
+     "BTC-USD", "ETH-USD", "AAPL", "MSFT", "TSLA", "NVDA", "AMZN", "GOOG", "FB", "NFLX", "AMD",
+     "INTC", "AMC", "GME", "NIO", "SNDL", "BB", "FUBO", "PLTR", "AAL", "EXPR", "KOSS", "SIRI",
+     "RIOT", "CLNE", "MNKD", "TRVG", "CLOV", "AUPH", "NOK", "SPCE", "FCEL", "AGNC", "NVAX", "F",
+     "BBBY", "SOS", "IQ"]))
+OPTION_SYMBOLS = ["SPY", "QQQ", "IWM", "AAPL", "TSLA", "NVDA", "AMD", "AMC", "META", "AMZN"]
+
+
+# -------------------------------
+# 1. Market-data replay
+# -------------------------------
+def _today():
+    return pd.Timestamp.today().normalize()
+
+
+class Replay:
+    """yfinance-shaped answers from recorded fixtures, synthetic otherwise"""
+
+    def __init__(self, directory=None):
+        self.directory = directory if directory and os.path.isdir(directory) else None
+        self.meta = {}
+        if self.directory and os.path.exists(os.path.join(self.directory, "meta.json")):
+            with open(os.path.join(self.directory, "meta.json"), encoding="utf-8") as f:
+                self.meta = json.load(f)
+        # Recorded sessions are moved forward so the last one is today
+        recorded = self.meta.get("last_session")
+        self.shift = _today() - pd.Timestamp(recorded) if recorded else pd.Timedelta(0)
+        self._cache = {}
+
+    def _fixture(self, kind, symbol):
+        if not self.directory:
+            return None
+        key = (kind, symbol)
+        if key not in self._cache:
+            path = os.path.join(self.directory, kind, synthetic_data.safe_name(symbol) + ".parquet")
+            frame = pd.read_parquet(path) if os.path.exists(path) else None
+            if frame is not None and kind in ("history", "minute"):
+                frame.index = frame.index + self.shift
+            self._cache[key] = frame
+        return self._cache[key]
+
+    def history(self, symbol, period="1mo"):
+        days = PERIODS.get(period, 22)
+        frame = self._fixture("history", symbol)
+        if frame is None:
+            return synthetic_data.single_history(symbol, days)
+        return frame.iloc[-(int(days * 7 / 5) if symbol.endswith("-USD") else days):]
+
+    def minute(self, symbol):
+        frame = self._fixture("minute", symbol)
+        if frame is not None:
+            return frame
+        return synthetic_data.single_minutes(symbol, last=self.history(symbol, "1d")["Close"].iloc[-1])
+
+    def info(self, symbol):
+        recorded = self.meta.get("info", {}).get(symbol)
+        if recorded:
+            return dict(recorded)
+        closes = self.history(symbol, "2d")["Close"]
+        return {"longName": f"{symbol} Inc", "previousClose": float(closes.iloc[0])}
+
+    def options(self, symbol):
+        recorded = self.meta.get("options", {}).get(symbol)
+        if recorded:
+            return tuple(str((pd.Timestamp(e) + self.shift).date()) for e in recorded)
+        return tuple(synthetic_data.expiries(4))
+
+    def option_chain(self, symbol, expiry):
+        calls, puts = self._fixture("calls", symbol), self._fixture("puts", symbol)
+        if calls is None or puts is None:
+            spot = float(self.history(symbol, "1d")["Close"].iloc[-1])
+            chains = synthetic_data.option_chains([symbol], [spot], [expiry], seed=synthetic_data.seed_of(symbol))
+            calls, puts = (chains[chains["type"] == t].drop(columns=["underlying", "type", "expiry", "spot", "fetched"])
+                           .reset_index() for t in ("Call", "Put"))
+        return types.SimpleNamespace(calls=calls, puts=puts)
+
+    def download(self, tickers, period="1mo", interval="1d", group_by="column", **kwargs):
+        tickers = [tickers] if isinstance(tickers, str) else list(tickers)
+        frames = {t: (self.minute(t) if interval == "1m" else self.history(t, period))[FIELDS] for t in tickers}
+        out = pd.concat(frames, axis=1)
+        if group_by == "ticker":
+            return out
+        return out.swaplevel(0, 1, axis=1).sort_index(axis=1)
+
+    def get(self, url, *args, **kwargs):
+        import requests
+        path = os.path.join(self.directory, "most_active.html") if self.directory else None
+        if not path or "most-active" not in url or not os.path.exists(path):
+            raise requests.ConnectionError(f"offline replay: no fixture for {url}")
+        response = requests.models.Response()
+        response.status_code = 200
+        with open(path, "rb") as f:
+            response._content = f.read()
+        response.encoding = "utf-8"
+        return response
+
+
+def install(directory=FIXTURE_DIR):
+    """Replace yfinance and requests.get in this process with the replay"""
+    replay = Replay(directory)
+
+    class Ticker:
+        def __init__(self, symbol):
+            self.ticker = symbol
+
+        def history(self, period="1mo", interval="1d", **kwargs):
+            if interval == "1m":
+                return replay.minute(self.ticker)
+            return replay.history(self.ticker, period)
+
+        @property
+        def info(self):
+            return replay.info(self.ticker)
+
+        @property
+        def options(self):
+            return replay.options(self.ticker)
+
+        def option_chain(self, expiry=None):
+            return replay.option_chain(self.ticker, expiry or self.options[0])
+
+    yf = types.ModuleType("yfinance")
+    yf.Ticker, yf.download, yf.replay = Ticker, replay.download, replay
+    sys.modules["yfinance"] = yf
+    try:
+        import requests
+        requests.get = replay.get
+    except ImportError:
+        pass
+    return replay
+
+
+def record(directory=FIXTURE_DIR, symbols=RECORD_SYMBOLS, option_symbols=OPTION_SYMBOLS):
+    """Fetch real data for every benchmarked symbol into `directory` (online)"""
+    import yfinance as yf
+    import requests
+    for kind in ("history", "minute", "calls", "puts"):
+        os.makedirs(os.path.join(directory, kind), exist_ok=True)
+    meta = {"recorded": pd.Timestamp.now(tz="UTC").isoformat(), "info": {}, "options": {}}
+    last = None
+    for sym in symbols:
+        t = yf.Ticker(sym)
+        hist = t.history(period="1y")
+        if hist.empty:
+            print(f"  {sym}: no history")
+            continue
+        hist.index = hist.index.tz_localize(None).normalize()
+        hist[FIELDS].to_parquet(os.path.join(directory, "history", synthetic_data.safe_name(sym) + ".parquet"))
+        last = max(last, hist.index[-1]) if last is not None else hist.index[-1]
+        try:
+            info = t.info
+            meta["info"][sym] = {k: info.get(k) for k in ("longName", "previousClose")}
+        except Exception:
+            pass
+    minute = yf.download(symbols, period="1d", interval="1m", group_by="ticker", progress=False)
+    for sym in symbols:
+        if sym in minute.columns.get_level_values(0):
+            bars = minute[sym].dropna(subset=["Close"])
+            if not bars.empty:
+                bars.to_parquet(os.path.join(directory, "minute", synthetic_data.safe_name(sym) + ".parquet"))
+    for sym in option_symbols:
+        t = yf.Ticker(sym)
+        expiries = list(t.options)[:1]
+        if not expiries:
+            continue
+        chain = t.option_chain(expiries[0])
+        chain.calls.to_parquet(os.path.join(directory, "calls", synthetic_data.safe_name(sym) + ".parquet"))
+        chain.puts.to_parquet(os.path.join(directory, "puts", synthetic_data.safe_name(sym) + ".parquet"))
+        meta["options"][sym] = expiries
+    try:
+        resp = requests.get("https://finance.yahoo.com/most-active", headers={"User-Agent": "Mozilla/5.0"},
+                            timeout=15)
+        resp.raise_for_status()
+        with open(os.path.join(directory, "most_active.html"), "wb") as f:
+            f.write(resp.content)
+    except Exception as e:
+        print(f"  most-active page not recorded: {e}")
+    meta["last_session"] = str(last.date()) if last is not None else None
+    with open(os.path.join(directory, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=1)
+    print(f"✓ Recorded {len(symbols)} symbols, {len(meta['options'])} option chains → {directory}")
+
+
+def synthetic_fixtures(directory=FIXTURE_DIR, seed=0):
+    """The committed fixture set, for machines that cannot --record:
+    synthetic_data market data for every benchmarked symbol, chains for
+    OPTION_SYMBOLS and a most-active page built from the same bars"""
+    names = OPTION_SYMBOLS + [s for s in RECORD_SYMBOLS if s not in OPTION_SYMBOLS]
+    synthetic_data.write_market(directory, names, option_symbols=len(OPTION_SYMBOLS), seed=seed)
+    rows = []
+    for sym in names:
+        if sym.startswith("^") or "=" in sym:
+            continue
+        last = pd.read_parquet(os.path.join(directory, "history", synthetic_data.safe_name(sym) + ".parquet"))
+        prev, close, volume = last["Close"].iloc[-2], last["Close"].iloc[-1], last["Volume"].iloc[-1]
+        rows.append({"Symbol": sym, "Name": f"{sym} Inc", "Price (Intraday)": f"{close:,.2f}",
+                     "Change": f"{close - prev:+,.2f}", "% Change": f"{(close / prev - 1) * 100:+.2f}%",
+                     "Volume (Intraday)": f"{volume / 1e6:,.3f}M", "volume": volume})
+    table = pd.DataFrame(rows).nlargest(25, "volume").drop(columns="volume")
+    with open(os.path.join(directory, "most_active.html"), "w", encoding="utf-8") as f:
+        f.write(f"<html><body>{table.to_html(index=False)}</body></html>\n")
+    print(f"✓ Synthetic fixtures for {len(names)} symbols, {len(OPTION_SYMBOLS)} option chains → {directory}")
+
+
+# -------------------------------
+# 2. Scaled datasets (see synthetic_data.py)
+# -------------------------------
+def snap_frame(wide):
+    """dd.py's derived columns on a State, FY2019..FY2021 frame"""
+    df = wide.copy()
+    df['Total_Issuance'] = df[['FY2019', 'FY2020', 'FY2021']].sum(axis=1)
+    df['Growth_2019_2020'] = (df['FY2020'] - df['FY2019']) / df['FY2019'] * 100
+    df['Growth_2020_2021'] = (df['FY2021'] - df['FY2020']) / df['FY2020'] * 100
+    df['Total_Growth'] = (df['FY2021'] - df['FY2019']) / df['FY2019'] * 100
+    df['Avg_Annual_Issuance'] = df['Total_Issuance'] / 3
+    return df
+
+
+# -------------------------------
+# 3. Stage suites
+# -------------------------------
+def market_stages(n, tmp):
+    import intraday
+    import rl_charts
+    import pdf_compact
+    import snapshot_diff
+    import snapshot_store
+    import options_analytics
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import LETTER
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle
+
+    symbols = synthetic_data.symbols(n)
+    daily = synthetic_data.daily_bars(symbols, days=22, seed=n)
+    closes = daily.xs("Close", axis=1, level=1)
+    volume = daily.xs("Volume", axis=1, level=1)
+    quotes = lambda day: pd.DataFrame({"symbol": symbols, "price": closes.iloc[day].to_numpy(),
+                                       "volume": volume.iloc[day].to_numpy()})
+    prior = quotes(-2)
+    prior = prior.assign(penny=prior["price"] < 5).sort_values(["penny", "volume"], ascending=False)
+    minute_frame = synthetic_data.minute_bars(symbols, seed=n)
+    bars = intraday.to_long(minute_frame, symbols)
+    chains = synthetic_data.option_chains(symbols, closes.iloc[-1].to_numpy(), synthetic_data.expiries(1),
+                                          seed=n).reset_index()
+    trend = closes.reset_index(drop=True)
+
+    def rank_and_diff():
+        # cl.py's transform: penny filter, volume rank, changes and $5 crossings
+        universe = quotes(-1)
+        universe["penny"] = universe["price"] < 5
+        universe = universe.sort_values(["penny", "volume"], ascending=False, kind="stable")
+        top = universe[universe["penny"]].head(20)
+        changes = snapshot_diff.summary(snapshot_diff.compare(top, prior[prior["penny"]].head(20), top_n=20),
+                                        top_n=20)
+        crossed = snapshot_diff.crossings(snapshot_diff.compare(universe, prior, value="price"), "price", 5)
+        return changes + snapshot_diff.crossing_lines(*crossed, "price", 5)
+
+    def table_pdf():
+        table = quotes(-1)
+        data = [list(table.columns)] + [[s, f"${p:.2f}", f"{v:,}"] for s, p, v in table.itertuples(index=False)]
+        t = Table(data, repeatRows=1)
+        t.setStyle(TableStyle([('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#006400")),
+                               ('GRID', (0, 0), (-1, -1), 0.5, colors.grey)]))
+        SimpleDocTemplate(os.path.join(tmp, "table.pdf"), pagesize=LETTER,
+                          **pdf_compact.reportlab_options()).build([t])
+
+    return {
+        "parse.minute_bars": lambda: intraday.to_long(minute_frame, symbols),
+        "transform.intraday": lambda: (intraday.summary(bars), intraday.resample(bars, "5min")),
+        "transform.rank_diff": rank_and_diff,
+        "transform.snapshot_append": lambda: snapshot_store.append("bench", quotes(-1), directory=tmp),
+        "transform.options": lambda: options_analytics.put_call_ratios(options_analytics.chain_analytics(chains)),
+        "render.sparklines": lambda: rl_charts.sparkline_cells(trend, symbols),
+        "render.table_pdf": table_pdf,
+    }
+
+
+def snap_stages(n, tmp):
+    import snap_ingest
+    import snap_stats
+    import snap_dashboard
+
+    source = synthetic_data.snap_file(os.path.join(tmp, "snap.csv"), n, seed=n)
+    cache_dir = os.path.join(tmp, "snap_cache")
+    snap_ingest.ingest(source, cache_dir)
+    years = (2019, 2020, 2021)
+    df = snap_frame(snap_ingest.load_wide(cache_dir, years).dropna())
+    counties = snap_ingest.load_counties(cache_dir, years).dropna() if n > 53 else None
+    return {
+        "parse.ingest": lambda: snap_ingest.ingest(source, cache_dir),
+        "transform.totals": lambda: (snap_ingest.load_wide(cache_dir, years),
+                                     snap_ingest.load_counties(cache_dir, years) if n > 53 else None),
+        "transform.growth_stats": lambda: snap_stats.growth_statistics(df, counties),
+        "render.dashboard": lambda: snap_dashboard.build_dashboard(df, os.path.join(tmp, "snap.pdf"),
+                                                                   counties=counties),
+    }
+
+
+def car_stages(n, tmp):
+    import car_sales_stream
+    import car_sales_dashboard
+    import maker_classifier
+
+    source = synthetic_data.car_file(os.path.join(tmp, "registrations.parquet"), n,
+                                     models=max(20, min(n // 50, 2000)), seed=n)
+    totals = car_sales_stream.aggregate(source)
+    table = totals.top_models(len(totals.by_model))
+    table["Maker"] = maker_classifier.classify_series(table["Model"])
+    return {
+        "parse.aggregate": lambda: car_sales_stream.aggregate(source),
+        "transform.classify": lambda: maker_classifier.classify_series(
+            pd.Series(totals.by_model.index.astype(str))),
+        "transform.maker_summary": totals.maker_summary,
+        "render.dashboard": lambda: car_sales_dashboard.build(os.path.join(tmp, "car_dashboard"), table),
+    }
+
+
+STAGES = {"market": market_stages, "snap": snap_stages, "car": car_stages}
+
+
+def measure(fn, repeat=3, memory=True):
+    """(best seconds over `repeat` runs, tracemalloc peak MB of one more run)"""
+    times = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - t0)
+            if times[-1] > 1.0:
+                break
+        peak = None
+        if memory:
+            tracemalloc.start()
+            try:
+                fn()
+                peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+            finally:
+                tracemalloc.stop()
+    return min(times), peak
+
+
+def run_stages(suite, sizes, repeat=3, memory=True):
+    results = []
+    for size in sizes:
+        tmp = tempfile.mkdtemp(prefix=f"bench-{suite}-")
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                stages = STAGES[suite](size, tmp)
+            for stage, fn in stages.items():
+                seconds, peak = measure(fn, repeat, memory)
+                results.append({"suite": suite, "stage": stage, "size": size,
+                                "seconds": round(seconds, 6), "peak_mb": None if peak is None else round(peak, 1)})
+                _progress(results[-1])
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+    return results
+
+
+# -------------------------------
+# 4. End-to-end report runs
+# -------------------------------
+REPORTS = [("cl.py", "fixture"), ("sr.py", "fixture"), ("ip.py", "fixture"), ("we.py", "fixture"),
+           ("as.py", "fixture"), ("dd.py", 53), ("car_sales_report.py", 20)]
+_RUNNER = ("import sys, runpy; sys.path.insert(0, sys.argv[3]); import bench; "
+           "bench.install(sys.argv[1] or None); sys.argv = sys.argv[2:3]; "
+           "runpy.run_path(sys.argv[0], run_name='__main__')")
+
+
+def _offline_env(tmp, env_extra=None):
+    """Environment for a report run in `tmp`: snapshots, traces and caches stay there"""
+    return dict(os.environ, MPLBACKEND="Agg", REPORT_TRACE_DIR=os.path.join(tmp, "traces"),
+                REPORT_PROFILE="0", SNAPSHOT_DIR=os.path.join(tmp, "snapshots"), REPORT_EXPORT="",
+                PYTHONPATH=os.pathsep.join(p for p in (REPO, os.environ.get("PYTHONPATH")) if p),
+                **(env_extra or {}))
+
+
+def run_one(script, fixtures=FIXTURE_DIR):
+    """Run a report script against the replay in a fresh directory, which is kept
+    for its outputs; the caller's directory and snapshot store are not touched"""
+    tmp = tempfile.mkdtemp(prefix="bench-run-")
+    script = os.path.abspath(script if os.path.exists(script) else os.path.join(REPO, script))
+    proc = subprocess.run([sys.executable, "-c", _RUNNER, os.path.abspath(fixtures) if fixtures else "",
+                           script, REPO], cwd=tmp, env=_offline_env(tmp))
+    print(f"Outputs in {tmp}")
+    return proc.returncode
+
+
+def run_report(script, size, env_extra=None, fixtures=FIXTURE_DIR, timeout=1800):
+    """Run one report script offline in a fresh directory; its trace gives the stages"""
+    tmp = tempfile.mkdtemp(prefix="bench-report-")
+    traces = os.path.join(tmp, "traces")
+    env = _offline_env(tmp, env_extra)
+    for key in ("SNAP_XLSX", "CAR_SALES_XLSX", "SNAP_STATE_PAGES", "CAR_SALES_NEW_MONTH"):
+        env.pop(key, None)
+    try:
+        t0 = time.perf_counter()
+        proc = subprocess.run([sys.executable, "-c", _RUNNER, os.path.abspath(fixtures) if fixtures else "",
+                               os.path.join(REPO, script), REPO],
+                              cwd=tmp, env=env, capture_output=True, text=True, timeout=timeout)
+        wall = time.perf_counter() - t0
+        if proc.returncode != 0:
+            print(f"  {script} failed:\n{proc.stderr[-2000:]}")
+            return []
+        found = [os.path.join(d, f) for d, _, files in os.walk(traces) for f in files if f.endswith(".json")]
+        if not found:
+            print(f"  {script}: no trace written")
+            return []
+        with open(found[0], encoding="utf-8") as f:
+            trace = json.load(f)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    name = os.path.splitext(script)[0]
+    rows = [{"suite": "reports", "stage": f"{name}.{stage}", "size": size,
+             "seconds": round(t["seconds"], 6), "peak_mb": None} for stage, t in trace["stages"].items()]
+    rows.append({"suite": "reports", "stage": f"{name}.startup", "size": size,
+                 "seconds": round(max(wall - trace["duration"], 0), 6), "peak_mb": None})
+    rows.append({"suite": "reports", "stage": f"{name}.total", "size": size,
+                 "seconds": round(wall, 6), "peak_mb": trace.get("peak_rss_mb")})
+    return rows
+
+
+def run_reports(snap_areas=None, car_records_n=None, fixtures=FIXTURE_DIR):
+    results = []
+    runs = [(script, size, {}) for script, size in REPORTS]
+    data = tempfile.mkdtemp(prefix="bench-data-")
+    try:
+        if snap_areas:
+            runs.append(("dd.py", snap_areas,
+                         {"SNAP_SOURCE": synthetic_data.snap_file(os.path.join(data, "snap.csv"), snap_areas,
+                                                                  seed=snap_areas)}))
+        if car_records_n:
+            path = synthetic_data.car_file(os.path.join(data, "registrations.parquet"), car_records_n,
+                                           models=2000, seed=car_records_n)
+            runs.append(("car_sales_report.py", car_records_n, {"CAR_SALES_SOURCE": path}))
+        for script, size, env in runs:
+            rows = run_report(script, size, env, fixtures)
+            for row in rows:
+                _progress(row)
+            results += rows
+    finally:
+        shutil.rmtree(data, ignore_errors=True)
+    return results
+
+
+# -------------------------------
+# 5. Baseline comparison
+# -------------------------------
+def _key(r):
+    return f"{r['suite']}:{r['stage']}@{r['size']}"
+
+
+def _progress(r):
+    mem = "" if r["peak_mb"] is None else f"  {r['peak_mb']:>8,.1f} MB"
+    print(f"  {r['suite']:<8} {r['stage']:<32} {str(r['size']):>9}  {r['seconds']:>9.3f}s{mem}", flush=True)
+
+
+def machine():
+    return {"python": platform.python_version(), "platform": platform.platform(),
+            "cpus": os.cpu_count(), "numpy": np.__version__, "pandas": pd.__version__}
+
+
+def save_baseline(results, path=BASELINE):
+    doc = {"created": pd.Timestamp.now(tz="UTC").isoformat(), "machine": machine(),
+           "results": {_key(r): r for r in results}}
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(doc, f, indent=1)
+    os.replace(tmp, path)
+    print(f"✓ Baseline with {len(results)} measurements → {path}")
+
+
+def compare(results, baseline, threshold=THRESHOLD):
+    """Rows of (key, seconds, base seconds, ratio, peak, base peak, status)"""
+    base = baseline.get("results", {})
+    rows = []
+    for r in results:
+        b = base.get(_key(r))
+        if b is None:
+            rows.append((_key(r), r["seconds"], None, None, r["peak_mb"], None, "new"))
+            continue
+        ratio = r["seconds"] / b["seconds"] if b["seconds"] else float("inf")
+        delta = r["seconds"] - b["seconds"]
+        status = "ok"
+        if ratio > 1 + threshold and delta > MIN_SECONDS:
+            status = "SLOWER"
+        elif ratio < 1 - threshold and -delta > MIN_SECONDS:
+            status = "faster"
+        if r["peak_mb"] is not None and b.get("peak_mb") is not None and \
+                r["peak_mb"] > b["peak_mb"] * (1 + threshold) and r["peak_mb"] - b["peak_mb"] > MIN_MB:
+            status = "MORE MEMORY" if status != "SLOWER" else "SLOWER, MORE MEMORY"
+        rows.append((_key(r), r["seconds"], b["seconds"], ratio, r["peak_mb"], b.get("peak_mb"), status))
+    return rows
+
+
+def report(rows, baseline, threshold=THRESHOLD):
+    if baseline.get("machine") and baseline["machine"] != machine():
+        print(f"Note: baseline was recorded on a different machine/stack: {baseline['machine']}")
+    print(f"\n{'stage':<52} {'now':>9} {'base':>9} {'ratio':>7} {'MB':>8} {'base MB':>8}  status")
+    fmt = lambda v, spec: "" if v is None else format(v, spec)
+    for key, s, bs, ratio, mb, bmb, status in rows:
+        print(f"{key:<52} {fmt(s, '.3f'):>9} {fmt(bs, '.3f'):>9} {fmt(ratio, '.2f'):>7} "
+              f"{fmt(mb, ',.1f'):>8} {fmt(bmb, ',.1f'):>8}  {status}")
+    bad = [r for r in rows if r[6].isupper()]   # SLOWER / MORE MEMORY
+    print(f"\n{len(bad)} regression(s) beyond {threshold:.0%}" if bad else
+          f"\n✓ No regressions beyond {threshold:.0%}")
+    return bad
+
+
+# -------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline benchmark suite for the report pipelines")
+    parser.add_argument("--suite", default="market,snap,car,reports",
+                        help="comma list of market, snap, car, reports")
+    parser.add_argument("--sizes", action="append", default=[], metavar="SUITE=N,N",
+                        help="override a suite's sizes, e.g. market=10,1000")
+    parser.add_argument("--quick", action="store_true", help="small sizes, no scaled report runs")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--fixtures", default=FIXTURE_DIR)
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    parser.add_argument("--json", metavar="PATH", help="also write the results here")
+    parser.add_argument("--record", action="store_true", help="record market fixtures (needs network)")
+    parser.add_argument("--make-fixtures", action="store_true",
+                        help="write the deterministic synthetic fixture set instead (offline)")
+    parser.add_argument("--run", metavar="SCRIPT", help="run one report script against the replay")
+    args = parser.parse_args()
+
+    if args.record or args.make_fixtures:
+        (record if args.record else synthetic_fixtures)(args.fixtures)
+        sys.exit(0)
+    if args.run:
+        sys.exit(run_one(args.run, args.fixtures))
+
+    sizes = dict(QUICK if args.quick else SIZES)
+    for spec in args.sizes:
+        suite, _, values = spec.partition("=")
+        sizes[suite] = [int(v) for v in values.split(",") if v]
+    suites = [s.strip() for s in args.suite.split(",") if s.strip()]
+    unknown = set(suites) - set(STAGES) - {"reports"}
+    if unknown:
+        parser.error(f"unknown suite(s): {', '.join(sorted(unknown))}")
+    if not os.path.isdir(args.fixtures):
+        print(f"No fixtures in {args.fixtures}: market data is synthetic (python bench.py --record)")
+
+    results = []
+    for suite in suites:
+        print(f"[{suite}]", flush=True)
+        if suite == "reports":
+            results += run_reports(None if args.quick else max(sizes["snap"]),
+                                   None if args.quick else max(sizes["car"]), args.fixtures)
+        else:
+            results += run_stages(suite, sizes[suite], args.repeat, not args.no_memory)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"machine": machine(), "results": results}, f, indent=1)
+    if args.save_baseline:
+        save_baseline(results, args.baseline)
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        sys.exit(1 if report(compare(results, baseline, args.threshold), baseline, args.threshold) else 0)
+    else:
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Content-Hash Build Cache for the report scripts
+Each artifact (chart PNG, PDF, HTML, data file) is keyed by a hash of
+its inputs: data slices, chart parameters, the source files that draw
+it, and the keys of the artifacts it depends on. That gives a
+data → figures → PDF/HTML dependency graph:
+- an artifact is rebuilt only when its key changes or the file is missing
+- a rebuilt dependency changes the key of everything downstream
+- rebuilt outputs are rendered to a temp file and replace the old file
+  only if the bytes differ, so unchanged files keep their mtime and
+  rsync/upload steps skip them
+
+The manifest is a small JSON file next to the outputs. Reports running
+in the same directory share it: save() re-reads it and writes back only
+the artifacts this run built, so concurrent runs keep each other's entries.
+
+Usage:
+  cache = BuildCache("out/.build_cache.json")
+  cache.build("out/bar.png", draw_bar, inputs=[df[["Model", "Sales"]]])
+  cache.build("out/report.pdf", write_pdf, inputs=[stats], deps=["out/bar.png"])
+  cache.save()
+"""
+
+import os
+import json
+import hashlib
+import argparse
+
+import numpy as np
+import pandas as pd
+
+import run_trace
+
+MANIFEST = ".build_cache.json"
+# Trace stage for a rendered artifact, by extension (see run_trace.py)
+STAGES = {".png": "chart", ".svg": "chart", ".pdf": "pdf", ".html": "html"}
+
+
+# -------------------------------
+# 1. Hashing
+# -------------------------------
+def _feed(h, obj):
+    if isinstance(obj, (pd.DataFrame, pd.Series, pd.Index)):
+        frame = obj.to_frame() if isinstance(obj, (pd.Series, pd.Index)) else obj
+        h.update(pd.util.hash_pandas_object(frame.reset_index(drop=True), index=False).values.tobytes())
+        h.update(repr([str(c) for c in frame.columns]).encode())
+    elif isinstance(obj, np.ndarray):
+        h.update(str(obj.dtype).encode() + repr(obj.shape).encode())
+        h.update(np.ascontiguousarray(obj).tobytes() if obj.dtype != object else repr(obj.tolist()).encode())
+    elif isinstance(obj, bytes):
+        h.update(obj)
+    elif isinstance(obj, dict):
+        for key in sorted(obj, key=str):
+            h.update(repr(key).encode())
+            _feed(h, obj[key])
+    elif isinstance(obj, (list, tuple)):
+        h.update(b"[%d" % len(obj))
+        for item in obj:
+            _feed(h, item)
+    else:
+        h.update(repr(obj).encode())
+
+
+def content_hash(*inputs):
+    """Stable sha1 of frames, arrays, bytes and plain values (nested)"""
+    h = hashlib.sha1()
+    for obj in inputs:
+        _feed(h, obj)
+    return h.hexdigest()
+
+
+def file_hash(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+# -------------------------------
+# 2. Write-if-changed
+# -------------------------------
+def _temp_path(directory, suffix):
+    """Create an empty temp file next to the artifact. Unlike mkstemp (0600),
+    it gets the normal 0666-minus-umask mode, which the rename then keeps."""
+    for _ in range(100):
+        path = os.path.join(directory, f".tmp{os.urandom(6).hex()}{suffix}")
+        try:
+            os.close(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666))
+            return path
+        except FileExistsError:
+            continue
+    raise FileExistsError(f"no free temporary name in {directory}")
+
+
+def replace_if_changed(tmp_path, path):
+    """Move tmp_path over path unless both hold the same bytes. Returns True if written."""
+    if os.path.exists(path) and os.path.getsize(path) == os.path.getsize(tmp_path) \
+            and file_hash(path) == file_hash(tmp_path):
+        os.remove(tmp_path)
+        return False
+    os.replace(tmp_path, path)
+    return True
+
+
+def write_if_changed(path, data):
+    """Write str/bytes to path only if the content differs. Returns True if written."""
+    data = data.encode("utf-8") if isinstance(data, str) else data
+    if os.path.exists(path) and os.path.getsize(path) == len(data):
+        with open(path, "rb") as f:
+            if f.read() == data:
+                return False
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+    return True
+
+
+# -------------------------------
+# 3. Cache
+# -------------------------------
+class BuildCache:
+    def __init__(self, manifest_path=MANIFEST):
+        self.manifest_path = manifest_path
+        self.entries = {}
+        if os.path.exists(manifest_path):
+            with open(manifest_path, encoding="utf-8") as f:
+                self.entries = json.load(f).get("artifacts", {})
+        self.rebuilt = []
+        self.skipped = []
+        self.recorded = set()
+
+    def _name(self, path):
+        return os.path.relpath(path, os.path.dirname(os.path.abspath(self.manifest_path)))
+
+    def key(self, path, inputs=(), deps=(), sources=()):
+        """Artifact key: inputs + source file contents + dependency keys"""
+        dep_keys = [self.entries.get(self._name(d), {}).get("key") for d in deps]
+        src_hashes = [file_hash(s) for s in sources]
+        return content_hash(list(inputs), src_hashes, dep_keys)
+
+    def stale(self, path, key):
+        entry = self.entries.get(self._name(path))
+        return entry is None or entry.get("key") != key or not os.path.exists(path)
+
+    def meta(self, path):
+        """Extra values recorded with the artifact (e.g. a page count)"""
+        return self.entries.get(self._name(path), {}).get("meta", {})
+
+    def record(self, path, key, deps=(), meta=None):
+        name = self._name(path)
+        self.entries[name] = {
+            "key": key,
+            "deps": [self._name(d) for d in deps],
+            "meta": meta or {},
+        }
+        self.recorded.add(name)
+
+    def build(self, path, render, inputs=(), deps=(), sources=()):
+        """Call render(tmp_path) if `path` is stale, then write-if-changed.
+        render may return a dict stored as the artifact's meta.
+        Returns True if the artifact was re-rendered."""
+        key = self.key(path, inputs, deps, sources)
+        if not self.stale(path, key):
+            self.skipped.append(path)
+            run_trace.count("cache_hits", cache="build")
+            return False
+        run_trace.count("cache_misses", cache="build")
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        suffix = os.path.splitext(path)[1]
+        tmp = _temp_path(directory, suffix)
+        try:
+            stage = STAGES.get(suffix.lower(), "render")
+            with run_trace.span(stage, os.path.basename(path)):
+                meta = render(tmp)
+                replace_if_changed(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        self.record(path, key, deps, meta if isinstance(meta, dict) else None)
+        self.rebuilt.append(path)
+        return True
+
+    def save(self):
+        """Merge this run's entries into the manifest on disk and replace it"""
+        entries = {}
+        if os.path.exists(self.manifest_path):
+            try:
+                with open(self.manifest_path, encoding="utf-8") as f:
+                    entries = json.load(f).get("artifacts", {})
+            except ValueError:
+                entries = {}
+        entries.update({name: self.entries[name] for name in self.recorded})
+        self.entries = entries
+        tmp = f"{self.manifest_path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"artifacts": entries}, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.manifest_path)
+
+    def summary(self):
+        return f"{len(self.rebuilt)} rebuilt, {len(self.skipped)} up to date"
+
+    def dependents(self, path):
+        """Every artifact downstream of `path` (transitively)"""
+        name, found = self._name(path), set()
+        frontier = [name]
+        while frontier:
+            current = frontier.pop()
+            for artifact, entry in self.entries.items():
+                if current in entry.get("deps", ()) and artifact not in found:
+                    found.add(artifact)
+                    frontier.append(artifact)
+        return sorted(found)
+
+
+# -------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect a build cache manifest")
+    parser.add_argument("manifest", nargs="?", default=MANIFEST)
+    args = parser.parse_args()
+
+    cache = BuildCache(args.manifest)
+    for artifact, entry in sorted(cache.entries.items()):
+        deps = f" ← {', '.join(entry['deps'])}" if entry["deps"] else ""
+        print(f"{entry['key'][:10]}  {artifact}{deps}")
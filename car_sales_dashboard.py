@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Offline, Scalable HTML Dashboard for car_sales_report.py
+Replaces the single HTML file that inlined the whole frame (df.to_html)
+and pulled plotly.js from a CDN:
+- table data is written once, as compact columnar JSON (strings
+  dictionary-encoded) in dashboard_data.js, and loaded lazily after the
+  charts are drawn
+- the table is paginated client-side; only one page of rows is in the DOM
+- files are rewritten only when their content changes
+- plotly.min.js is copied from the installed plotly package next to the
+  page, so the dashboard works offline
+- charts carry pre-aggregated data; long series are min/max decimated
+  and drawn with WebGL (Scattergl) traces
+
+A 100k-model table becomes a ~3 MB data file, and the page stays
+interactive while it loads.
+"""
+
+import os
+import html
+import json
+import argparse
+
+import numpy as np
+import pandas as pd
+
+import build_cache
+
+try:
+    import plotly.graph_objects as go
+    from plotly.offline import get_plotlyjs
+    PLOTLY_AVAILABLE = True
+except Exception:
+    PLOTLY_AVAILABLE = False
+
+PLOTLY_JS = "plotly.min.js"
+DATA_JS = "dashboard_data.js"
+PAGE_SIZE = 100
+# Series longer than this are decimated and drawn with WebGL
+MAX_POINTS = 2_000
+
+
+# -------------------------------
+# 1. Data and assets
+# -------------------------------
+def _column(series):
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        values = series.astype("float64")
+        # NaN is not valid JSON: missing numbers become null
+        return [None if np.isnan(v) else (int(v) if v.is_integer() else round(v, 6))
+                for v in values.tolist()]
+    cat = pd.Categorical(series.astype(object).where(series.notna(), None))
+    return {"dict": [str(c) for c in cat.categories], "codes": cat.codes.tolist()}
+
+
+def columnar_json(frame):
+    """{"columns": [...], "rows": n, "data": {col: values | {"dict", "codes"}}}"""
+    return json.dumps({
+        "columns": [str(c) for c in frame.columns],
+        "rows": len(frame),
+        "data": {str(c): _column(frame[c]) for c in frame.columns},
+    }, ensure_ascii=False, separators=(",", ":"))
+
+
+def write_data(frame, out_dir):
+    # A script (not fetch()) so the page also loads from file://
+    path = os.path.join(out_dir, DATA_JS)
+    build_cache.write_if_changed(path, "window.DASHBOARD_DATA=" + columnar_json(frame) + ";")
+    return path
+
+
+def bundle_plotly(out_dir):
+    """Copy plotly.js from the installed package unless an identical copy exists"""
+    path = os.path.join(out_dir, PLOTLY_JS)
+    source = get_plotlyjs()
+    if not os.path.exists(path) or os.path.getsize(path) != len(source.encode("utf-8")):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(source)
+    return path
+
+
+# -------------------------------
+# 2. Chart helpers
+# -------------------------------
+def decimate(x, y, max_points=MAX_POINTS):
+    """Min/max decimation: keeps each bucket's extremes so spikes survive"""
+    x, y = np.asarray(x), np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n <= max_points:
+        return x, y
+    buckets = max_points // 2
+    edges = np.linspace(0, n, buckets + 1).astype(np.int64)
+    starts = edges[:-1]
+    sizes = np.diff(edges)
+    # Sort by (bucket, y): each bucket's min and max sit at its slice ends
+    order = np.lexsort((y, np.repeat(np.arange(buckets), sizes)))
+    lo, hi = order[starts], order[starts + sizes - 1]
+    keep = np.unique(np.r_[lo, hi])
+    return x[keep], y[keep]
+
+
+def line_trace(x, y, name=None, max_points=MAX_POINTS):
+    """Scatter for short series, decimated Scattergl for long ones"""
+    if len(y) > max_points:
+        x, y = decimate(x, y, max_points)
+        return go.Scattergl(x=x, y=y, mode="lines", name=name)
+    return go.Scatter(x=x, y=y, mode="lines+markers", name=name)
+
+
+# -------------------------------
+# 3. Page
+# -------------------------------
+_TABLE_JS = """
+(function () {
+  var pageSize = %(page_size)d, page = 0, rows = [], sortCol = null, sortDesc = false;
+  var status = document.getElementById('table-status');
+  function esc(v) {
+    return String(v).replace(/&/g, '&amp;').replace(/</g, '&lt;').replace(/>/g, '&gt;');
+  }
+  function value(col, i) {
+    var c = window.DASHBOARD_DATA.data[col];
+    if (Array.isArray(c)) return c[i];
+    var code = c.codes[i];
+    return code < 0 ? null : c.dict[code];
+  }
+  function refresh() {
+    var d = window.DASHBOARD_DATA, q = document.getElementById('table-filter').value.toLowerCase();
+    rows = [];
+    for (var i = 0; i < d.rows; i++) {
+      if (!q || d.columns.some(function (c) { return String(value(c, i)).toLowerCase().indexOf(q) >= 0; }))
+        rows.push(i);
+    }
+    if (sortCol !== null) rows.sort(function (a, b) {
+      var x = value(sortCol, a), y = value(sortCol, b);
+      return (x < y ? -1 : x > y ? 1 : 0) * (sortDesc ? -1 : 1);
+    });
+    page = 0;
+    render();
+  }
+  function render() {
+    var d = window.DASHBOARD_DATA, pages = Math.max(1, Math.ceil(rows.length / pageSize));
+    page = Math.min(Math.max(page, 0), pages - 1);
+    var head = '<tr>' + d.columns.map(function (c) {
+      return '<th data-col="' + esc(c) + '">' + esc(c) + (c === sortCol ? (sortDesc ? ' ▼' : ' ▲') : '') + '</th>';
+    }).join('') + '</tr>';
+    var body = rows.slice(page * pageSize, (page + 1) * pageSize).map(function (i) {
+      return '<tr>' + d.columns.map(function (c) {
+        var v = value(c, i);
+        return '<td>' + (v === null ? '' : typeof v === 'number' ? v.toLocaleString() : esc(v)) + '</td>';
+      }).join('') + '</tr>';
+    }).join('');
+    document.getElementById('table').innerHTML = '<thead>' + head + '</thead><tbody>' + body + '</tbody>';
+    status.textContent = 'Page ' + (page + 1) + ' of ' + pages + ' (' + rows.length.toLocaleString() + ' rows)';
+  }
+  document.getElementById('table').addEventListener('click', function (e) {
+    var col = e.target.getAttribute('data-col');
+    if (!col) return;
+    sortDesc = sortCol === col ? !sortDesc : false;
+    sortCol = col;
+    refresh();
+  });
+  document.getElementById('prev').onclick = function () { page--; render(); };
+  document.getElementById('next').onclick = function () { page++; render(); };
+  document.getElementById('table-filter').oninput = refresh;
+  // Table data loads after first paint, so charts are usable immediately
+  window.addEventListener('load', function () {
+    status.textContent = 'Loading data…';
+    var s = document.createElement('script');
+    s.src = '%(data_js)s';
+    s.onload = refresh;
+    document.body.appendChild(s);
+  });
+})();
+"""
+
+_STYLE = """
+body { font-family: sans-serif; margin: 1em 2em; }
+table { border-collapse: collapse; font-size: 13px; }
+th, td { border: 1px solid #ddd; padding: 3px 8px; text-align: right; }
+th { background: #f3f3f3; cursor: pointer; position: sticky; top: 0; }
+td:first-child, th:first-child { text-align: left; }
+"""
+
+
+def build(out_dir, table, figures=(), images=(), title="Car Sales Dashboard", page_size=PAGE_SIZE):
+    """Write dashboard.html, its data file and (for figures) plotly.min.js.
+    `figures` are plotly figures; `images` static chart paths used instead
+    when plotly is unavailable. Returns the HTML path."""
+    os.makedirs(out_dir, exist_ok=True)
+    write_data(table, out_dir)
+    html_path = os.path.join(out_dir, "dashboard.html")
+    use_plotly = PLOTLY_AVAILABLE and len(figures)
+    title = html.escape(title)
+
+    parts = ["<html><head><meta charset='utf-8'>", f"<title>{title}</title>",
+             f"<style>{_STYLE}</style>"]
+    if use_plotly:
+        bundle_plotly(out_dir)
+        parts.append(f"<script src='{PLOTLY_JS}'></script>")
+    parts += ["</head><body>", f"<h1>{title}</h1>", "<h2>Charts</h2>"]
+
+    if use_plotly:
+        for i, fig in enumerate(figures):
+            parts.append(f"<div id='chart{i}' style='height:480px'></div>")
+        specs = ",".join(fig.to_json() for fig in figures)
+        parts.append("<script>[" + specs + "].forEach(function (f, i) {"
+                     "Plotly.newPlot('chart' + i, f.data, f.layout, {responsive: true});});</script>")
+    else:
+        for path in images:
+            parts.append(f"<img src='{html.escape(os.path.basename(path))}' style='max-width:100%;'><br><hr>")
+
+    parts += [
+        "<h2>Data Table</h2>",
+        "<input id='table-filter' placeholder='Filter…'> ",
+        "<button id='prev'>‹ Prev</button> <button id='next'>Next ›</button> ",
+        "<span id='table-status'></span>",
+        "<table id='table'></table>",
+        "<script>" + _TABLE_JS % {"page_size": page_size, "data_js": DATA_JS} + "</script>",
+        "</body></html>",
+    ]
+    build_cache.write_if_changed(html_path, "\n".join(parts))
+    return html_path
+
+
+# -------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the offline dashboard from a CSV or Parquet table")
+    parser.add_argument("table")
+    parser.add_argument("--out", default="car_sales_report")
+    args = parser.parse_args()
+
+    frame = pd.read_parquet(args.table) if args.table.endswith((".parquet", ".pq")) \
+        else pd.read_csv(args.table)
+    print("✓ Dashboard:", build(args.out, frame, title=os.path.basename(args.table)))
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Incremental Monthly Refresh for car_sales_report.py
+Keeps the running aggregates on disk (per-model totals, monthly/regional
+totals and a sorted ranking) so a new month of registrations only touches
+the models that month sold:
+- totals are updated per affected model
+- rank positions move through a sorted list with bisect, never a full re-sort
+- the previous rank of each top-N model becomes the Prev_Rank/Rank_Change
+  (movers) columns
+- the report's build cache (build_cache.py) re-renders only charts
+  whose inputs changed
+
+Refresh time depends on the size of the new month, not on the history,
+except for save(): the per-model table is one Parquet file rewritten in
+full (O(models), a single columnar write; the history's rows are never
+re-read).
+
+Usage:
+  python car_sales_incremental.py seed history.parquet --state car_sales_report/state
+  CAR_SALES_NEW_MONTH=2025-07.csv python car_sales_report.py
+"""
+
+import os
+import json
+import argparse
+from bisect import bisect_left, insort
+
+import numpy as np
+import pandas as pd
+
+import build_cache
+import car_sales_stream
+
+STATE_FILE = "state.json"
+MODELS_FILE = "model_totals.parquet"
+
+
+def source_key(path):
+    """Content key of a month's records (sha1 of the bytes, of every file for
+    a Parquet directory): same-named files from different folders stay
+    distinct, and a renamed copy is still recognised as applied"""
+    if os.path.isdir(path):
+        files = sorted(os.path.join(d, f) for d, _, names in os.walk(path) for f in names)
+        return "sha1:" + build_cache.content_hash([build_cache.file_hash(f) for f in files])
+    return "sha1:" + build_cache.file_hash(path)
+
+
+class SalesState(car_sales_stream.RunningTotals):
+    """RunningTotals that can absorb one month at a time and persist itself"""
+
+    def __init__(self):
+        super().__init__()
+        self.model_totals = {}
+        # Ascending by (-sales, model): index 0 is rank 1
+        self.ranking = []
+        self.applied = []
+        self._by_model = None
+
+    # The report and RunningTotals read totals as a Series; built once per
+    # change of model_totals, not on every access
+    @property
+    def by_model(self):
+        if self._by_model is None:
+            self._by_model = pd.Series(self.model_totals, dtype="int64")
+        return self._by_model
+
+    @by_model.setter
+    def by_model(self, series):
+        self.model_totals = {str(k): int(v) for k, v in series.items()}
+        self.ranking = sorted((-v, k) for k, v in self.model_totals.items())
+        self._by_model = None
+
+    def rank_of(self, model):
+        total = self.model_totals.get(model)
+        if total is None:
+            return None
+        return bisect_left(self.ranking, (-total, model)) + 1
+
+    def apply_month(self, month, source, top_n=20):
+        """Fold one month's RunningTotals in. `source` is its source_key().
+        Returns the new top-N table with Prev_Rank and Rank_Change; raises
+        ValueError if `source` was applied."""
+        if source in self.applied:
+            raise ValueError(f"{source} was already applied to this state")
+
+        affected = month.by_model
+        old_top = [m for _, m in self.ranking[:top_n]]
+        prev_rank = {m: self.rank_of(m) for m in set(old_top) | set(affected.index.astype(str))}
+
+        for model, units in affected.items():
+            model = str(model)
+            old = self.model_totals.get(model)
+            if old is not None:
+                del self.ranking[bisect_left(self.ranking, (-old, model))]
+            new = (old or 0) + int(units)
+            self.model_totals[model] = new
+            insort(self.ranking, (-new, model))
+        self._by_model = None
+
+        self.by_month = self._add(self.by_month, month.by_month)
+        self.by_region = self._add(self.by_region, month.by_region)
+        self.rows += month.rows
+        self.applied.append(source)
+
+        top = self.top_models(top_n)
+        prev = top["Model"].map(prev_rank)
+        top["Prev_Rank"] = prev.astype("Int64")
+        top["Rank_Change"] = (prev - top["Rank"]).astype("Int64")
+        return top
+
+    def top_models(self, n=20):
+        head = self.ranking[:n]
+        return pd.DataFrame({"Rank": np.arange(1, len(head) + 1),
+                             "Model": [m for _, m in head],
+                             "Sales": [-s for s, _ in head]})
+
+    # -------------------------------
+    # Persistence
+    # -------------------------------
+    def save(self, state_dir):
+        """Write the state: the model table in full (O(models)), the rest as JSON"""
+        os.makedirs(state_dir, exist_ok=True)
+        pd.DataFrame({"Model": list(self.model_totals), "Sales": list(self.model_totals.values())}) \
+            .to_parquet(os.path.join(state_dir, MODELS_FILE), index=False)
+        meta = {
+            "rows": self.rows,
+            "applied": self.applied,
+            "by_month": {str(k): int(v) for k, v in self.by_month.items()},
+            "by_region": {str(k): int(v) for k, v in self.by_region.items()},
+        }
+        tmp = os.path.join(state_dir, STATE_FILE + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, os.path.join(state_dir, STATE_FILE))
+
+    @classmethod
+    def load(cls, state_dir):
+        """Load persisted state, or an empty one if `state_dir` has none"""
+        state = cls()
+        meta_path = os.path.join(state_dir, STATE_FILE)
+        if not os.path.exists(meta_path):
+            return state
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        models = pd.read_parquet(os.path.join(state_dir, MODELS_FILE))
+        state.by_model = pd.Series(models["Sales"].values, index=models["Model"].values)
+        state.rows = meta["rows"]
+        state.applied = meta["applied"]
+        state.by_month = pd.Series(meta["by_month"], dtype="int64")
+        state.by_region = pd.Series(meta["by_region"], dtype="int64")
+        return state
+
+    @classmethod
+    def seed(cls, path, state_dir):
+        """Build the initial state from a full history file (one-off, streamed)"""
+        history = car_sales_stream.aggregate(path)
+        state = cls()
+        state.by_model = history.by_model
+        state.by_month, state.by_region, state.rows = history.by_month, history.by_region, history.rows
+        state.applied.append(source_key(path))
+        state.save(state_dir)
+        return state
+
+
+# -------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage incremental car-sales state")
+    parser.add_argument("command", choices=["seed", "apply"])
+    parser.add_argument("path", help="history file (seed) or one month of records (apply)")
+    parser.add_argument("--state", default=os.path.join("car_sales_report", "state"))
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.command == "seed":
+        s = SalesState.seed(args.path, args.state)
+        print(f"✓ Seeded {len(s.model_totals):,} models from {s.rows:,} rows → {args.state}")
+    else:
+        s = SalesState.load(args.state)
+        key = source_key(args.path)
+        if key in s.applied:
+            raise SystemExit(f"{args.path} was already applied to {args.state}")
+        top = s.apply_month(car_sales_stream.aggregate(args.path), key, args.top)
+        s.save(args.state)
+        print(top.to_string(index=False))
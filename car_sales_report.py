@@ -10,6 +10,19 @@ import matplotlib.pyplot as plt
 from matplotlib.backends.backend_pdf import PdfPages
 import numpy as np
 
+import maker_classifier
+import car_sales_stream
+import car_sales_incremental
+import car_sales_dashboard
+import build_cache
+import pdf_compact
+import sketches
+import snapshot_store
+import snapshot_diff
+import report_export
+import excel_export
+import run_trace
+
 # Optional: plotly for interactive dashboard
 try:
     import plotly.express as px
@@ -42,169 +55,246 @@ data = [
     (20, "零跑 B01 (Leapmotor B01)", 3608),
 ]
 
-df = pd.DataFrame(data, columns=["Rank", "Model", "Sales"])
-df["Model_short"] = df["Model"].str.split(" ").str[0]
+# Raw registration records (CSV/Parquet, any size) are streamed into running
+# totals instead (see car_sales_stream.py):
+#   CAR_SALES_SOURCE=registrations.parquet python car_sales_report.py
+# A single new month is folded into persisted totals instead (see car_sales_incremental.py):
+#   CAR_SALES_NEW_MONTH=2025-07.csv python car_sales_report.py
+CAR_SALES_SOURCE = os.environ.get("CAR_SALES_SOURCE")
+CAR_SALES_NEW_MONTH = os.environ.get("CAR_SALES_NEW_MONTH")
+TOP_N = 20
+
+pdf_compact.configure_matplotlib()
+# Stage timings and counters for this run (see run_trace.py)
+run_trace.start("car_sales_report")
+
+# Output directory
+out_dir = os.path.join(os.getcwd(), "car_sales_report")
+os.makedirs(out_dir, exist_ok=True)
+state_dir = os.path.join(out_dir, "state")
+
+state = None
+if CAR_SALES_NEW_MONTH:
+    state = car_sales_incremental.SalesState.load(state_dir)
+    # Checked before streaming the file: a repeated month changes nothing
+    source = car_sales_incremental.source_key(CAR_SALES_NEW_MONTH)
+    if source in state.applied:
+        raise SystemExit(f"{CAR_SALES_NEW_MONTH} was already applied to {state_dir}; nothing to refresh")
+    month = car_sales_stream.aggregate(CAR_SALES_NEW_MONTH)
+    df = state.apply_month(month, source, top_n=TOP_N)
+    totals = state
+    sales_sketch = totals.sales_sketch()
+elif CAR_SALES_SOURCE:
+    totals = car_sales_stream.aggregate(CAR_SALES_SOURCE)
+    df = totals.top_models(TOP_N)
+    # Stats and boxplot cover every model's total, not just the top N
+    sales_sketch = totals.sales_sketch()
+else:
+    totals = None
+    df = pd.DataFrame(data, columns=["Rank", "Model", "Sales"])
+    sales_sketch = sketches.SummarySketch().update(df["Sales"])
 
-# Basic stats
-stats = {
-    "count": int(df["Sales"].count()),
-    "sum": int(df["Sales"].sum()),
-    "mean": float(df["Sales"].mean()),
-    "median": float(df["Sales"].median()),
-    "std": float(df["Sales"].std(ddof=0)),
-    "min": int(df["Sales"].min()),
-    "max": int(df["Sales"].max())
-}
+# Basic stats (from the mergeable sketch, see sketches.py)
+stats = car_sales_stream.sketch_stats(sales_sketch)
+
+df["Model_short"] = df["Model"].str.split(" ").str[0]
 
 # Sort by sales descending and compute cumulative
 df = df.sort_values("Sales", ascending=False).reset_index(drop=True)
 df["Cumulative"] = df["Sales"].cumsum()
 df["Cumulative_pct"] = 100 * df["Cumulative"] / df["Sales"].sum()
 
-# Heuristic maker inference (edit as needed)
+# Maker inference: patterns live in car_makers.csv (edit there), see maker_classifier.py
 def infer_maker(model_string):
-    s = model_string
-    if "Model Y" in s or "Model 3" in s:
-        return "Tesla"
-    if "小米" in s or "YU7" in s or "SU7" in s:
-        return "Xiaomi"
-    if "小鹏" in s or "MONA" in s or "M03" in s:
-        return "Xpeng"
-    if "宝马" in s or "BMW" in s:
-        return "BMW"
-    if "途观" in s or "Tiguan" in s:
-        return "Volkswagen"
-    if "凯美瑞" in s:
-        return "Toyota"
-    if "奔驰" in s:
-        return "Mercedes"
-    if "秦" in s or "海" in s or "元UP" in s:
-        if "问界" in s:
-            return "AITO"
-        return "BYD"
-    if "宏光" in s:
-        return "Wuling"
-    if "零跑" in s:
-        return "Leapmotor"
-    if "星愿" in s:
-        return "Unknown"
-    return "Other"
-
-df["Maker"] = df["Model"].apply(infer_maker)
-
-# Aggregation by Maker
-maker_summary = df.groupby("Maker")["Sales"].agg(["sum", "count"]).sort_values("sum", ascending=False).reset_index()
+    return maker_classifier.classify(model_string)
 
-# Output directory
-out_dir = os.path.join(os.getcwd(), "car_sales_report")
-os.makedirs(out_dir, exist_ok=True)
+with run_trace.span("transform", "classify makers", rows=len(df)):
+    df["Maker"] = maker_classifier.classify_series(df["Model"])
+
+# Aggregation by Maker (over all streamed models when reading raw records)
+with run_trace.span("transform", "maker summary"):
+    if totals is not None:
+        maker_summary = totals.maker_summary()
+    else:
+        maker_summary = df.groupby("Maker", observed=True)["Sales"].agg(["sum", "count"]).sort_values("sum", ascending=False).reset_index()
+
+# Charts, PDF and data files are rebuilt only when their inputs change and
+# rewritten only when their bytes change (see build_cache.py)
+cache = build_cache.BuildCache(os.path.join(out_dir, build_cache.MANIFEST))
+
+# Outside incremental mode, ranks are compared with the last stored run (see snapshot_diff.py)
+if "Prev_Rank" not in df.columns:
+    prior, since = snapshot_diff.previous("top20_sales")
+    if since is not None:
+        diff = snapshot_diff.compare(pd.DataFrame({"model": df["Model"]}), prior, key="model")
+        df["Prev_Rank"] = pd.array(diff["prev_rank"].to_numpy()[:len(df)]).astype("Int64")
+        df["Rank_Change"] = pd.array(diff["rank_change"].to_numpy()[:len(df)]).astype("Int64")
 
 # Save CSV
 csv_path = os.path.join(out_dir, "top20_sales.csv")
-df.to_csv(csv_path, index=False)
+build_cache.write_if_changed(csv_path, df.to_csv(index=False))
+# The same table, typed, appended to the snapshot store (see snapshot_store.py)
+snapshot_store.record("top20_sales", pd.DataFrame({
+    "model": df["Model"].astype(str).to_numpy(), "maker": df["Maker"].astype(str).to_numpy(),
+    "sales": df["Sales"].to_numpy(dtype="int64"), "cumulative_pct": df["Cumulative_pct"].to_numpy(dtype="float64"),
+}))
+if totals is not None and not totals.by_month.empty:
+    build_cache.write_if_changed(os.path.join(out_dir, "monthly_sales.csv"), totals.monthly().to_csv(index=False))
+
+# Charts go to a PNG, or straight into the PDF as vectors in compact mode
+def save_chart(target):
+    if isinstance(target, PdfPages):
+        target.savefig()
+    else:
+        plt.savefig(target)
+    plt.close()
 
 # Plot 1: Horizontal bar chart (models by sales)
-plt.figure(figsize=(10, 8))
-plt.barh(df["Model"], df["Sales"])
-plt.gca().invert_yaxis()
-plt.xlabel("Sales (units)")
-plt.title("Top 20 Models by Sales (Ranked)")
-plt.tight_layout()
 fig1_path = os.path.join(out_dir, "bar_sales_by_model.png")
-plt.savefig(fig1_path)
-plt.close()
+def draw_bar(path):
+    plt.figure(figsize=(10, 8))
+    plt.barh(df["Model"], df["Sales"])
+    plt.gca().invert_yaxis()
+    plt.xlabel("Sales (units)")
+    plt.title("Top 20 Models by Sales (Ranked)")
+    plt.tight_layout()
+    save_chart(path)
+cache.build(fig1_path, draw_bar, inputs=[df[["Model", "Sales"]]], sources=[__file__])
 
 # Plot 2: Pie chart top 5 vs others
 top5 = df.head(5)
 others_sum = df["Sales"].iloc[5:].sum()
 labels = list(top5["Model"]) + ["Others"]
 sizes = list(top5["Sales"]) + [others_sum]
-plt.figure(figsize=(7,7))
-plt.pie(sizes, labels=labels, autopct="%1.1f%%", startangle=140)
-plt.title("Top 5 Models vs Others (Share)")
-plt.tight_layout()
 fig2_path = os.path.join(out_dir, "pie_top5_vs_others.png")
-plt.savefig(fig2_path)
-plt.close()
+def draw_pie(path):
+    plt.figure(figsize=(7,7))
+    plt.pie(sizes, labels=labels, autopct="%1.1f%%", startangle=140)
+    plt.title("Top 5 Models vs Others (Share)")
+    plt.tight_layout()
+    save_chart(path)
+cache.build(fig2_path, draw_pie, inputs=[labels, sizes], sources=[__file__])
 
 # Plot 3: Boxplot distribution
-plt.figure(figsize=(6,6))
-plt.boxplot(df["Sales"], vert=False)
-plt.title("Sales Distribution (Top 20 models)")
-plt.xlabel("Sales (units)")
-plt.tight_layout()
 fig3_path = os.path.join(out_dir, "boxplot_sales.png")
-plt.savefig(fig3_path)
-plt.close()
+box_stats = sales_sketch.boxplot_stats()
+box_title = f"Sales Distribution ({'all' if totals is not None else 'Top'} {stats['count']:,} models)"
+def draw_boxplot(path):
+    plt.figure(figsize=(6,6))
+    plt.gca().bxp([box_stats], vert=False, showfliers=True)
+    plt.title(box_title)
+    plt.xlabel("Sales (units)")
+    plt.tight_layout()
+    save_chart(path)
+cache.build(fig3_path, draw_boxplot, inputs=[box_stats, box_title], sources=[__file__])
 
 # Plot 4: Cumulative percentage curve
-plt.figure(figsize=(10,6))
-plt.plot(range(1, len(df)+1), df["Cumulative_pct"], marker='o')
-plt.xticks(range(1, len(df)+1))
-plt.xlabel("Model rank (1=highest sales)")
-plt.ylabel("Cumulative % of total sales")
-plt.title("Cumulative Sales Percentage by Rank")
-plt.grid(True)
-plt.tight_layout()
 fig4_path = os.path.join(out_dir, "cumulative_pct.png")
-plt.savefig(fig4_path)
-plt.close()
+def draw_cumulative(path):
+    plt.figure(figsize=(10,6))
+    plt.plot(range(1, len(df)+1), df["Cumulative_pct"], marker='o')
+    plt.xticks(range(1, len(df)+1))
+    plt.xlabel("Model rank (1=highest sales)")
+    plt.ylabel("Cumulative % of total sales")
+    plt.title("Cumulative Sales Percentage by Rank")
+    plt.grid(True)
+    plt.tight_layout()
+    save_chart(path)
+cache.build(fig4_path, draw_cumulative, inputs=[df["Cumulative_pct"]], sources=[__file__])
 
-# Create PDF report
+# Create PDF report (depends on the four charts)
 pdf_path = os.path.join(out_dir, "car_sales_report.pdf")
-with PdfPages(pdf_path) as pdf:
-    fig = plt.figure(figsize=(11,8.5))
-    fig.suptitle("Top 20 Model Sales Report - Extracted data", fontsize=18)
-    plt.axis("off")
-    plt.text(0.1, 0.6, f"Total models: {stats['count']}", fontsize=12)
-    plt.text(0.1, 0.55, f"Total sales (sum): {stats['sum']}", fontsize=12)
-    plt.text(0.1, 0.50, f"Mean sales: {stats['mean']:.1f}", fontsize=12)
-    plt.text(0.1, 0.45, f"Median sales: {stats['median']:.1f}", fontsize=12)
-    plt.text(0.1, 0.40, f"Sales standard deviation (population): {stats['std']:.1f}", fontsize=12)
-    pdf.savefig(fig)
-    plt.close(fig)
-    # add the saved figures
-    for fname in [fig1_path, fig2_path, fig3_path, fig4_path]:
-        img = plt.imread(fname)
+summary_cols = [c for c in ("Model", "Prev_Rank", "Rank_Change") if c in df.columns]
+def write_pdf(path):
+    with PdfPages(path, metadata={"CreationDate": None}) as pdf:
         fig = plt.figure(figsize=(11,8.5))
-        plt.imshow(img)
+        fig.suptitle("Top 20 Model Sales Report - Extracted data", fontsize=18)
         plt.axis("off")
+        plt.text(0.1, 0.6, f"Total models: {stats['count']}", fontsize=12)
+        plt.text(0.1, 0.55, f"Total sales (sum): {stats['sum']}", fontsize=12)
+        plt.text(0.1, 0.50, f"Mean sales: {stats['mean']:.1f}", fontsize=12)
+        plt.text(0.1, 0.45, f"Median sales: {stats['median']:.1f}", fontsize=12)
+        plt.text(0.1, 0.40, f"Sales standard deviation (population): {stats['std']:.1f}", fontsize=12)
+        if "Rank_Change" in df.columns:
+            movers = df.dropna(subset=["Rank_Change"]).sort_values("Rank_Change", ascending=False)
+            new_entries = df.loc[df["Prev_Rank"].isna() | (df["Prev_Rank"] > TOP_N), "Model"]
+            if len(movers):
+                up, down = movers.iloc[0], movers.iloc[-1]
+                plt.text(0.1, 0.33, f"Biggest climber: {up['Model']} ({int(up['Rank_Change']):+d})", fontsize=12)
+                plt.text(0.1, 0.28, f"Biggest faller: {down['Model']} ({int(down['Rank_Change']):+d})", fontsize=12)
+            if len(new_entries):
+                plt.text(0.1, 0.23, f"New in top {TOP_N}: {', '.join(new_entries)}", fontsize=12)
         pdf.savefig(fig)
         plt.close(fig)
+        if pdf_compact.COMPACT:
+            # vector pages: no full-page rasters
+            for draw in (draw_bar, draw_pie, draw_boxplot, draw_cumulative):
+                draw(pdf)
+            return
+        # add the saved figures
+        for fname in [fig1_path, fig2_path, fig3_path, fig4_path]:
+            img = plt.imread(fname)
+            fig = plt.figure(figsize=(11,8.5))
+            plt.imshow(img)
+            plt.axis("off")
+            pdf.savefig(fig)
+            plt.close(fig)
+def render_pdf(path):
+    with pdf_compact.output(path, label=os.path.basename(pdf_path)):
+        write_pdf(path)
+cache.build(pdf_path, render_pdf, inputs=[stats, df[summary_cols], pdf_compact.COMPACT],
+            deps=[fig1_path, fig2_path, fig3_path, fig4_path], sources=[__file__])
 
-# Create interactive dashboard (Plotly) if available
-dashboard_html = os.path.join(out_dir, "dashboard.html")
-if PLOTLY_AVAILABLE:
-    fig_bar = px.bar(df.sort_values("Sales", ascending=False), x="Sales", y="Model", orientation="h", title="Top 20 Models by Sales")
-    fig_pie = px.pie(df, names="Model", values="Sales", title="Sales share by Model (Top 20)")
-    fig_maker = px.bar(maker_summary, x="sum", y="Maker", orientation="h", title="Sales by Maker (aggregated)")
-    with open(dashboard_html, "w", encoding="utf-8") as f:
-        f.write("<html><head><meta charset='utf-8'><title>Car Sales Dashboard</title></head><body>")
-        f.write("<h1>Car Sales Dashboard (Top 20)</h1>")
-        f.write("<h2>Interactive Charts</h2>")
-        f.write(fig_bar.to_html(full_html=False, include_plotlyjs='cdn'))
-        f.write("<hr>")
-        f.write(fig_pie.to_html(full_html=False, include_plotlyjs=False))
-        f.write("<hr>")
-        f.write(fig_maker.to_html(full_html=False, include_plotlyjs=False))
-        f.write("<hr>")
-        f.write("<h2>Data Table</h2>")
-        f.write(df.to_html(index=False))
-        f.write("</body></html>")
+# Create interactive dashboard: local plotly.js, columnar data file, paginated table
+# (see car_sales_dashboard.py). With raw records the table lists every model.
+if totals is not None:
+    with run_trace.span("transform", "all models", rows=len(totals.by_model)):
+        table = totals.top_models(len(totals.by_model))
+        table["Maker"] = maker_classifier.classify_series(table["Model"])
 else:
-    # create a simple HTML page with static images and table
-    with open(dashboard_html, "w", encoding="utf-8") as f:
-        f.write("<html><head><meta charset='utf-8'><title>Car Sales Dashboard (static)</title></head><body>")
-        f.write("<h1>Car Sales Dashboard (Top 20) - Static</h1>")
-        f.write("<h2>Charts (images)</h2>")
-        f.write(f"<img src='bar_sales_by_model.png' style='max-width:100%;'><br><hr>")
-        f.write(f"<img src='pie_top5_vs_others.png' style='max-width:100%;'><br><hr>")
-        f.write(f"<img src='boxplot_sales.png' style='max-width:100%;'><br><hr>")
-        f.write(f"<img src='cumulative_pct.png' style='max-width:100%;'><br><hr>")
-        f.write("<h2>Data Table</h2>")
-        f.write(df.to_html(index=False))
-        f.write("</body></html>")
-    # copy images to out_dir (already saved there), nothing else required
+    table = df[["Rank", "Model", "Sales", "Maker"]]
+figures = []
+if PLOTLY_AVAILABLE:
+    figures.append(px.bar(df.sort_values("Sales", ascending=False), x="Sales", y="Model", orientation="h", title="Top 20 Models by Sales"))
+    figures.append(px.pie(df, names="Model", values="Sales", title="Sales share by Model (Top 20)"))
+    figures.append(px.bar(maker_summary, x="sum", y="Maker", orientation="h", title="Sales by Maker (aggregated)"))
+    if totals is not None and not totals.by_month.empty:
+        monthly = totals.monthly()
+        figures.append(go.Figure(car_sales_dashboard.line_trace(monthly["Month"], monthly["Sales"], "Sales"),
+                                 layout={"title": "Monthly Sales"}))
+dashboard_html = car_sales_dashboard.build(out_dir, table, figures=figures,
+                                           images=[fig1_path, fig2_path, fig3_path, fig4_path],
+                                           title=f"Car Sales Dashboard (Top {TOP_N})")
+
+# Typed tables with REPORT_EXPORT=arrow,parquet,ndjson (see report_export.py); with raw
+# records "models" covers every model, not just the top N
+report_export.export("car_sales_report", {
+    "top_models": df, "models": table, "maker_summary": maker_summary,
+    "monthly": totals.monthly() if totals is not None and not totals.by_month.empty else None,
+})
+
+# Excel workbook for finance with CAR_SALES_XLSX=1 (or a path), streamed in constant
+# memory with numeric cells (see excel_export.py)
+xlsx_path = os.environ.get("CAR_SALES_XLSX")
+if xlsx_path:
+    xlsx_path = os.path.join(out_dir, "car_sales.xlsx") if xlsx_path == "1" else xlsx_path
+    top_cols = [c for c in ("Rank", "Model", "Maker", "Sales", "Cumulative", "Cumulative_pct",
+                            "Prev_Rank", "Rank_Change") if c in df.columns]
+    rows = excel_export.write_workbook(xlsx_path, {
+        "Top Models": df[top_cols],
+        "All Models": table,
+        "Makers": maker_summary.rename(columns={"sum": "Sales", "count": "Models"}),
+        "Monthly": totals.monthly() if totals is not None and not totals.by_month.empty else None,
+    }, formats={"Top Models": {"Rank": "0", "Prev_Rank": "0", "Rank_Change": "+0;-0;0",
+                               "Cumulative_pct": excel_export.PERCENT_POINTS},
+                "All Models": {"Rank": "0"}},
+       widths={"Top Models": {"Model": 36}, "All Models": {"Model": 36}, "Makers": {"Maker": 20}})
+    print(" - Excel:", xlsx_path, f"({', '.join(f'{k} {v:,} rows' for k, v in rows.items())})")
+
+# Persist the updated totals for next month, and the build manifest
+if state is not None:
+    state.save(state_dir)
+cache.save()
 
 # Summarize outputs
 print("Created files in:", out_dir)
@@ -212,4 +302,5 @@ print(" - CSV:", csv_path)
 print(" - PDF report:", pdf_path)
 print(" - Dashboard (HTML):", dashboard_html)
 print(" - Figures:", fig1_path, fig2_path, fig3_path, fig4_path)
+print(" - Build cache:", cache.summary())
 
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Streaming Registration Aggregation for car_sales_report.py
+Reads raw registration records (CSV or Parquet, tens of millions of rows)
+in chunks and keeps only running totals per model, month and region, so
+memory depends on the number of distinct models/months, not on rows.
+
+Expected columns (case-insensitive, aliases allowed):
+- Model   model string, e.g. "小米 SU7 (Xiaomi)"
+- Sales   units per record (defaults to 1 per row when absent)
+- Month   registration date or YYYY-MM (optional)
+- Region  province/city (optional)
+
+Makers are derived from the per-model totals at the end, since the maker
+is a function of the model string.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+import maker_classifier
+import sketches
+import run_trace
+
+DEFAULT_CHUNKSIZE = 1_000_000
+
+ALIASES = {
+    "model": "Model", "model_name": "Model", "车型": "Model",
+    "sales": "Sales", "units": "Sales", "registrations": "Sales", "count": "Sales", "销量": "Sales",
+    "month": "Month", "date": "Month", "registration_date": "Month", "period": "Month",
+    "region": "Region", "province": "Region", "city": "Region",
+}
+
+
+# -------------------------------
+# 1. Chunked readers
+# -------------------------------
+def _canonical(columns):
+    return {c: ALIASES.get(str(c).strip().lower(), c) for c in columns}
+
+
+def iter_chunks(path, chunksize=DEFAULT_CHUNKSIZE):
+    """Yield DataFrame chunks with canonical column names"""
+    if path.lower().endswith((".parquet", ".pq")) or os.path.isdir(path):
+        import pyarrow.dataset as ds
+        dataset = ds.dataset(path, format="parquet")
+        rename = _canonical(dataset.schema.names)
+        wanted = [c for c, canon in rename.items() if canon in ("Model", "Sales", "Month", "Region")]
+        for batch in dataset.to_batches(columns=wanted, batch_size=chunksize):
+            yield batch.to_pandas().rename(columns=rename)
+    else:
+        header = pd.read_csv(path, nrows=0).columns
+        rename = _canonical(header)
+        dtypes = {c: "category" for c, canon in rename.items() if canon in ("Model", "Month", "Region")}
+        usecols = [c for c, canon in rename.items() if canon in ("Model", "Sales", "Month", "Region")]
+        for chunk in pd.read_csv(path, usecols=usecols, dtype=dtypes, chunksize=chunksize):
+            yield chunk.rename(columns=rename)
+
+
+def _month_keys(months):
+    # Parse each distinct value once, then broadcast through the codes
+    cat = months.astype("category")
+    labels = pd.to_datetime(cat.cat.categories.astype(str), errors="coerce").strftime("%Y-%m")
+    lookup = np.append(np.asarray(labels, dtype=object), None)  # code -1 (missing) → None
+    return pd.Series(lookup[cat.cat.codes], index=months.index)
+
+
+# -------------------------------
+# 2. Running totals
+# -------------------------------
+class RunningTotals:
+    def __init__(self):
+        self.by_model = pd.Series(dtype="int64")
+        self.by_month = pd.Series(dtype="int64")
+        self.by_region = pd.Series(dtype="int64")
+        self.rows = 0
+
+    @staticmethod
+    def _add(total, part):
+        part = part.astype("int64")
+        return part if total.empty else total.add(part, fill_value=0).astype("int64")
+
+    def update(self, chunk):
+        if "Sales" not in chunk.columns:
+            chunk = chunk.assign(Sales=1)
+        chunk = chunk.dropna(subset=["Model"])
+        sales = chunk["Sales"].fillna(0)
+        self.by_model = self._add(self.by_model,
+                                  sales.groupby(chunk["Model"], observed=True).sum())
+        if "Month" in chunk.columns:
+            self.by_month = self._add(self.by_month,
+                                      sales.groupby(_month_keys(chunk["Month"]), observed=True).sum())
+        if "Region" in chunk.columns:
+            self.by_region = self._add(self.by_region,
+                                       sales.groupby(chunk["Region"], observed=True).sum())
+        self.rows += len(chunk)
+        return self
+
+    def merge(self, other):
+        """Combine totals from another reader (e.g. one per month file or worker)"""
+        self.by_model = self._add(self.by_model, other.by_model)
+        self.by_month = self._add(self.by_month, other.by_month)
+        self.by_region = self._add(self.by_region, other.by_region)
+        self.rows += other.rows
+        return self
+
+    # -------------------------------
+    # Report-shaped outputs
+    # -------------------------------
+    def top_models(self, n=20):
+        """Rank, Model, Sales for the n best-selling models (car_sales_report.py's `df`)"""
+        top = self.by_model.nlargest(n)
+        return pd.DataFrame({"Rank": np.arange(1, len(top) + 1),
+                             "Model": top.index.astype(str),
+                             "Sales": top.values})
+
+    def sales_sketch(self, chunksize=DEFAULT_CHUNKSIZE):
+        """SummarySketch over every model's total, fed in chunks"""
+        values = self.by_model.values
+        return sketches.SummarySketch.from_chunks(
+            values[i:i + chunksize] for i in range(0, len(values), chunksize))
+
+    def stats(self, sketch=None):
+        """Same keys as car_sales_report.py's stats, over every model's total"""
+        return sketch_stats(sketch or self.sales_sketch())
+
+    def maker_summary(self):
+        makers = maker_classifier.classify_series(pd.Series(self.by_model.index.astype(str)))
+        summary = pd.Series(self.by_model.values).groupby(makers.values, observed=True) \
+            .agg(["sum", "count"]).sort_values("sum", ascending=False)
+        return summary.rename_axis("Maker").reset_index()
+
+    def monthly(self):
+        return self.by_month.sort_index().rename_axis("Month").rename("Sales").reset_index()
+
+
+def sketch_stats(sketch):
+    """car_sales_report.py's stats dict from a SummarySketch (median within the
+    digest's error bound, everything else exact)"""
+    m = sketch.moments
+    return {
+        "count": int(m.count),
+        "sum": int(m.sum),
+        "mean": float(m.mean),
+        "median": sketch.median(),
+        "std": m.std(ddof=0),
+        "min": int(m.min),
+        "max": int(m.max),
+    }
+
+
+def aggregate(path, chunksize=DEFAULT_CHUNKSIZE):
+    """Stream `path` once and return its RunningTotals"""
+    totals = RunningTotals()
+    with run_trace.span("parse", os.path.basename(path)) as attrs:
+        for chunk in iter_chunks(path, chunksize):
+            totals.update(chunk)
+        attrs["rows"] = totals.rows
+    return totals
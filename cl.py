@@ -15,6 +15,15 @@ from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, Tabl
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 
+import pdf_compact
+import snapshot_store
+import snapshot_diff
+import report_export
+import run_trace
+
+# Stage timings and counters for this run (see run_trace.py)
+run_trace.start("top_20_penny_stocks")
+
 # -----------------------------
 # 1. Define sample US tickers
 # -----------------------------
@@ -32,29 +41,47 @@ data = []
 for ticker in tickers:
     try:
         t = yf.Ticker(ticker)
-        hist = t.history(period="1d")
+        hist = run_trace.fetch(ticker, t.history, period="1d")
         if hist.empty:
             continue  # Skip delisted/no data
         close = hist['Close'].iloc[-1]
         volume = hist['Volume'].iloc[-1]
-        if close < 5:  # Penny stock filter
-            data.append([ticker, f"${close:.2f}", f"{volume:,}"])
+        data.append([ticker, float(close), int(volume) if pd.notna(volume) else 0])
     except Exception:
         continue
 
 # -----------------------------
 # 3. Sort by volume, top 20
 # -----------------------------
-df = pd.DataFrame(data, columns=["Ticker", "Price", "Volume"])
-df = df.sort_values("Volume", ascending=False).head(20)
+with run_trace.span("transform", "rank and diff", rows=len(data)):
+    universe = pd.DataFrame(data, columns=["symbol", "price", "volume"])
+    universe["penny"] = universe["price"] < 5  # Penny stock filter
+    universe = universe.sort_values(["penny", "volume"], ascending=False, kind="stable")
+    # The snapshot keeps every fetched ticker (penny stocks first, in table
+    # order), so later runs can see prices crossing $5 (see snapshot_store.py)
+    snapshot_store.record("penny_stocks", universe)
+
+    top = universe[universe["penny"]].head(20)
+    # Changes since the last stored run: list entries/exits, rank moves and
+    # prices crossing $5 either way (see snapshot_diff.py)
+    prior, since = snapshot_diff.previous("penny_stocks")
+    penny_prior = prior[prior["penny"].astype(bool)] if len(prior) else prior
+    changes = snapshot_diff.summary(snapshot_diff.compare(top, penny_prior.head(20), top_n=20), top_n=20)
+    crossed = snapshot_diff.crossings(snapshot_diff.compare(universe, prior, value="price"), "price", 5)
+    changes += snapshot_diff.crossing_lines(*crossed, "price", 5)
+
+df = pd.DataFrame({"Ticker": top["symbol"],
+                   "Price": [f"${p:.2f}" for p in top["price"]],
+                   "Volume": [f"{v:,}" for v in top["volume"]]})
 
 # -----------------------------
 # 4. Export to PDF
 # -----------------------------
-def export_pdf(df, filename="Top_20_Penny_Stocks.pdf"):
+def export_pdf(df, changes=(), since=None, filename="Top_20_Penny_Stocks.pdf"):
     doc = SimpleDocTemplate(filename, pagesize=LETTER,
                             rightMargin=0.75*inch, leftMargin=0.75*inch,
-                            topMargin=1*inch, bottomMargin=0.75*inch)
+                            topMargin=1*inch, bottomMargin=0.75*inch,
+                            **pdf_compact.reportlab_options())
     styles = getSampleStyleSheet()
     story = []
 
@@ -88,6 +115,11 @@ def export_pdf(df, filename="Top_20_Penny_Stocks.pdf"):
     table.setStyle(TableStyle(style_cmds))
     story.append(table)
 
+    # Day-over-day changes
+    story.append(Spacer(1, 0.25*inch))
+    story.append(Paragraph("Changes", styles['Heading2']))
+    story.append(snapshot_diff.changes_table(changes, since, width=5.5*inch))
+
     # Footer
     footer_style = ParagraphStyle('Footer', parent=styles['Normal'], fontSize=9,
                                   textColor=colors.grey, alignment=1, spaceBefore=20)
@@ -98,10 +130,13 @@ def export_pdf(df, filename="Top_20_Penny_Stocks.pdf"):
     story.append(Spacer(1, 0.3*inch))
     story.append(footer)
 
-    doc.build(story)
+    with pdf_compact.output(filename):
+        doc.build(story)
     print(f"PDF report saved as → {filename}")
 
 # -----------------------------
 # 5. Run PDF export
 # -----------------------------
-export_pdf(df)
+export_pdf(df, changes, since)
+# Typed tables with REPORT_EXPORT=arrow,parquet,ndjson (see report_export.py)
+report_export.export("top_20_penny_stocks", {"universe": universe, "top20": top})
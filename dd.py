@@ -5,16 +5,20 @@ Generates comprehensive insights and exports to PDF
 """
 
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-from matplotlib.backends.backend_pdf import PdfPages
-import numpy as np
-from datetime import datetime
+import os
 
-# Set style for better visualizations
-sns.set_style("whitegrid")
-plt.rcParams['figure.figsize'] = (11, 8.5)
-plt.rcParams['font.size'] = 9
+import snap_dashboard
+import lod_render
+import snap_stats
+import sketches
+import build_cache
+import pdf_compact
+import report_export
+import excel_export
+import run_trace
+
+# Stage timings and counters for this run (see run_trace.py)
+run_trace.start("snap_issuance_dashboard")
 
 # SNAP Issuance Data
 data = """State	FY-2019 Issuance	FY-2020 Issuance	FY-2021 Issuance	
@@ -72,18 +76,31 @@ West Virginia	397,899,950	516,954,512	772,297,950
 Wisconsin	778,373,061	1,108,618,259	1,964,034,853	
 Wyoming	36,277,115	45,887,728	73,313,685"""
 
-# Parse data using heredoc-style approach
-from io import StringIO
-df = pd.read_csv(StringIO(data), sep='\t', thousands=',')
+# Real USDA exports (CSV/Excel, or an existing cache directory) are streamed
+# into a Parquet cache by snap_ingest.py and memory-mapped on later runs:
+#   SNAP_SOURCE=FY19-21.csv [SNAP_CACHE_DIR=snap_cache] python dd.py
+SNAP_SOURCE = os.environ.get("SNAP_SOURCE")
+
+if SNAP_SOURCE:
+    import snap_ingest
+    cache_dir = snap_ingest.ensure_cache(SNAP_SOURCE, os.environ.get("SNAP_CACHE_DIR"))
+    with run_trace.span("transform", "state totals"):
+        df = snap_ingest.load_wide(cache_dir, fiscal_years=(2019, 2020, 2021))
+    df = df[['State', 'FY2019', 'FY2020', 'FY2021']].dropna().reset_index(drop=True)
+else:
+    # Parse data using heredoc-style approach
+    from io import StringIO
+    with run_trace.span("parse", "inline table"):
+        df = pd.read_csv(StringIO(data), sep='\t', thousands=',')
 
-# Remove any empty columns
-df = df.dropna(axis=1, how='all')
+    # Remove any empty columns
+    df = df.dropna(axis=1, how='all')
 
-# Clean column names - handle extra columns
-if len(df.columns) > 4:
-    df = df.iloc[:, :4]  # Keep only first 4 columns
+    # Clean column names - handle extra columns
+    if len(df.columns) > 4:
+        df = df.iloc[:, :4]  # Keep only first 4 columns
 
-df.columns = ['State', 'FY2019', 'FY2020', 'FY2021']
+    df.columns = ['State', 'FY2019', 'FY2020', 'FY2021']
 
 # Calculate additional metrics
 df['Total_Issuance'] = df[['FY2019', 'FY2020', 'FY2021']].sum(axis=1)
@@ -92,299 +109,64 @@ df['Growth_2020_2021'] = ((df['FY2021'] - df['FY2020']) / df['FY2020'] * 100)
 df['Total_Growth'] = ((df['FY2021'] - df['FY2019']) / df['FY2019'] * 100)
 df['Avg_Annual_Issuance'] = df['Total_Issuance'] / 3
 
-# Statistical Summary
-stats_summary = {
-    'FY2019': df['FY2019'].describe(),
-    'FY2020': df['FY2020'].describe(),
-    'FY2021': df['FY2021'].describe()
-}
+# Statistical Summary (mergeable per-year sketches, shared with the dashboard)
+with run_trace.span("transform", "year sketches", rows=len(df)):
+    sketches_by_year = snap_dashboard.year_sketches(df)
+stats_summary = {year: pd.Series(sketch.describe()) for year, sketch in sketches_by_year.items()}
+
+# County breakdown (page 5 heatmap, per-state pages) when the cache has county rows
+counties = None
+if SNAP_SOURCE:
+    with run_trace.span("transform", "county totals"):
+        counties = snap_ingest.load_counties(cache_dir, fiscal_years=(2019, 2020, 2021)).dropna()
+
+# One page per state with SNAP_STATE_PAGES=1
+per_state = os.environ.get("SNAP_STATE_PAGES") == "1"
 
-# Create PDF with multiple pages
+# Create PDF page by page (see snap_dashboard.py); SNAP_WORKERS > 1 renders in parallel.
+# Skipped when the data and the rendering code are unchanged (see build_cache.py)
 pdf_filename = 'SNAP_Issuance_Analysis_Dashboard.pdf'
-with PdfPages(pdf_filename) as pdf:
-    
-    # PAGE 1: Title and Executive Summary
-    fig = plt.figure(figsize=(11, 8.5))
-    fig.suptitle('SNAP Issuance Analysis Dashboard\nFY 2019-2021', 
-                 fontsize=20, fontweight='bold', y=0.95)
-    
-    ax = fig.add_subplot(111)
-    ax.axis('off')
-    
-    summary_text = f"""
-    EXECUTIVE SUMMARY
-    
-    Analysis Period: FY 2019 - FY 2021
-    Generated: {datetime.now().strftime('%B %d, %Y')}
-    
-    KEY FINDINGS:
-    
-    • Total SNAP Issuance (All States, 3 Years): ${df['Total_Issuance'].sum():,.0f}
-    
-    • National Year-over-Year Growth:
-      - FY 2019 → 2020: {df['Growth_2019_2020'].mean():.1f}% average increase
-      - FY 2020 → 2021: {df['Growth_2020_2021'].mean():.1f}% average increase
-      - Overall Growth (2019-2021): {df['Total_Growth'].mean():.1f}% average
-    
-    • Top 5 States by Total Issuance (FY 2019-2021):
-      1. {df.nlargest(1, 'Total_Issuance').iloc[0]['State']}: ${df.nlargest(1, 'Total_Issuance').iloc[0]['Total_Issuance']:,.0f}
-      2. {df.nlargest(2, 'Total_Issuance').iloc[1]['State']}: ${df.nlargest(2, 'Total_Issuance').iloc[1]['Total_Issuance']:,.0f}
-      3. {df.nlargest(3, 'Total_Issuance').iloc[2]['State']}: ${df.nlargest(3, 'Total_Issuance').iloc[2]['Total_Issuance']:,.0f}
-      4. {df.nlargest(4, 'Total_Issuance').iloc[3]['State']}: ${df.nlargest(4, 'Total_Issuance').iloc[3]['Total_Issuance']:,.0f}
-      5. {df.nlargest(5, 'Total_Issuance').iloc[4]['State']}: ${df.nlargest(5, 'Total_Issuance').iloc[4]['Total_Issuance']:,.0f}
-    
-    • Highest Growth States (FY 2019-2021):
-      1. {df.nlargest(1, 'Total_Growth').iloc[0]['State']}: {df.nlargest(1, 'Total_Growth').iloc[0]['Total_Growth']:.1f}%
-      2. {df.nlargest(2, 'Total_Growth').iloc[1]['State']}: {df.nlargest(2, 'Total_Growth').iloc[1]['Total_Growth']:.1f}%
-      3. {df.nlargest(3, 'Total_Growth').iloc[2]['State']}: {df.nlargest(3, 'Total_Growth').iloc[2]['Total_Growth']:.1f}%
-    
-    INSIGHTS:
-    
-    • Significant increase in SNAP issuance across all states from 2019 to 2021,
-      likely reflecting economic impacts of the COVID-19 pandemic
-    
-    • Large states (CA, TX, FL, NY) dominate total issuance volumes
-    
-    • Growth rates vary significantly by state, indicating different regional
-      economic impacts and policy responses
-    """
-    
-    ax.text(0.1, 0.5, summary_text, fontsize=11, verticalalignment='center',
-            fontfamily='monospace', bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.3))
-    
-    pdf.savefig(fig, bbox_inches='tight')
-    plt.close()
-    
-    # PAGE 2: Top 15 States by Total Issuance
-    fig, ax = plt.subplots(figsize=(11, 8.5))
-    top15 = df.nlargest(15, 'Total_Issuance')
-    
-    x = np.arange(len(top15))
-    width = 0.25
-    
-    bars1 = ax.bar(x - width, top15['FY2019']/1e9, width, label='FY 2019', alpha=0.8)
-    bars2 = ax.bar(x, top15['FY2020']/1e9, width, label='FY 2020', alpha=0.8)
-    bars3 = ax.bar(x + width, top15['FY2021']/1e9, width, label='FY 2021', alpha=0.8)
-    
-    ax.set_xlabel('State', fontweight='bold', fontsize=12)
-    ax.set_ylabel('SNAP Issuance (Billions $)', fontweight='bold', fontsize=12)
-    ax.set_title('Top 15 States by Total SNAP Issuance (FY 2019-2021)', 
-                 fontweight='bold', fontsize=14, pad=20)
-    ax.set_xticks(x)
-    ax.set_xticklabels(top15['State'], rotation=45, ha='right')
-    ax.legend(loc='upper right')
-    ax.grid(axis='y', alpha=0.3)
-    
-    plt.tight_layout()
-    pdf.savefig(fig, bbox_inches='tight')
-    plt.close()
-    
-    # PAGE 3: Growth Rate Analysis
-    fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(11, 8.5))
-    
-    # Top 15 by growth rate
-    top_growth = df.nlargest(15, 'Total_Growth')
-    ax1.barh(top_growth['State'], top_growth['Total_Growth'], color='steelblue', alpha=0.7)
-    ax1.set_xlabel('Total Growth Rate (%)', fontweight='bold')
-    ax1.set_title('Top 15 States by Growth Rate (FY 2019-2021)', fontweight='bold', fontsize=12)
-    ax1.grid(axis='x', alpha=0.3)
-    
-    # Year-over-year growth comparison
-    growth_comparison = df.nlargest(10, 'Total_Issuance')[['State', 'Growth_2019_2020', 'Growth_2020_2021']]
-    x = np.arange(len(growth_comparison))
-    width = 0.35
-    
-    ax2.bar(x - width/2, growth_comparison['Growth_2019_2020'], width, 
-            label='2019→2020', alpha=0.8, color='coral')
-    ax2.bar(x + width/2, growth_comparison['Growth_2020_2021'], width, 
-            label='2020→2021', alpha=0.8, color='lightseagreen')
-    
-    ax2.set_xlabel('State', fontweight='bold')
-    ax2.set_ylabel('Growth Rate (%)', fontweight='bold')
-    ax2.set_title('Year-over-Year Growth: Top 10 States by Total Issuance', 
-                  fontweight='bold', fontsize=12)
-    ax2.set_xticks(x)
-    ax2.set_xticklabels(growth_comparison['State'], rotation=45, ha='right')
-    ax2.legend()
-    ax2.grid(axis='y', alpha=0.3)
-    ax2.axhline(y=0, color='black', linestyle='-', linewidth=0.5)
-    
-    plt.tight_layout()
-    pdf.savefig(fig, bbox_inches='tight')
-    plt.close()
-    
-    # PAGE 4: Statistical Distribution
-    fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(11, 8.5))
-    fig.suptitle('Statistical Distribution Analysis', fontweight='bold', fontsize=14)
-    
-    # Box plots for each year
-    data_to_plot = [df['FY2019']/1e6, df['FY2020']/1e6, df['FY2021']/1e6]
-    bp = ax1.boxplot(data_to_plot, labels=['FY 2019', 'FY 2020', 'FY 2021'], patch_artist=True)
-    for patch in bp['boxes']:
-        patch.set_facecolor('lightblue')
-    ax1.set_ylabel('SNAP Issuance (Millions $)', fontweight='bold')
-    ax1.set_title('Distribution by Fiscal Year', fontweight='bold')
-    ax1.grid(axis='y', alpha=0.3)
-    
-    # Histogram of FY 2021
-    ax2.hist(df['FY2021']/1e6, bins=20, color='steelblue', alpha=0.7, edgecolor='black')
-    ax2.set_xlabel('SNAP Issuance (Millions $)', fontweight='bold')
-    ax2.set_ylabel('Number of States', fontweight='bold')
-    ax2.set_title('FY 2021 Issuance Distribution', fontweight='bold')
-    ax2.grid(axis='y', alpha=0.3)
-    
-    # Scatter plot: FY2019 vs FY2021
-    ax3.scatter(df['FY2019']/1e6, df['FY2021']/1e6, alpha=0.6, s=50)
-    ax3.set_xlabel('FY 2019 Issuance (Millions $)', fontweight='bold')
-    ax3.set_ylabel('FY 2021 Issuance (Millions $)', fontweight='bold')
-    ax3.set_title('FY 2019 vs FY 2021 Comparison', fontweight='bold')
-    
-    # Add diagonal line
-    max_val = max(df['FY2021'].max(), df['FY2019'].max()) / 1e6
-    ax3.plot([0, max_val], [0, max_val], 'r--', alpha=0.5, label='Equal Line')
-    ax3.legend()
-    ax3.grid(alpha=0.3)
-    
-    # Growth rate distribution
-    ax4.hist(df['Total_Growth'], bins=20, color='coral', alpha=0.7, edgecolor='black')
-    ax4.set_xlabel('Total Growth Rate (%)', fontweight='bold')
-    ax4.set_ylabel('Number of States', fontweight='bold')
-    ax4.set_title('Growth Rate Distribution (2019-2021)', fontweight='bold')
-    ax4.axvline(x=df['Total_Growth'].mean(), color='red', linestyle='--', 
-                linewidth=2, label=f'Mean: {df["Total_Growth"].mean():.1f}%')
-    ax4.legend()
-    ax4.grid(axis='y', alpha=0.3)
-    
-    plt.tight_layout()
-    pdf.savefig(fig, bbox_inches='tight')
-    plt.close()
-    
-    # PAGE 5: Regional Analysis (Pie Chart and Heatmap)
-    fig = plt.figure(figsize=(11, 8.5))
-    fig.suptitle('Regional and Comparative Analysis', fontweight='bold', fontsize=14)
-    
-    # Top 10 states pie chart for FY 2021
-    ax1 = plt.subplot(2, 2, (1, 2))
-    top10_fy2021 = df.nlargest(10, 'FY2021')
-    others = df.nsmallest(len(df) - 10, 'FY2021')['FY2021'].sum()
-    
-    pie_data = list(top10_fy2021['FY2021']) + [others]
-    pie_labels = list(top10_fy2021['State']) + ['Others']
-    
-    colors = plt.cm.Set3(np.linspace(0, 1, len(pie_data)))
-    ax1.pie(pie_data, labels=pie_labels, autopct='%1.1f%%', startangle=90, colors=colors)
-    ax1.set_title('FY 2021 Issuance Share (Top 10 States + Others)', fontweight='bold', pad=20)
-    
-    # Heatmap of year-over-year data for top 20 states
-    ax2 = plt.subplot(2, 1, 2)
-    top20 = df.nlargest(20, 'Total_Issuance')
-    heatmap_data = top20[['FY2019', 'FY2020', 'FY2021']].T
-    heatmap_data.columns = top20['State']
-    
-    # Normalize for better visualization
-    heatmap_normalized = (heatmap_data - heatmap_data.min()) / (heatmap_data.max() - heatmap_data.min())
-    
-    im = ax2.imshow(heatmap_normalized, aspect='auto', cmap='YlOrRd')
-    ax2.set_xticks(np.arange(len(top20)))
-    ax2.set_yticks(np.arange(3))
-    ax2.set_xticklabels(top20['State'], rotation=45, ha='right', fontsize=8)
-    ax2.set_yticklabels(['FY 2019', 'FY 2020', 'FY 2021'])
-    ax2.set_title('Normalized Issuance Heatmap (Top 20 States)', fontweight='bold', pad=10)
-    
-    plt.colorbar(im, ax=ax2, label='Normalized Issuance')
-    
-    plt.tight_layout()
-    pdf.savefig(fig, bbox_inches='tight')
-    plt.close()
-    
-    # PAGE 6: Statistical Summary Table
-    fig, ax = plt.subplots(figsize=(11, 8.5))
-    ax.axis('tight')
-    ax.axis('off')
-    
-    fig.suptitle('Statistical Summary Tables', fontweight='bold', fontsize=14, y=0.98)
-    
-    # Summary statistics
-    summary_data = []
-    for year in ['FY2019', 'FY2020', 'FY2021']:
-        summary_data.append([
-            year,
-            f"${df[year].sum()/1e9:.2f}B",
-            f"${df[year].mean()/1e6:.2f}M",
-            f"${df[year].median()/1e6:.2f}M",
-            f"${df[year].std()/1e6:.2f}M",
-            f"${df[year].min()/1e6:.2f}M",
-            f"${df[year].max()/1e9:.2f}B"
-        ])
-    
-    table1 = ax.table(cellText=summary_data,
-                     colLabels=['Year', 'Total', 'Mean', 'Median', 'Std Dev', 'Min', 'Max'],
-                     cellLoc='center',
-                     loc='upper center',
-                     bbox=[0.1, 0.7, 0.8, 0.25])
-    table1.auto_set_font_size(False)
-    table1.set_fontsize(10)
-    table1.scale(1, 2)
-    
-    # Style header
-    for i in range(7):
-        table1[(0, i)].set_facecolor('#4CAF50')
-        table1[(0, i)].set_text_props(weight='bold', color='white')
-    
-    # Top/Bottom performers
-    performers_data = []
-    top5 = df.nlargest(5, 'Total_Growth')
-    bottom5 = df.nsmallest(5, 'Total_Growth')
-    
-    ax.text(0.5, 0.6, 'Top 5 Growth States (2019-2021)', 
-            ha='center', fontweight='bold', fontsize=12, transform=ax.transAxes)
-    
-    for idx, row in top5.iterrows():
-        performers_data.append([row['State'], f"{row['Total_Growth']:.1f}%"])
-    
-    table2 = ax.table(cellText=performers_data,
-                     colLabels=['State', 'Growth Rate'],
-                     cellLoc='center',
-                     loc='center',
-                     bbox=[0.1, 0.35, 0.35, 0.2])
-    table2.auto_set_font_size(False)
-    table2.set_fontsize(9)
-    
-    for i in range(2):
-        table2[(0, i)].set_facecolor('#2196F3')
-        table2[(0, i)].set_text_props(weight='bold', color='white')
-    
-    ax.text(0.5, 0.3, 'Bottom 5 Growth States (2019-2021)', 
-            ha='center', fontweight='bold', fontsize=12, transform=ax.transAxes)
-    
-    performers_data2 = []
-    for idx, row in bottom5.iterrows():
-        performers_data2.append([row['State'], f"{row['Total_Growth']:.1f}%"])
-    
-    table3 = ax.table(cellText=performers_data2,
-                     colLabels=['State', 'Growth Rate'],
-                     cellLoc='center',
-                     loc='center',
-                     bbox=[0.55, 0.35, 0.35, 0.2])
-    table3.auto_set_font_size(False)
-    table3.set_fontsize(9)
-    
-    for i in range(2):
-        table3[(0, i)].set_facecolor('#FF9800')
-        table3[(0, i)].set_text_props(weight='bold', color='white')
-    
-    pdf.savefig(fig, bbox_inches='tight')
-    plt.close()
-    
-    # Set PDF metadata
-    d = pdf.infodict()
-    d['Title'] = 'SNAP Issuance Analysis Dashboard FY 2019-2021'
-    d['Author'] = 'Data Analysis System'
-    d['Subject'] = 'Statistical Analysis and Visualization'
-    d['Keywords'] = 'SNAP, Food Assistance, Statistical Analysis, Dashboard'
-    d['CreationDate'] = datetime.now()
+cache = build_cache.BuildCache()
+workers = int(os.environ.get("SNAP_WORKERS", "1"))
+pdf_compact.configure_matplotlib()
+def render_dashboard(path):
+    with pdf_compact.output(path, label=pdf_filename):
+        pages = snap_dashboard.build_dashboard(df, path, counties=counties, per_state=per_state,
+                                               workers=workers, sketches_by_year=sketches_by_year)
+    return {"pages": pages}
+rebuilt = cache.build(pdf_filename, render_dashboard, inputs=[df, counties, per_state, pdf_compact.COMPACT],
+                      sources=[snap_dashboard.__file__, lod_render.__file__, snap_stats.__file__,
+                               sketches.__file__])
+cache.save()
+pages = cache.meta(pdf_filename).get("pages")
+
+# Typed tables with REPORT_EXPORT=arrow,parquet,ndjson (see report_export.py)
+report_export.export("snap_issuance_dashboard", {
+    "states": df,
+    "statistics": pd.DataFrame(stats_summary).rename_axis("statistic"),
+    "counties": counties,
+})
+
+# Excel workbook for finance with SNAP_XLSX=1 (or a path), streamed in
+# constant memory with numeric cells (see excel_export.py)
+xlsx_path = os.environ.get("SNAP_XLSX")
+if xlsx_path:
+    xlsx_path = 'SNAP_Issuance_Analysis.xlsx' if xlsx_path == "1" else xlsx_path
+    money = {c: excel_export.CURRENCY for c in ('FY2019', 'FY2020', 'FY2021', 'Total_Issuance', 'Avg_Annual_Issuance')}
+    growth = {c: excel_export.PERCENT_POINTS for c in ('Growth_2019_2020', 'Growth_2020_2021', 'Total_Growth')}
+    rows = excel_export.write_workbook(xlsx_path, {
+        "States": df,
+        "Statistics": pd.DataFrame(stats_summary).rename_axis("Statistic"),
+        "Counties": counties if counties is not None and len(counties) else None,
+    }, formats={"States": {**money, **growth}, "Statistics": {c: excel_export.INTEGER for c in stats_summary},
+                "Counties": money},
+       widths={"States": {"State": 22}, "Counties": {"State": 22, "County": 28}})
+    print(f"✓ Excel workbook: {xlsx_path} ({', '.join(f'{k} {v:,} rows' for k, v in rows.items())})")
+
+if not rebuilt:
+    print(f"✓ {pdf_filename} is up to date")
 
 print(f"✓ Analysis complete! Dashboard exported to: {pdf_filename}")
-print(f"✓ Total pages: 6")
+print(f"✓ Total pages: {pages}")
 print(f"✓ States analyzed: {len(df)}")
 print(f"✓ Time period: FY 2019 - FY 2021")
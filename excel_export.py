@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Streaming Excel Export (constant memory)
+Writes .xlsx workbooks with xlsxwriter's constant_memory mode: each row is
+flushed to the sheet's temp file as soon as the next row starts, so
+memory stays flat however many rows go in (DataFrame.to_excel builds
+every cell as an object first, several hundred bytes per cell).
+- sources: a DataFrame, an Arrow table, an iterable of Arrow record
+  batches (e.g. a Parquet scan), or (columns, row iterator)
+- cells keep their native types: numbers via write_number with an Excel
+  number format per column (thousands separators, %, currency), dates
+  as Excel dates, blanks for NaN/None; no pre-formatted strings
+- one cell writer per column, chosen once from the Arrow type, then a
+  tight loop over each batch's Python values
+- a sheet that reaches Excel's row limit continues on "<name> (2)", ...
+
+Usage:
+  write_workbook("snap.xlsx", {"States": df, "Counties": parquet_batches},
+                 formats={"States": {"FY2019": CURRENCY}})
+
+Benchmark (time and peak RSS, each method in its own process):
+  python excel_export.py --bench 1000000
+"""
+
+import os
+import sys
+import time
+import datetime
+import argparse
+import resource
+import tempfile
+import subprocess
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import xlsxwriter
+
+import run_trace
+
+ROW_LIMIT = 1_048_576
+BATCH_ROWS = 65_536
+
+# Excel number formats
+INTEGER = "#,##0"
+DECIMAL = "#,##0.00"
+CURRENCY = "$#,##0"
+PERCENT_POINTS = '0.0"%"'   # values already in percent (12.5 → 12.5%)
+DATE = "yyyy-mm-dd"
+DATETIME = "yyyy-mm-dd hh:mm"
+
+
+# -------------------------------
+# 1. Sources → Arrow batches
+# -------------------------------
+def _batches(source):
+    """(schema or column names, iterator of batches or row tuples, is_rows)"""
+    if isinstance(source, tuple):
+        columns, rows = source
+        return list(columns), iter(rows), True
+    if isinstance(source, pd.DataFrame):
+        if any(n is not None for n in source.index.names):
+            source = source.reset_index()   # a named index becomes the first column(s)
+        if not all(isinstance(c, str) for c in source.columns):
+            source = source.rename(columns=str)
+        source = pa.Table.from_pandas(source, preserve_index=False)
+    if isinstance(source, pa.Table):
+        return source.schema, iter(source.to_batches(max_chunksize=BATCH_ROWS)), False
+    if isinstance(source, pa.RecordBatchReader):
+        return source.schema, iter(source), False
+    batches = iter(source)
+    first = next(batches, None)
+    if first is None:
+        return pa.schema([]), iter(()), False
+    return first.schema, _chain(first, batches), False
+
+
+def _chain(first, rest):
+    yield first
+    yield from rest
+
+
+def _default_format(typ):
+    if pa.types.is_integer(typ):
+        return INTEGER
+    if pa.types.is_floating(typ) or pa.types.is_decimal(typ):
+        return DECIMAL
+    if pa.types.is_date(typ):
+        return DATE
+    if pa.types.is_timestamp(typ):
+        return DATETIME
+    return None
+
+
+def _writer(ws, typ, fmt, date_fmt=None):
+    """Cell writer for one column's Python values (None/NaN → blank)"""
+    if typ is not None and (pa.types.is_integer(typ) or pa.types.is_floating(typ)
+                            or pa.types.is_decimal(typ) or pa.types.is_boolean(typ)):
+        def write(r, c, v):
+            if v is not None and v == v:
+                ws.write_number(r, c, v, fmt)
+    elif typ is not None and (pa.types.is_date(typ) or pa.types.is_timestamp(typ)):
+        def write(r, c, v):
+            if v is not None:
+                ws.write_datetime(r, c, v, fmt)
+    elif typ is not None and pa.types.is_dictionary(typ):
+        return _writer(ws, typ.value_type, fmt, date_fmt)
+    elif typ is not None:
+        def write(r, c, v):
+            if v is not None:
+                ws.write_string(r, c, str(v), fmt)
+    else:
+        # Row iterators: type per value
+        def write(r, c, v):
+            if v is None or (isinstance(v, float) and v != v):
+                return
+            if isinstance(v, (int, float, np.integer, np.floating)):
+                ws.write_number(r, c, v, fmt)
+            elif isinstance(v, (datetime.date, datetime.datetime)):
+                ws.write_datetime(r, c, v, fmt or date_fmt)
+            else:
+                ws.write_string(r, c, str(v), fmt)
+    return write
+
+
+# -------------------------------
+# 2. Workbook writer
+# -------------------------------
+class _Sheet:
+    """One logical table; opens continuation sheets at the row limit"""
+
+    def __init__(self, wb, name, names, types, formats, widths, header):
+        self.wb, self.name, self.names, self.types = wb, name, names, types
+        self.header = header
+        self.cell_formats = [wb.add_format({"num_format": formats[n]}) if formats.get(n) else None
+                             for n in names]
+        self.date_fmt = wb.add_format({"num_format": DATE})
+        self.widths = widths
+        self.part = 0
+        self.rows = 0
+        self._open()
+
+    def _open(self):
+        self.part += 1
+        title = self.name if self.part == 1 else f"{self.name} ({self.part})"
+        self.ws = self.wb.add_worksheet(title[:31])
+        for c, n in enumerate(self.names):
+            self.ws.set_column(c, c, self.widths.get(n, max(10, min(40, len(n) + 2))))
+        self.ws.write_row(0, 0, self.names, self.header)
+        self.ws.freeze_panes(1, 0)
+        self.writers = [_writer(self.ws, t, f, self.date_fmt) for t, f in zip(self.types, self.cell_formats)]
+        self.row = 1
+
+    def write_columns(self, columns):
+        """Columns of Python values (one batch)"""
+        n = len(columns[0]) if columns else 0
+        start = 0
+        while start < n:
+            if self.row >= ROW_LIMIT:
+                self._finish()
+                self._open()
+            take = min(n - start, ROW_LIMIT - self.row)
+            # constant_memory flushes a row once the next one starts, so
+            # cells go out row by row even though the batch is columnar
+            pairs = list(enumerate(zip(self.writers, columns)))
+            for i in range(start, start + take):
+                r = self.row + i - start
+                for c, (write, values) in pairs:
+                    write(r, c, values[i])
+            self.row += take
+            self.rows += take
+            start += take
+
+    def write_rows(self, rows):
+        for row in rows:
+            if self.row >= ROW_LIMIT:
+                self._finish()
+                self._open()
+            for c, write in enumerate(self.writers):
+                write(self.row, c, row[c])
+            self.row += 1
+            self.rows += 1
+
+    def _finish(self):
+        self.ws.autofilter(0, 0, max(self.row - 1, 1), max(len(self.names) - 1, 0))
+
+    def close(self):
+        self._finish()
+
+
+def _write_sheet(wb, name, source, header, formats, widths):
+    schema, batches, is_rows = _batches(source)
+    names = list(schema) if is_rows else list(schema.names)
+    types = [None] * len(names) if is_rows else [f.type for f in schema]
+    fmts = {n: _default_format(t) for n, t in zip(names, types) if t is not None}
+    fmts.update(formats.get(name, {}))
+    sheet = _Sheet(wb, name, names, types, fmts, widths.get(name, {}), header)
+    if is_rows:
+        sheet.write_rows(batches)
+    else:
+        for batch in batches:
+            sheet.write_columns([col.to_pylist() for col in batch.columns])
+    sheet.close()
+    return sheet.rows
+
+
+def write_workbook(path, sheets, formats=None, widths=None):
+    """Write {sheet name: source} to `path` in constant-memory mode.
+    `formats` / `widths`: {sheet: {column: number format / width}}; columns
+    without a format get one from their type. Returns {sheet: rows written}."""
+    formats, widths = formats or {}, widths or {}
+    tmp = path + ".tmp"
+    wb = xlsxwriter.Workbook(tmp, {"constant_memory": True, "remove_timezone": True,
+                                   "tmpdir": os.path.dirname(os.path.abspath(path))})
+    header = wb.add_format({"bold": True, "bg_color": "#003366", "font_color": "#FFFFFF",
+                            "border": 1})
+    counts = {}
+    try:
+        for name, source in sheets.items():
+            if source is None:
+                continue
+            with run_trace.span("export", f"{os.path.basename(path)}:{name}") as attrs:
+                counts[name] = attrs["rows"] = _write_sheet(wb, name, source, header, formats, widths)
+    finally:
+        wb.close()
+    os.replace(tmp, path)
+    return counts
+
+
+# -------------------------------
+# 3. Benchmark
+# -------------------------------
+def _frame(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "State": pd.Categorical(rng.choice([f"State {i}" for i in range(56)], rows)),
+        "County": [f"County {i}" for i in rng.integers(0, 3000, rows)],
+        "FY2019": rng.integers(10**5, 10**9, rows),
+        "FY2020": rng.integers(10**5, 10**9, rows),
+        "Growth": rng.normal(5, 10, rows),
+        "Date": pd.Timestamp("2021-09-30") + pd.to_timedelta(rng.integers(0, 1000, rows), unit="D"),
+    })
+
+
+def _child(method, rows):
+    frame = _frame(rows)
+    base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    path = os.path.join(tempfile.mkdtemp(prefix="xlsx-"), "bench.xlsx")
+    t0 = time.perf_counter()
+    if method == "stream":
+        write_workbook(path, {"Counties": frame},
+                       formats={"Counties": {"FY2019": CURRENCY, "FY2020": CURRENCY,
+                                             "Growth": PERCENT_POINTS}})
+    else:
+        frame.to_excel(path, sheet_name="Counties", index=False, engine="xlsxwriter")
+    elapsed = time.perf_counter() - t0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    size = os.path.getsize(path)
+    os.remove(path)
+    print(f"{method:>8}: {rows:,} rows in {elapsed:.1f}s, {size / 2**20:.1f} MB file, "
+          f"peak RSS {peak / 1024:,.0f} MB (data loaded: {base / 1024:,.0f} MB)")
+
+
+def benchmark(rows=1_000_000, methods=("stream", "to_excel")):
+    for method in methods:
+        subprocess.run([sys.executable, __file__, "--child", method, str(rows)], check=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Constant-memory Excel export")
+    parser.add_argument("--bench", type=int, metavar="ROWS", default=0)
+    parser.add_argument("--stream-only", action="store_true", help="skip the to_excel comparison")
+    parser.add_argument("--child", nargs=2, metavar=("METHOD", "ROWS"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        _child(args.child[0], int(args.child[1]))
+    elif args.bench:
+        benchmark(args.bench, ("stream",) if args.stream_only else ("stream", "to_excel"))
+    else:
+        parser.print_help(sys.stderr)
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Intraday Bars: Ingestion, Resampling and VWAP
+Minute bars for hundreds of symbols, kept in one long, compact frame:
+- fetch_minute_bars(): batched yf.download calls (BATCH symbols each),
+  reshaped to (symbol, time) rows with a categorical symbol column,
+  float32 prices and int64 volume
+- resample():          5m/15m/1h OHLCV for every symbol in one groupby
+                       pass over (symbol, time bucket)
+- session_vwap():      running VWAP per symbol and session from grouped
+                       cumulative sums (time-weighted when a symbol has
+                       no volume, e.g. indices)
+- summary():           last, VWAP, distance from VWAP, session range and
+                       1h change per symbol, for the report tables
+- report_rows():     the formatted report table rows (ip.py, we.py)
+- save_bars()/load_bars(): one zstd Parquet file per session date
+- daily_closes():     a batched daily-close download for sparklines
+
+Usage:
+  bars = fetch_minute_bars(["^GSPC", "AAPL", "MSFT"])
+  five = resample(bars, "5min")
+  table = summary(bars)
+
+  python intraday.py AAPL MSFT ^GSPC --rule 15min
+"""
+
+import os
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+import run_trace
+
+BATCH = 100
+STORE_DIR = "intraday"
+MARKET_TZ = "America/New_York"
+FIELDS = ["open", "high", "low", "close", "volume"]
+REPORT_COLUMNS = ["Symbol", "Last", "VWAP", "vs VWAP", "Day Range", "1h Chg"]
+
+
+# -------------------------------
+# 1. Ingestion
+# -------------------------------
+def to_long(data, symbols):
+    """yf.download(group_by='ticker') frame → (symbol, time) rows"""
+    if not isinstance(data.columns, pd.MultiIndex):
+        data = pd.concat({symbols[0]: data}, axis=1)
+    level = 0 if "Close" in data.columns.get_level_values(1) else 1
+    long = data.stack(level=level, future_stack=True)
+    long.index.names = ["time", "symbol"]
+    long = long.rename(columns=str.lower)[FIELDS].dropna(subset=["close"]).reset_index()
+    return compact(long)
+
+
+def compact(bars):
+    bars = bars.sort_values(["symbol", "time"], kind="stable").reset_index(drop=True)
+    bars["symbol"] = bars["symbol"].astype("category")
+    bars["time"] = pd.to_datetime(bars["time"], utc=True).dt.tz_convert(MARKET_TZ)
+    for c in ("open", "high", "low", "close"):
+        bars[c] = bars[c].astype("float32")
+    bars["volume"] = bars["volume"].fillna(0).astype("int64")
+    return bars[["symbol", "time"] + FIELDS]
+
+
+def fetch_minute_bars(symbols, period="1d", interval="1m", batch=BATCH):
+    """Minute bars for `symbols`, BATCH symbols per download"""
+    import yfinance as yf
+    symbols = list(dict.fromkeys(symbols))
+    parts = []
+    for i in range(0, len(symbols), batch):
+        chunk = symbols[i:i + batch]
+        try:
+            data = run_trace.fetch(f"minute bars {i // batch + 1} ({len(chunk)} symbols)", yf.download,
+                                   chunk, period=period, interval=interval, group_by="ticker",
+                                   progress=False, threads=True)
+        except Exception:
+            continue
+        if data is not None and not data.empty:
+            with run_trace.span("parse", "minute bars") as attrs:
+                parts.append(to_long(data, chunk))
+                attrs["rows"] = len(parts[-1])
+    if not parts:
+        return compact(pd.DataFrame(columns=["symbol", "time"] + FIELDS))
+    return compact(pd.concat(parts, ignore_index=True))
+
+
+def daily_closes(symbols, period="1mo"):
+    """Daily closes, one column per symbol, in a single batched download"""
+    import yfinance as yf
+    try:
+        data = run_trace.fetch(f"trend closes ({len(symbols)} symbols)", yf.download, list(symbols),
+                               period=period, interval="1d", progress=False)
+        return data["Close"]
+    except Exception:
+        return pd.DataFrame()
+
+
+# -------------------------------
+# 2. Storage
+# -------------------------------
+def save_bars(bars, directory=STORE_DIR):
+    """One Parquet file per session date; returns the paths written"""
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for day, part in bars.groupby(bars["time"].dt.date):
+        path = os.path.join(directory, f"{day}.parquet")
+        tmp = path + ".tmp"
+        part.to_parquet(tmp, compression="zstd", index=False)
+        os.replace(tmp, path)
+        paths.append(path)
+    return paths
+
+
+def load_bars(day, directory=STORE_DIR):
+    path = os.path.join(directory, f"{pd.Timestamp(day).date()}.parquet")
+    return compact(pd.read_parquet(path)) if os.path.exists(path) else None
+
+
+# -------------------------------
+# 3. Resampling and VWAP
+# -------------------------------
+def resample(bars, rule="5min"):
+    """OHLCV per symbol and `rule` bucket (bucket start labels), all
+    symbols in one groupby"""
+    bucket = bars["time"].dt.floor(rule)
+    out = bars.groupby([bars["symbol"], bucket], observed=True, sort=True).agg(
+        open=("open", "first"), high=("high", "max"), low=("low", "min"),
+        close=("close", "last"), volume=("volume", "sum"))
+    return out.reset_index()
+
+
+def session_vwap(bars):
+    """Running VWAP per row (symbol and session date), from the typical
+    price (h + l + c) / 3; equal weights where the session has no volume"""
+    typical = (bars["high"].astype("float64") + bars["low"] + bars["close"]) / 3
+    volume = bars["volume"].astype("float64")
+    keys = [bars["symbol"], bars["time"].dt.normalize()]
+    no_volume = volume.groupby(keys, observed=True).transform("sum") == 0
+    weight = volume.where(~no_volume, 1.0)
+    num = (typical * weight).groupby(keys, observed=True).cumsum()
+    den = weight.groupby(keys, observed=True).cumsum()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return num / den
+
+
+def summary(bars, change_window="1h"):
+    """Per symbol, latest session: last, VWAP, % from VWAP, session
+    open/high/low, range % and change over `change_window`"""
+    if bars.empty:
+        return pd.DataFrame(columns=["last", "vwap", "vs_vwap", "open", "high", "low",
+                                     "range_pct", "change_pct", "bars"])
+    day = bars["time"].dt.normalize()
+    latest = day == day.groupby(bars["symbol"], observed=True).transform("max")
+    bars = bars.loc[latest].assign(vwap=session_vwap(bars.loc[latest]))
+    g = bars.groupby("symbol", observed=True)
+    out = pd.DataFrame({
+        "last": g["close"].last(),
+        "vwap": g["vwap"].last(),
+        "open": g["open"].first(),
+        "high": g["high"].max(),
+        "low": g["low"].min(),
+        "bars": g.size(),
+    }).astype({"last": "float64", "open": "float64", "high": "float64", "low": "float64"})
+    # Close at or before (last bar time - window), per symbol
+    last_time = g["time"].transform("max")
+    cutoff = last_time - pd.Timedelta(change_window)
+    before = bars.loc[bars["time"] <= cutoff]
+    ref = before.groupby("symbol", observed=True)["close"].last().astype("float64")
+    out["vs_vwap"] = (out["last"] / out["vwap"] - 1) * 100
+    out["range_pct"] = (out["high"] / out["low"] - 1) * 100
+    out["change_pct"] = (out["last"] / ref.reindex(out.index) - 1) * 100
+    return out[["last", "vwap", "vs_vwap", "open", "high", "low", "range_pct", "change_pct", "bars"]]
+
+
+def report_rows(bars, symbols, names=None):
+    """summary() of `bars` plus its report table: one formatted row per
+    symbol in `symbols` order, indexed by symbol, labelled from `names`.
+    Returns (summary, rows)."""
+    names = names or {}
+    with run_trace.span("transform", "intraday summary", rows=len(bars)):
+        table = summary(bars)
+    rows = []
+    shown = [s for s in symbols if s in table.index]
+    for sym in shown:
+        r = table.loc[sym]
+        change = "N/A" if pd.isna(r["change_pct"]) else f"{r['change_pct']:+.2f}%"
+        rows.append([names.get(sym, sym), f"{r['last']:,.2f}", f"{r['vwap']:,.2f}",
+                     f"{r['vs_vwap']:+.2f}%", f"{r['low']:,.2f} – {r['high']:,.2f}", change])
+    return table, pd.DataFrame(rows, columns=REPORT_COLUMNS, index=pd.Index(shown, name="symbol"))
+
+
+def close_matrix(bars, rule="5min"):
+    """Resampled closes as a time × symbol frame (sparklines, indicators)"""
+    return resample(bars, rule).pivot(index="time", columns="symbol", values="close")
+
+
+# -------------------------------
+# 4. Benchmark / CLI
+# -------------------------------
+def synthetic_bars(n_symbols=500, minutes=390, seed=0):
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp.now(tz=MARKET_TZ).normalize() + pd.Timedelta(hours=9, minutes=30)
+    times = start + pd.to_timedelta(np.arange(minutes), unit="min")
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.001, (minutes, n_symbols)), axis=0))
+    wiggle = np.abs(rng.normal(0, 0.0005, close.shape)) * close
+    frame = pd.DataFrame({
+        "symbol": np.tile([f"S{i}" for i in range(n_symbols)], minutes),
+        "time": np.repeat(times, n_symbols),
+        "open": close.ravel(), "high": (close + wiggle).ravel(), "low": (close - wiggle).ravel(),
+        "close": close.ravel(), "volume": rng.integers(100, 10_000, close.size),
+    })
+    return compact(frame)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Intraday bars, resampling and VWAP")
+    parser.add_argument("symbols", nargs="*")
+    parser.add_argument("--rule", default="5min")
+    parser.add_argument("--bench", type=int, metavar="SYMBOLS", default=0)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    bars = synthetic_bars(args.bench) if args.bench else fetch_minute_bars(args.symbols)
+    t1 = time.perf_counter()
+    res = resample(bars, args.rule)
+    t2 = time.perf_counter()
+    table = summary(bars)
+    t3 = time.perf_counter()
+    print(f"{len(bars):,} minute bars, {bars['symbol'].nunique()} symbols, "
+          f"{bars.memory_usage(deep=True).sum() / 2**20:.1f} MB (load {t1 - t0:.2f}s)")
+    print(f"resample {args.rule}: {len(res):,} bars in {t2 - t1:.3f}s; summary + VWAP {t3 - t2:.3f}s")
+    print(table.head(20).round(2).to_string())
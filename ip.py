@@ -4,13 +4,21 @@ Global Market Report → Colorful PDF
 Includes:
 - Major US Indices: Dow Jones, S&P 500, NASDAQ-100
 - Top Most-Active Stocks (by volume)
-- Top Most-Active Options Contracts (nearest expiry)
+- Top Most-Active Options Contracts (nearest expiry) with implied vol and delta
+- Put/call volume and open-interest ratios, ATM implied vol per underlying
+- Intraday session VWAP, range and 1h change for indices and most-active stocks
+- Typed copies of the index, most-active and options tables go to the
+  snapshot store on every run (see snapshot_store.py), and a "Changes"
+  section lists entries, exits and rank moves since the previous run
+- REPORT_EXPORT=arrow,parquet,ndjson also writes those tables, plus the
+  technicals, put/call ratios and intraday summary (see report_export.py)
 
 PDF generated with reportlab – fully styled, readable, and modern.
 """
 
 import yfinance as yf
 import pandas as pd
+import numpy as np
 from datetime import datetime
 import warnings
 warnings.filterwarnings("ignore")
@@ -25,6 +33,26 @@ from reportlab.lib.enums import TA_CENTER
 import requests
 from bs4 import BeautifulSoup
 
+import pdf_compact
+import rl_charts
+import indicators
+import options_analytics
+import option_store
+import intraday
+import snapshot_store
+import snapshot_diff
+import report_export
+import run_trace
+
+# Typed tables behind the PDF, by name: exported with REPORT_EXPORT (see report_export.py)
+TABLES = {}
+
+def keep(name, frame, snapshot=False):
+    """Keep a typed table for the exports; `snapshot` also appends it to the snapshot store"""
+    TABLES[name] = frame
+    if snapshot:
+        snapshot_store.record(name, frame)
+
 # -------------------------------
 # 1. Fetch Most-Active Stocks
 # -------------------------------
@@ -32,11 +60,13 @@ def scrape_most_active_stocks(limit=10):
     try:
         url = "https://finance.yahoo.com/most-active"
         headers = {"User-Agent": "Mozilla/5.0"}
-        resp = requests.get(url, headers=headers, timeout=15)
+        resp = run_trace.fetch("most-active page", requests.get, url, headers=headers, timeout=15,
+                               source="yahoo-web")
         resp.raise_for_status()
-        soup = BeautifulSoup(resp.text, "lxml")
-        table = soup.find("table")
-        df = pd.read_html(str(table))[0]
+        with run_trace.span("parse", "most-active page"):
+            soup = BeautifulSoup(resp.text, "lxml")
+            table = soup.find("table")
+            df = pd.read_html(str(table))[0]
 
         df = df[['Symbol', 'Name', 'Price (Intraday)', 'Change', '% Change', 'Volume (Intraday)']]
         df.columns = ['Symbol', 'Name', 'Price', 'Change', '% Change', 'Volume']
@@ -48,56 +78,117 @@ def scrape_most_active_stocks(limit=10):
 # 2. Major Indices Data
 # -------------------------------
 def get_index_data():
+    """Index quotes plus a technical-indicator table from the same history"""
     indices = {
         '^DJI': 'Dow Jones Industrial Average',
         '^GSPC': 'S&P 500',
         '^NDX': 'NASDAQ 100'
     }
     rows = []
+    history = {}
     for symbol, name in indices.items():
         try:
             t = yf.Ticker(symbol)
-            hist = t.history(period="2d")
+            # Enough bars to warm up the 20-day indicator windows
+            hist = run_trace.fetch(symbol, t.history, period="3mo")
             if len(hist) < 2:
                 continue
+            history[name] = hist
             close = hist['Close'].iloc[-1]
             prev = hist['Close'].iloc[-2]
             change = close - prev
-            pct = change / prev * 100
-            vol = hist['Volume'].iloc[-1]
-            rows.append([name, f"{close:,.2f}", f"{change:+,.2f}", f"{pct:+.2f}%", f"{vol:,.0f}"])
+            rows.append([symbol, name, close, change, change / prev * 100, hist['Volume'].iloc[-1]])
         except Exception:
-            rows.append([name, "N/A", "N/A", "N/A", "N/A"])
-    return pd.DataFrame(rows, columns=['Index', 'Close', 'Change', '% Change', 'Volume'])
+            rows.append([symbol, name, np.nan, np.nan, np.nan, np.nan])
+    typed = pd.DataFrame(rows, columns=['symbol', 'name', 'close', 'change', 'pct_change', 'volume'])
+    keep("indices", typed, snapshot=True)
+    fmt = lambda values, spec, suffix="": ["N/A" if pd.isna(v) else format(v, spec) + suffix for v in values]
+    df = pd.DataFrame({'Index': typed['name'], 'Close': fmt(typed['close'], ",.2f"),
+                       'Change': fmt(typed['change'], "+,.2f"),
+                       '% Change': fmt(typed['pct_change'], "+.2f", "%"),
+                       'Volume': fmt(typed['volume'], ",.0f")})
+    return df, get_index_technicals(history)
+
+def get_index_technicals(history):
+    """SMA/EMA/RSI/Bollinger/ATR per index; rolling state persists between runs (see indicators.py)"""
+    if not history:
+        return pd.DataFrame(columns=indicators.REPORT_COLUMNS)
+    with run_trace.span("transform", "index technicals"):
+        latest = indicators.history_technicals(history, state_path=indicators.INDEX_STATE)
+    keep("technicals", latest.rename_axis("index"))
+    return indicators.report_rows(latest)
 
 # -------------------------------
 # 3. Most-Active Options
 # -------------------------------
 def get_most_active_options(limit=10):
+    """Top contracts by volume with IV/Delta, plus put/call ratios per underlying"""
     symbols = ['SPY','QQQ','IWM','AAPL','TSLA','NVDA','AMD','AMC','META','AMZN']
-    all_opts = []
-    for sym in symbols:
-        try:
-            t = yf.Ticker(sym)
-            if not t.options:
-                continue
-            exp = t.options[0]  # nearest expiry
-            chain = t.option_chain(exp)
-            calls = chain.calls.copy(); calls['Type'] = 'Call'
-            puts = chain.puts.copy(); puts['Type'] = 'Put'
-            df = pd.concat([calls, puts], ignore_index=True)
-            df['Underlying'] = sym
-            df['Volume'] = df['volume'].fillna(0).astype(int)
-            all_opts.append(df)
-        except Exception:
-            continue
-    if not all_opts:
-        return pd.DataFrame()
-    full = pd.concat(all_opts, ignore_index=True)
-    top = full.sort_values('Volume', ascending=False).head(limit)
-    top = top[['Underlying','strike','Type','lastPrice','Volume','contractSymbol']]
-    top.columns = ['Underlying','Strike','Type','Last','Volume','Contract']
-    return top
+    # Nearest expiry per symbol through the columnar store (see option_store.py);
+    # contracts whose quotes did not change are not rewritten
+    store = option_store.OptionStore()
+    store.refresh(symbols, max_expiries=1)
+    store.save()
+    chains = store.nearest(symbols).reset_index()
+    if chains.empty:
+        return pd.DataFrame(), pd.DataFrame()
+    # IV and Greeks for every contract in one vectorized pass (see options_analytics.py)
+    with run_trace.span("transform", "option analytics", rows=len(chains)):
+        full = options_analytics.chain_analytics(chains)
+        ratios = options_analytics.put_call_ratios(full)
+    top = full.nlargest(limit, 'volume')
+    top = top[['underlying','strike','type','lastPrice','volume','iv','delta','contractSymbol']]
+    keep("options", top.rename(columns={'contractSymbol': 'symbol', 'lastPrice': 'last'}), snapshot=True)
+    keep("put_call", ratios)
+    top.columns = ['Underlying','Strike','Type','Last','Volume','IV','Delta','Contract']
+    # float32 in the store: show cents, not binary noise
+    top['Strike'] = top['Strike'].apply(lambda x: f"{x:.2f}")
+    top['Last'] = top['Last'].apply(lambda x: f"{x:.2f}")
+    top['IV'] = top['IV'].apply(lambda x: "N/A" if pd.isna(x) else f"{x:.1%}")
+    top['Delta'] = top['Delta'].apply(lambda x: "N/A" if pd.isna(x) else f"{x:+.2f}")
+    return top, options_analytics.put_call_table(ratios)
+
+def record_most_active(stocks_df):
+    """Typed copy of the most-active table for the snapshot store and exports"""
+    keep("most_active", pd.DataFrame({
+        'symbol': stocks_df['Symbol'].astype(str).to_numpy(),
+        'name': stocks_df['Name'].astype(str).to_numpy(),
+        'price': report_export.parse_numbers(stocks_df['Price']),
+        'change': report_export.parse_numbers(stocks_df['Change']),
+        'pct_change': report_export.parse_numbers(stocks_df['% Change']),
+        'volume': report_export.parse_numbers(stocks_df['Volume']),
+    }), snapshot=True)
+
+def get_changes(stocks_df, opt_df):
+    """Most-active and top-options entries/exits and rank moves since the
+    last stored run (see snapshot_diff.py). Returns (rows, since)."""
+    rows, since = [], None
+    prior, day = snapshot_diff.previous("most_active")
+    if day is not None:
+        today = pd.DataFrame({'symbol': stocks_df['Symbol'].astype(str)})
+        rows += snapshot_diff.summary(snapshot_diff.compare(today, prior), label="most-active list")
+        since = day
+    prior, day = snapshot_diff.previous("options")
+    if day is not None and not opt_df.empty:
+        today = pd.DataFrame({'symbol': opt_df['Contract'].astype(str)})
+        rows += snapshot_diff.summary(snapshot_diff.compare(today, prior), movers=0, label="top options")
+        since = since or day
+    return rows, since
+
+# -------------------------------
+# 3b. Intraday (minute bars)
+# -------------------------------
+def get_intraday_data(symbols, names=None):
+    """Last, session VWAP, range and 1h change from 1-minute bars, with a
+    5-minute sparkline per row (see intraday.py)"""
+    bars = intraday.fetch_minute_bars(symbols)
+    if bars.empty:
+        return pd.DataFrame(columns=intraday.REPORT_COLUMNS + ['Trend'])
+    intraday.save_bars(bars)
+    table, df = intraday.report_rows(bars, symbols, names)
+    keep("intraday", table)
+    df['Trend'] = rl_charts.sparkline_cells(intraday.close_matrix(bars, "5min"), list(df.index))
+    return df.reset_index(drop=True)
 
 # -------------------------------
 # 4. PDF Builder
@@ -105,7 +196,8 @@ def get_most_active_options(limit=10):
 def build_pdf(filename="Global_Market_Report.pdf"):
     doc = SimpleDocTemplate(filename, pagesize=LETTER,
                             rightMargin=0.75*inch, leftMargin=0.75*inch,
-                            topMargin=1*inch, bottomMargin=0.75*inch)
+                            topMargin=1*inch, bottomMargin=0.75*inch,
+                            **pdf_compact.reportlab_options())
     styles = getSampleStyleSheet()
     story = []
 
@@ -133,6 +225,7 @@ def build_pdf(filename="Global_Market_Report.pdf"):
             ('BACKGROUND', (0,0), (-1,0), header_bg),
             ('TEXTCOLOR', (0,0), (-1,0), colors.white),
             ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
+            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
         ]
         for i in range(1, len(data)):
             bg = row_colors[i % 2]
@@ -142,8 +235,10 @@ def build_pdf(filename="Global_Market_Report.pdf"):
         story.append(Spacer(1, 0.25*inch))
 
     # ---- Major Indices ----
-    idx_df = get_index_data()
+    idx_df, tech_df = get_index_data()
     add_table(idx_df, "Major US Indices")
+    if not tech_df.empty:
+        add_table(tech_df, "Index Technicals (Daily)")
 
     # ---- Most-Active Stocks ----
     stocks_df = scrape_most_active_stocks(limit=12)
@@ -153,8 +248,8 @@ def build_pdf(filename="Global_Market_Report.pdf"):
         for s in fallback:
             try:
                 t = yf.Ticker(s)
-                info = t.info
-                hist = t.history(period="1d")
+                info = run_trace.fetch(f"{s} info", lambda: t.info)
+                hist = run_trace.fetch(s, t.history, period="1d")
                 if hist.empty: continue
                 close = hist['Close'].iloc[-1]
                 vol = hist['Volume'].iloc[-1]
@@ -165,16 +260,33 @@ def build_pdf(filename="Global_Market_Report.pdf"):
                 rows.append([s, name, f"{close:,.2f}", f"{chg:+,.2f}", f"{pct:+.2f}%", f"{vol:,.0f}"])
             except: continue
         stocks_df = pd.DataFrame(rows, columns=['Symbol','Name','Price','Change','% Change','Volume'])
+    record_most_active(stocks_df)
+    # One-month vector sparkline per row (see rl_charts.py)
+    closes = intraday.daily_closes(stocks_df['Symbol'])
+    with run_trace.span("chart", "sparklines"):
+        stocks_df = stocks_df.assign(Trend=rl_charts.sparkline_cells(closes, stocks_df['Symbol']))
     add_table(stocks_df, "Top 12 Most Actively Traded Stocks (by Volume)", header_bg=colors.HexColor("#006400"))
 
+    # ---- Intraday ----
+    intra_df = get_intraday_data(['^DJI', '^GSPC', '^NDX'] + list(stocks_df['Symbol']),
+                                 names={'^DJI': 'Dow Jones', '^GSPC': 'S&P 500', '^NDX': 'NASDAQ 100'})
+    if not intra_df.empty:
+        add_table(intra_df, "Intraday: Session VWAP, Range & 1h Change (1-min bars)", header_bg=colors.HexColor("#4B0082"))
+
     # ---- Most-Active Options ----
-    opt_df = get_most_active_options(limit=12)
+    opt_df, pc_df = get_most_active_options(limit=12)
     if not opt_df.empty:
         add_table(opt_df, "Top 12 Most Active Options Contracts (Nearest Expiry)", header_bg=colors.HexColor("#8B0000"))
+        add_table(pc_df, "Put/Call Ratios & ATM Implied Volatility (Nearest Expiry)", header_bg=colors.HexColor("#8B0000"))
     else:
         story.append(Paragraph("<b>Options data unavailable at this time.</b>", styles['Normal']))
         story.append(Spacer(1, 0.2*inch))
 
+    # ---- Changes since the last run ----
+    story.append(Paragraph("Changes", styles['Heading2']))
+    story.append(Spacer(1, 0.1*inch))
+    story.append(snapshot_diff.changes_table(*get_changes(stocks_df, opt_df), width=7*inch))
+
     # ---- Footer ----
     footer_style = ParagraphStyle('Footer', parent=styles['Normal'], fontSize=9, textColor=colors.grey, alignment=TA_CENTER, spaceBefore=20)
     footer = Paragraph(
@@ -183,9 +295,13 @@ def build_pdf(filename="Global_Market_Report.pdf"):
     )
     story.append(footer)
 
-    doc.build(story)
+    with pdf_compact.output(filename):
+        doc.build(story)
     print(f"PDF report saved as → {filename}")
+    report_export.export("global_market_report", TABLES)
 
 # -------------------------------
 if __name__ == "__main__":
+    # Stage timings and counters for this run (see run_trace.py)
+    run_trace.start("global_market_report")
     build_pdf("Global_Market_Report.pdf")
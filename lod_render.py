@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Level-of-Detail Rendering for Large Matrices
+Heatmaps and histograms that never draw more cells, bars or tick labels
+than the output can show:
+- rows/columns beyond the axes' pixel budget are rolled up by group
+  (e.g. county → state) and then binned into equal-width blocks
+- normalization is a single vectorized pass over the reduced matrix
+- tick labels are thinned to what fits at the current font size
+
+Used by snap_dashboard.py (SNAP heatmap/histograms) and any report that
+needs a heatmap of a few thousand rows or columns.
+"""
+
+import numpy as np
+
+AGGREGATORS = {
+    'sum': np.add.reduceat,
+    'max': np.maximum.reduceat,
+    'min': np.minimum.reduceat,
+}
+
+
+# -------------------------------
+# 1. Matrix reduction
+# -------------------------------
+def _reduceat(matrix, starts, axis, how):
+    """Aggregate contiguous blocks that begin at `starts` along `axis`"""
+    if how == 'mean':
+        sums = np.add.reduceat(np.nan_to_num(matrix), starts, axis=axis)
+        counts = np.add.reduceat((~np.isnan(matrix)).astype(np.float64), starts, axis=axis)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(counts > 0, sums / counts, np.nan)
+    return AGGREGATORS[how](matrix, starts, axis=axis)
+
+
+def rollup(matrix, groups, axis=0, how='sum'):
+    """Collapse entries sharing a group key (state → one row per state).
+    Returns (matrix, group_labels, sizes)."""
+    groups = np.asarray(groups)
+    order = np.argsort(groups, kind='stable')
+    sorted_groups = groups[order]
+    starts = np.flatnonzero(np.r_[True, sorted_groups[1:] != sorted_groups[:-1]])
+    sizes = np.diff(np.r_[starts, len(groups)])
+    reduced = _reduceat(np.take(matrix, order, axis=axis), starts, axis, how)
+    return reduced, [str(g) for g in sorted_groups[starts]], sizes
+
+
+def bin_axis(matrix, labels, budget, axis=0, how='mean'):
+    """Merge neighbouring entries into at most `budget` equal-width blocks.
+    Returns (matrix, block_labels, sizes)."""
+    n = matrix.shape[axis]
+    if n <= budget:
+        return matrix, [str(l) for l in labels], np.ones(n, dtype=int)
+    starts = np.unique(np.linspace(0, n, budget, endpoint=False).astype(int))
+    ends = np.r_[starts[1:], n] - 1
+    block_labels = [f"{labels[s]}…{labels[e]}" if e > s else str(labels[s])
+                    for s, e in zip(starts, ends)]
+    return _reduceat(matrix, starts, axis, how), block_labels, np.diff(np.r_[starts, n])
+
+
+def reduce_to_budget(matrix, labels, budget, axis=0, groups=None, how='mean', rollup_how='sum'):
+    """Roll up by `groups` first (aggregating with `rollup_how`), then bin
+    with `how` if the groups still do not fit.
+    Returns (matrix, labels, note) where note describes what was merged."""
+    n = matrix.shape[axis]
+    note = ''
+    if n <= budget:
+        return matrix, [str(l) for l in labels], note
+    if groups is not None:
+        matrix, labels, _ = rollup(matrix, groups, axis=axis, how=rollup_how)
+        note = f"{n:,} → {len(labels):,} groups"
+        if len(labels) <= budget:
+            return matrix, labels, note
+    before = matrix.shape[axis]
+    matrix, labels, _ = bin_axis(matrix, labels, budget, axis=axis, how=how)
+    note = (note + ", " if note else '') + f"{before:,} → {len(labels):,} bins"
+    return matrix, labels, note
+
+
+def normalize(matrix, axis=0):
+    """Vectorized min-max scaling along `axis` (axis=0 scales each column).
+    Constant slices map to 0 instead of dividing by zero."""
+    lo = np.nanmin(matrix, axis=axis, keepdims=True)
+    span = np.nanmax(matrix, axis=axis, keepdims=True) - lo
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(span > 0, (matrix - lo) / span, 0.0)
+
+
+# -------------------------------
+# 2. Pixel and label budgets
+# -------------------------------
+def pixel_budget(ax, min_cell_px=2):
+    """(rows, cols) the axes can show at the figure's dpi"""
+    bbox = ax.get_window_extent()
+    return (max(1, int(bbox.height // min_cell_px)),
+            max(1, int(bbox.width // min_cell_px)))
+
+
+def label_slots(length_px, fontsize, dpi, spacing=1.6):
+    """How many tick labels of `fontsize` pt fit along `length_px`"""
+    return max(1, int(length_px / (fontsize * dpi / 72 * spacing)))
+
+
+def thin_ticks(n, slots):
+    """Evenly spaced tick positions, at most `slots` of them"""
+    if n <= slots:
+        return np.arange(n)
+    return np.unique(np.linspace(0, n - 1, slots).round().astype(int))
+
+
+# -------------------------------
+# 3. Drawing
+# -------------------------------
+def heatmap(ax, matrix, row_labels, col_labels, row_groups=None, col_groups=None,
+            how='mean', rollup_how='sum', normalize_axis=None, cmap='YlOrRd', fontsize=8,
+            min_cell_px=2, xrotation=45):
+    """Draw `matrix` reduced to the axes' pixel budget. Returns (image, note)."""
+    matrix = np.asarray(matrix, dtype=np.float64)
+    dpi = ax.figure.dpi
+    row_budget, col_budget = pixel_budget(ax, min_cell_px)
+
+    matrix, row_labels, row_note = reduce_to_budget(matrix, list(row_labels), row_budget,
+                                                    axis=0, groups=row_groups, how=how,
+                                                    rollup_how=rollup_how)
+    matrix, col_labels, col_note = reduce_to_budget(matrix, list(col_labels), col_budget,
+                                                    axis=1, groups=col_groups, how=how,
+                                                    rollup_how=rollup_how)
+    if normalize_axis is not None:
+        matrix = normalize(matrix, axis=normalize_axis)
+
+    im = ax.imshow(matrix, aspect='auto', cmap=cmap, interpolation='nearest')
+
+    bbox = ax.get_window_extent()
+    # Rotated x labels need roughly their height in horizontal space
+    x_slots = label_slots(bbox.width, fontsize, dpi, spacing=1.6 if xrotation else 6)
+    xt = thin_ticks(len(col_labels), x_slots)
+    yt = thin_ticks(len(row_labels), label_slots(bbox.height, fontsize, dpi))
+    ax.set_xticks(xt)
+    ax.set_xticklabels([col_labels[i] for i in xt], rotation=xrotation,
+                       ha='right' if xrotation else 'center', fontsize=fontsize)
+    ax.set_yticks(yt)
+    ax.set_yticklabels([row_labels[i] for i in yt], fontsize=fontsize)
+    ax.grid(False)
+
+    note = "; ".join(n for n in (row_note, col_note) if n)
+    return im, note
+
+
+def histogram(ax, values, bins=20, **kwargs):
+    """Histogram as one step artist instead of one patch per bar.
+    Binning is np.histogram, so it scales to millions of values."""
+    values = np.asarray(values, dtype=np.float64)
+    values = values[np.isfinite(values)]
+    counts, edges = np.histogram(values, bins=bins)
+    kwargs.setdefault('fill', True)
+    return ax.stairs(counts, edges, **kwargs)
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Vectorized Return & Risk Analytics for as.py
+Works on one wide, aligned price matrix (dates × assets) for thousands of
+stocks, futures and crypto at once:
+- price_matrix():   one close per asset from a yf.download(group_by='ticker')
+                    frame, selected by column label instead of a per-ticker
+                    insert loop ('Adj Close' where present, else 'Close')
+- align_calendar(): puts 24/7 assets (crypto) and exchange-traded assets on
+                    one calendar, either exchange days or every calendar day
+- analytics():      1D/1W/1M/3M/YTD returns, annualized volatility, max
+                    drawdown and Sharpe for every asset in one NumPy pass
+
+Horizons are calendar offsets resolved with one searchsorted per horizon,
+so they hold on either calendar.
+
+Benchmark: python market_analytics.py --bench 3000
+"""
+
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+HORIZONS = {"1D": pd.DateOffset(days=1), "1W": pd.DateOffset(weeks=1),
+            "1M": pd.DateOffset(months=1), "3M": pd.DateOffset(months=3)}
+PERIODS_PER_YEAR = 252
+# Gaps (holidays, halted days) filled forward for at most this many rows
+MAX_FILL = 5
+
+
+# -------------------------------
+# 1. Price matrix and calendars
+# -------------------------------
+def price_matrix(data, tickers=None, field="Close", adjusted=True):
+    """Dates × tickers closes from a yf.download(..., group_by='ticker') frame.
+    `field` picks another column (High, Low, ...); `adjusted` applies to Close."""
+    if not isinstance(data.columns, pd.MultiIndex):
+        return data.astype("float64")
+    level = 1 if field in data.columns.get_level_values(1) else 0
+    closes = data.xs(field, axis=1, level=level)
+    if field == "Close" and adjusted and "Adj Close" in data.columns.get_level_values(level):
+        adj = data.xs("Adj Close", axis=1, level=level).reindex(columns=closes.columns)
+        # Per asset: adjusted closes where the asset has them, raw closes otherwise
+        use_adj = adj.notna().any(axis=0)
+        closes = closes.copy()
+        closes.loc[:, use_adj] = adj.loc[:, use_adj]
+    if tickers is not None:
+        closes = closes.reindex(columns=[t for t in tickers if t in closes.columns])
+    return closes.astype("float64").dropna(axis=1, how="all")
+
+
+def always_open(prices):
+    """Assets with weekend prints (crypto) – boolean per column"""
+    weekend = prices.index.dayofweek >= 5
+    return prices.loc[weekend].notna().any(axis=0)
+
+
+def align_calendar(prices, calendar="exchange", max_fill=MAX_FILL):
+    """'exchange': rows where any exchange-traded asset printed, 24/7 assets
+    sampled on those days. 'calendar': every day, exchange assets carried
+    over weekends and holidays. Short gaps are filled forward either way."""
+    prices = prices.sort_index()
+    if calendar == "exchange":
+        exchange = ~always_open(prices).values
+        if exchange.any():
+            traded = np.isfinite(prices.values[:, exchange]).any(axis=1)
+            prices = prices.loc[traded]
+    elif calendar == "calendar":
+        days = pd.date_range(prices.index[0].normalize(), prices.index[-1].normalize(), freq="D")
+        prices = prices.reindex(days)
+        max_fill = max(max_fill, 4)  # long weekends
+    else:
+        raise ValueError(f"unknown calendar: {calendar}")
+    return prices.ffill(limit=max_fill)
+
+
+# -------------------------------
+# 2. Analytics
+# -------------------------------
+def _rows_at_or_before(index, targets):
+    return np.searchsorted(index.values, targets.values, side="right") - 1
+
+
+def analytics(prices, risk_free=0.0, periods_per_year=PERIODS_PER_YEAR, window=None):
+    """Per-asset return and risk table (percentages except Sharpe).
+    `prices` is an aligned dates × assets frame; `window` limits vol/Sharpe
+    to the last N rows (default: all rows)."""
+    p = prices.values.astype(np.float64)
+    index = prices.index
+    last = index[-1]
+    # Last valid price per asset (assets can end early)
+    valid = np.isfinite(p)
+    last_row = p.shape[0] - 1 - np.argmax(valid[::-1], axis=0)
+    cols = np.arange(p.shape[1])
+    latest = p[last_row, cols]
+
+    out = {}
+    targets = pd.DatetimeIndex([last - off for off in HORIZONS.values()]
+                               + [pd.Timestamp(year=last.year, month=1, day=1) - pd.Timedelta(days=1)])
+    rows = _rows_at_or_before(index, targets)
+    for name, row in zip(list(HORIZONS) + ["YTD"], rows):
+        base = p[row] if row >= 0 else np.full(p.shape[1], np.nan)
+        out[name] = (latest / base - 1) * 100
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rets = np.diff(np.log(p), axis=0)
+    if window:
+        rets = rets[-window:]
+    mean = np.nanmean(rets, axis=0)
+    std = np.nanstd(rets, axis=0, ddof=1)
+    out["Vol"] = std * np.sqrt(periods_per_year) * 100
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out["Sharpe"] = (mean - risk_free / periods_per_year) / std * np.sqrt(periods_per_year)
+
+    peak = np.fmax.accumulate(p, axis=0)
+    with np.errstate(invalid="ignore"):
+        out["MaxDD"] = np.nanmin(p / peak - 1, axis=0) * 100
+    return pd.DataFrame(out, index=prices.columns)[list(HORIZONS) + ["YTD", "Vol", "MaxDD", "Sharpe"]]
+
+
+# -------------------------------
+# 3. Benchmark
+# -------------------------------
+def synthetic_prices(n_assets=3000, years=5, crypto_share=0.05, seed=0):
+    """Random-walk closes: exchange assets on weekdays, crypto every day"""
+    rng = np.random.default_rng(seed)
+    days = pd.date_range(end=pd.Timestamp.today().normalize(), periods=365 * years, freq="D")
+    walk = np.exp(np.cumsum(rng.normal(0.0003, 0.02, (len(days), n_assets)), axis=0)) * 100
+    n_crypto = int(n_assets * crypto_share)
+    names = [f"C{i}-USD" for i in range(n_crypto)] + [f"S{i}" for i in range(n_assets - n_crypto)]
+    frame = pd.DataFrame(walk, index=days, columns=names)
+    frame.iloc[days.dayofweek >= 5, n_crypto:] = np.nan
+    return frame
+
+
+def benchmark(n_assets=3000, years=5):
+    raw = synthetic_prices(n_assets, years)
+    t0 = time.perf_counter()
+    aligned = align_calendar(raw, "exchange")
+    t1 = time.perf_counter()
+    table = analytics(aligned)
+    t2 = time.perf_counter()
+    print(f"{n_assets:,} assets × {len(raw):,} days → {len(aligned):,} exchange days")
+    print(f"align: {t1 - t0:.3f}s  analytics: {t2 - t1:.3f}s")
+    print(table.describe().round(2).to_string())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Return and risk analytics")
+    parser.add_argument("--bench", type=int, metavar="ASSETS", default=3000)
+    parser.add_argument("--years", type=int, default=5)
+    args = parser.parse_args()
+    benchmark(args.bench, args.years)
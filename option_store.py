@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Columnar Option-Chain Store
+Keeps every fetched contract in one compact frame keyed by contract
+symbol instead of concatenating full object-dtype chain copies per
+underlying:
+- underlying/type are categoricals, prices and IV float32, volume and
+  open interest int32, expiry a datetime64 column: about 50 bytes of
+  columns per contract plus its symbol, against several hundred bytes
+  for the object-dtype yfinance frames
+- refresh() refetches an expiry only when it is near (NEAR_DAYS) or its
+  last fetch is older than MAX_AGE, and upsert() rewrites only the
+  contracts whose quote changed; expired contracts are pruned
+- top() and query() work on column masks plus an argpartition, so a
+  top-N-by-volume question never copies the whole surface
+- the store is one Parquet file and is written only when something
+  changed: new, changed or expired contracts, or fetch times that had
+  gone stale (older than MAX_AGE), so unchanged refreshes don't rewrite it
+
+Usage:
+  store = OptionStore()
+  store.refresh(["SPY", "QQQ"], max_expiries=1)
+  store.top(10, underlying="SPY", type="Put")
+  store.save()
+
+  python option_store.py SPY QQQ --expiries all --top 20
+"""
+
+import os
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+import run_trace
+
+STORE_PATH = ".option_store.parquet"
+# Expiries this close are refetched on every refresh (intraday moves matter)
+NEAR_DAYS = 7
+# Farther expiries are refetched once their data is older than this
+MAX_AGE = pd.Timedelta(hours=6)
+
+KEY = "contractSymbol"
+FLOATS = ["strike", "lastPrice", "bid", "ask", "impliedVolatility", "spot"]
+INTS = ["volume", "openInterest"]
+CATEGORIES = ["underlying", "type"]
+# Columns that define "the quote changed"
+QUOTE = ["lastPrice", "bid", "ask", "volume", "openInterest", "impliedVolatility"]
+COLUMNS = CATEGORIES + ["expiry", "strike", "lastPrice", "bid", "ask", "volume",
+                        "openInterest", "impliedVolatility", "spot", "lastTradeDate", "fetched"]
+
+
+def empty_frame():
+    frame = pd.DataFrame({
+        "underlying": pd.Categorical([]), "type": pd.Categorical([], categories=["Call", "Put"]),
+        "expiry": pd.Series([], dtype="datetime64[ns]"),
+        **{c: pd.Series([], dtype="float32") for c in FLOATS},
+        **{c: pd.Series([], dtype="int32") for c in INTS},
+        "lastTradeDate": pd.Series([], dtype="datetime64[ns, UTC]"),
+        "fetched": pd.Series([], dtype="datetime64[ns, UTC]"),
+    })
+    return frame[COLUMNS].rename_axis(KEY)
+
+
+def compact(chain, underlying, expiry, option_type, spot=np.nan, fetched=None):
+    """A yfinance calls/puts frame in the store's dtypes, indexed by contract"""
+    fetched = fetched or pd.Timestamp.now(tz="UTC")
+    out = pd.DataFrame(index=pd.Index(chain[KEY].astype(str), name=KEY))
+    out["underlying"] = underlying
+    out["type"] = option_type
+    out["expiry"] = pd.Timestamp(expiry)
+    for c in FLOATS:
+        source = chain[c] if c in chain else (spot if c == "spot" else np.nan)
+        out[c] = np.asarray(source, dtype="float32") if np.ndim(source) else np.float32(source)
+    for c in INTS:
+        values = chain[c].to_numpy(dtype=float) if c in chain else np.zeros(len(chain))
+        out[c] = np.nan_to_num(values).astype("int32")
+    if "lastTradeDate" in chain:
+        out["lastTradeDate"] = pd.to_datetime(chain["lastTradeDate"].to_numpy(), utc=True)
+    else:
+        out["lastTradeDate"] = pd.Series(pd.NaT, index=out.index, dtype="datetime64[ns, UTC]")
+    out["fetched"] = fetched
+    return out[COLUMNS]
+
+
+class OptionStore:
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        self.frame = empty_frame()
+        if path and os.path.exists(path):
+            # copy(): Arrow-backed buffers are read-only and upsert() writes in place
+            self.frame = pd.read_parquet(path).copy()
+        self.dirty = False
+        self.stats = {"fetched": 0, "skipped": 0, "failed": 0, "new": 0, "changed": 0, "unchanged": 0,
+                      "expired": 0}
+
+    def __len__(self):
+        return len(self.frame)
+
+    # -------------------------------
+    # 1. Writes
+    # -------------------------------
+    def upsert(self, rows):
+        """Insert new contracts and overwrite those whose quote changed.
+        Returns (new, changed)."""
+        rows = rows[~rows.index.duplicated(keep="last")]
+        pos = self.frame.index.get_indexer(rows.index)
+        present = pos >= 0
+        new = rows.loc[~present]
+        old, pos = rows.loc[present], pos[present]
+        current = self.frame[QUOTE].to_numpy(dtype="float64")[pos]
+        incoming = old[QUOTE].to_numpy(dtype="float64")
+        # NaN == NaN counts as unchanged
+        same = ((current == incoming) | (np.isnan(current) & np.isnan(incoming))).all(axis=1)
+        changed = old.loc[~same]
+        fetched = self.frame.columns.get_loc("fetched")
+        # Unchanged contracts were still seen now: bump their fetch time only.
+        # That is worth a write only if the stored time had gone stale, or the
+        # next run would refetch them; fresher bumps stay in memory.
+        stale_bump = False
+        if same.any():
+            seen = old["fetched"].iloc[0]
+            stale_bump = bool((seen - self.frame["fetched"].iloc[pos[same]] > MAX_AGE).any())
+            self.frame.iloc[pos[same], fetched] = seen
+        for c in COLUMNS if len(changed) else ():
+            self.frame.iloc[pos[~same], self.frame.columns.get_loc(c)] = changed[c].array
+        if len(new):
+            self.frame = self._concat(self.frame, new)
+        self.stats["new"] += len(new)
+        self.stats["changed"] += len(changed)
+        self.stats["unchanged"] += int(same.sum())
+        self.dirty = self.dirty or bool(len(new) or len(changed) or stale_bump)
+        return len(new), len(changed)
+
+    @staticmethod
+    def _concat(a, b):
+        out = pd.concat([a, b]) if len(a) else b.copy()
+        for c in CATEGORIES:
+            out[c] = out[c].astype("category")
+        return out
+
+    def prune(self, today=None):
+        """Drop contracts past expiry"""
+        today = pd.Timestamp(today or pd.Timestamp.today()).normalize()
+        expired = self.frame["expiry"] < today
+        if expired.any():
+            self.frame = self.frame.loc[~expired]
+            self.stats["expired"] += int(expired.sum())
+            self.dirty = True
+        return int(expired.sum())
+
+    def save(self):
+        """Write the Parquet file if anything changed. Returns True if written."""
+        if not self.dirty or not self.path:
+            return False
+        frame = self.frame.copy()
+        for c in CATEGORIES:
+            frame[c] = frame[c].cat.remove_unused_categories()
+        # Per-process temp name: ip.py and we.py share the store and may save at once
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        frame.to_parquet(tmp, compression="zstd")
+        os.replace(tmp, self.path)
+        self.dirty = False
+        return True
+
+    # -------------------------------
+    # 2. Refresh policy
+    # -------------------------------
+    def last_fetched(self, underlying, expiry):
+        mask = (self.frame["underlying"] == underlying).values & \
+               (self.frame["expiry"] == pd.Timestamp(expiry)).values
+        if not mask.any():
+            return None
+        return self.frame["fetched"].values[mask].min()
+
+    def needs_refresh(self, underlying, expiry, now=None):
+        now = now or pd.Timestamp.now(tz="UTC")
+        if (pd.Timestamp(expiry) - now.tz_localize(None).normalize()).days <= NEAR_DAYS:
+            return True
+        fetched = self.last_fetched(underlying, expiry)
+        return fetched is None or now - pd.Timestamp(fetched).tz_localize("UTC") > MAX_AGE
+
+    def refresh(self, symbols, max_expiries=None):
+        """Fetch stale expiries for `symbols` (the first `max_expiries` per
+        symbol, all when None) from yfinance and upsert them"""
+        import yfinance as yf
+        self.prune()
+        now = pd.Timestamp.now(tz="UTC")
+        for sym in symbols:
+            try:
+                t = yf.Ticker(sym)
+                expirations = list(run_trace.fetch(f"{sym} expiries", lambda: t.options))[:max_expiries]
+                stale = [exp for exp in expirations if self.needs_refresh(sym, exp, now)]
+                self.stats["skipped"] += len(expirations) - len(stale)
+                run_trace.count("cache_hits", len(expirations) - len(stale), cache="options")
+                run_trace.count("cache_misses", len(stale), cache="options")
+                if not stale:
+                    continue
+                spot = run_trace.fetch(sym, t.history, period="1d")['Close'].iloc[-1]
+                for exp in stale:
+                    chain = run_trace.fetch(f"{sym} {exp}", t.option_chain, exp)
+                    with run_trace.span("parse", f"{sym} {exp}") as attrs:
+                        rows = pd.concat([compact(chain.calls, sym, exp, "Call", spot, now),
+                                          compact(chain.puts, sym, exp, "Put", spot, now)])
+                        self.upsert(rows)
+                        attrs["rows"] = len(rows)
+                    self.stats["fetched"] += 1
+            except Exception as e:
+                # One symbol's failure doesn't stop the others, but is reported
+                self.stats["failed"] += 1
+                print(f"options for {sym} not refreshed: {e}")
+        return self
+
+    # -------------------------------
+    # 3. Queries
+    # -------------------------------
+    def _mask(self, underlying=None, type=None, expiry=None, strike=None, min_volume=None):
+        f = self.frame
+        mask = np.ones(len(f), dtype=bool)
+        if underlying is not None:
+            names = [underlying] if isinstance(underlying, str) else list(underlying)
+            mask &= f["underlying"].isin(names).values
+        if type is not None:
+            mask &= (f["type"] == type).values
+        if expiry is not None:
+            lo, hi = expiry if isinstance(expiry, tuple) else (expiry, expiry)
+            e = f["expiry"].values
+            mask &= (e >= np.datetime64(pd.Timestamp(lo))) & (e <= np.datetime64(pd.Timestamp(hi)))
+        if strike is not None:
+            s = f["strike"].values
+            mask &= (s >= strike[0]) & (s <= strike[1])
+        if min_volume is not None:
+            mask &= f["volume"].values >= min_volume
+        return mask
+
+    def query(self, columns=None, **filters):
+        """Contracts matching the filters (underlying, type, expiry date or
+        (start, end), strike (lo, hi), min_volume), optionally only `columns`"""
+        rows = np.flatnonzero(self._mask(**filters))
+        frame = self.frame if columns is None else self.frame[columns]
+        return frame.iloc[rows]
+
+    def top(self, n=10, by="volume", columns=None, **filters):
+        """The n largest contracts by `by` among those matching the filters"""
+        rows = np.flatnonzero(self._mask(**filters))
+        values = self.frame[by].values[rows].astype("float64")
+        if len(rows) > n:
+            keep = np.argpartition(-values, n - 1)[:n]
+            rows, values = rows[keep], values[keep]
+        rows = rows[np.argsort(-values, kind="stable")]
+        frame = self.frame if columns is None else self.frame[columns]
+        return frame.iloc[rows]
+
+    def nearest(self, symbols=None):
+        """Contracts of each underlying's nearest stored expiry"""
+        f = self.frame
+        mask = self._mask(underlying=symbols)
+        first = f.loc[mask].groupby("underlying", observed=True)["expiry"].transform("min")
+        rows = np.flatnonzero(mask)[(f["expiry"].values[mask] == first.values)]
+        return f.iloc[rows]
+
+    def memory_usage(self):
+        return int(self.frame.memory_usage(deep=True).sum())
+
+
+# -------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh and query the option-chain store")
+    parser.add_argument("symbols", nargs="*")
+    parser.add_argument("--store", default=STORE_PATH)
+    parser.add_argument("--expiries", default="1", help="expiries per symbol, or 'all'")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    store = OptionStore(args.store)
+    t0 = time.perf_counter()
+    if args.symbols:
+        store.refresh(args.symbols, None if args.expiries == "all" else int(args.expiries))
+    store.save()
+    s = store.stats
+    print(f"{len(store):,} contracts, {store.memory_usage() / 2**20:.1f} MB in memory; "
+          f"{s['fetched']} expiries fetched, {s['skipped']} fresh, {s['failed']} symbols failed; {s['new']} new, "
+          f"{s['changed']} changed, {s['expired']} expired ({time.perf_counter() - t0:.1f}s)")
+    print(store.top(args.top, columns=["underlying", "type", "expiry", "strike", "lastPrice",
+                                       "volume", "openInterest"]).to_string())
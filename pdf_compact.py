@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Compact PDF Output Mode (REPORT_COMPACT=1)
+One switch for the three PDF writers the reports use:
+- matplotlib PdfPages (car_sales_report.py, dd.py): maximum stream
+  compression; car_sales_report draws its charts as vectors instead of
+  embedding full-page PNG rasters
+- reportlab (ip.py, we.py, cl.py, sr.py): page compression, invariant
+  output (no timestamps/random IDs, so unchanged reports hash the same)
+- FPDF (as.py): stream compression and downscaling of oversized images
+  to the target DPI
+
+Afterwards optimize() makes a pypdf pass when pypdf is installed. It
+downsamples embedded images above REPORT_DPI (default 150) for the page
+they sit on, deduplicates identical objects (repeated images, fonts and
+patterns), drops orphans and recompresses content streams. The result
+replaces the file only when it is smaller. Fonts are subset by the
+writers themselves (matplotlib and fpdf2 embed only used glyphs, and
+reportlab's core fonts are not embedded).
+
+Every report prints its size and render time through output().
+"""
+
+import os
+import time
+import argparse
+from contextlib import contextmanager
+
+import run_trace
+
+try:
+    from pypdf import PdfReader, PdfWriter
+    PYPDF_AVAILABLE = True
+except Exception:
+    PYPDF_AVAILABLE = False
+
+COMPACT = os.environ.get("REPORT_COMPACT") == "1"
+TARGET_DPI = int(os.environ.get("REPORT_DPI", "150"))
+
+
+# -------------------------------
+# 1. Writer settings
+# -------------------------------
+def configure_matplotlib():
+    import matplotlib
+    if COMPACT:
+        matplotlib.rcParams["pdf.compression"] = 9
+
+
+def reportlab_options():
+    """Extra SimpleDocTemplate keyword arguments"""
+    return {"pageCompression": 1, "invariant": 1} if COMPACT else {}
+
+
+def configure_fpdf(pdf):
+    pdf.set_compression(True)
+    if COMPACT:
+        pdf.oversized_images = "DOWNSCALE"
+        pdf.oversized_images_ratio = TARGET_DPI / 72  # pixels per point
+    return pdf
+
+
+# -------------------------------
+# 2. pypdf post-pass
+# -------------------------------
+def _downsample(page, dpi):
+    from PIL import Image
+    # Without placement info, no image needs more pixels than the page at `dpi`
+    limit = max(float(page.mediabox.width), float(page.mediabox.height)) / 72 * dpi
+    count = 0
+    for img in page.images:
+        pil = img.image
+        if max(pil.size) <= limit:
+            continue
+        scale = limit / max(pil.size)
+        size = (max(1, round(pil.width * scale)), max(1, round(pil.height * scale)))
+        img.replace(pil.resize(size, Image.LANCZOS), optimize=True)
+        count += 1
+    return count
+
+
+def optimize(path, dpi=TARGET_DPI):
+    """Downsample, dedupe and recompress `path` in place; returns bytes saved"""
+    if not PYPDF_AVAILABLE:
+        return 0
+    before = os.path.getsize(path)
+    writer = PdfWriter(clone_from=PdfReader(path))
+    for page in writer.pages:
+        try:
+            _downsample(page, dpi)
+        except Exception:
+            pass  # unusual colour spaces: keep the original image
+        page.compress_content_streams()
+    writer.compress_identical_objects()  # dedupe + drop unreferenced objects
+    tmp = path + ".compact"
+    with open(tmp, "wb") as f:
+        writer.write(f)
+    if os.path.getsize(tmp) < before:
+        os.replace(tmp, path)
+    else:
+        os.remove(tmp)
+    return before - os.path.getsize(path)
+
+
+# -------------------------------
+# 3. Size and time reporting
+# -------------------------------
+@contextmanager
+def output(path, label=None):
+    """Wrap a PDF render: optimizes in compact mode, then reports size and time"""
+    t0 = time.perf_counter()
+    with run_trace.span("pdf", label or os.path.basename(path)) as attrs:
+        yield
+        if COMPACT:
+            optimize(path)
+        attrs["bytes"] = os.path.getsize(path)
+    elapsed = time.perf_counter() - t0
+    mode = "compact" if COMPACT else "standard"
+    print(f"✓ {label or os.path.basename(path)}: {os.path.getsize(path) / 1024:,.1f} KB "
+          f"in {elapsed:.2f}s ({mode})")
+
+
+# -------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shrink existing PDFs in place")
+    parser.add_argument("pdfs", nargs="+")
+    parser.add_argument("--dpi", type=int, default=TARGET_DPI)
+    args = parser.parse_args()
+
+    for p in args.pdfs:
+        before = os.path.getsize(p)
+        saved = optimize(p, args.dpi)
+        print(f"{p}: {before / 1024:,.1f} KB → {(before - saved) / 1024:,.1f} KB")
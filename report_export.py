@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Machine-Readable Exports of the Report Tables
+Every report can write the typed tables behind its PDF next to it, so
+downstream systems read numbers instead of re-parsing PDFs or CSV text:
+
+  exports/<report>/<table>.arrow     Arrow IPC file, uncompressed: open
+                                     with pa.memory_map and the columns
+                                     are used in place (see load())
+  exports/<report>/<table>.parquet   zstd Parquet, for storage/transfer
+  exports/<report>/<table>.ndjson    one JSON object per row, for small
+                                     consumers
+  exports/<report>/manifest.json     tables, row counts, schemas, files
+
+Tables go from the report's in-memory frames to Arrow once
+(Table.from_pandas: numeric columns without nulls are wrapped, not
+copied) and every format is written from that one Arrow table. Files
+are written to a temp name and renamed, so readers never see half a file.
+
+Switched on per run:
+  REPORT_EXPORT=arrow,parquet,ndjson   (or "all"; unset/empty = off)
+  REPORT_EXPORT_DIR=exports            (default)
+
+Scraped text cells ('1.23M', '+4.5%') become numbers with parse_numbers().
+
+Usage:
+  report_export.export("penny_stocks", {"universe": universe})
+  table = report_export.load("exports/penny_stocks/universe.arrow")
+
+  python report_export.py exports/penny_stocks/universe.arrow
+  python report_export.py --bench 1000000
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import run_trace
+
+FORMATS = ("arrow", "parquet", "ndjson")
+REPORT_EXPORT = os.environ.get("REPORT_EXPORT", "")
+EXPORT_DIR = os.environ.get("REPORT_EXPORT_DIR", "exports")
+
+
+def formats(spec=None):
+    """Formats named in `spec` (default REPORT_EXPORT), in FORMATS order"""
+    spec = REPORT_EXPORT if spec is None else spec
+    names = {s.strip().lower() for s in spec.split(",") if s.strip()}
+    if "all" in names:
+        return FORMATS
+    unknown = names - set(FORMATS)
+    if unknown:
+        raise ValueError(f"unknown export format(s): {', '.join(sorted(unknown))}")
+    return tuple(f for f in FORMATS if f in names)
+
+
+# -------------------------------
+# 1. Frames → Arrow
+# -------------------------------
+def parse_numbers(values):
+    """Scraped table cells ('1.23M', '+4.5%', '1,234.50') → floats, NaN if unparseable"""
+    text = pd.Series(values, dtype="string").str.replace(",", "", regex=False)
+    parts = text.str.extract(r"([-+]?\d*\.?\d+)\s*([KMBT]?)")
+    scale = parts[1].map({"K": 1e3, "M": 1e6, "B": 1e9, "T": 1e12}).astype("float64").fillna(1.0)
+    return (pd.to_numeric(parts[0], errors="coerce") * scale).to_numpy()
+
+
+def to_arrow(frame):
+    """pandas frame → Arrow table. A named index (asset, symbol, ...)
+    becomes a column; a plain RangeIndex is dropped."""
+    named = any(n is not None for n in frame.index.names)
+    if not all(isinstance(c, str) for c in frame.columns):
+        frame = frame.rename(columns=str)  # copies; only for non-string labels
+    return pa.Table.from_pandas(frame, preserve_index=named)
+
+
+# -------------------------------
+# 2. Writers
+# -------------------------------
+def _replace(path, write):
+    tmp = path + ".tmp"
+    write(tmp)
+    os.replace(tmp, path)
+    return path
+
+
+def write_arrow(table, path):
+    def write(tmp):
+        with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    return _replace(path, write)
+
+
+def write_parquet(table, path):
+    return _replace(path, lambda tmp: pq.write_table(table, tmp, compression="zstd"))
+
+
+def write_ndjson(table, path, batch_rows=65_536):
+    """One JSON object per row (NaN → null, ISO timestamps), written a
+    record batch at a time"""
+    def write(tmp):
+        with open(tmp, "w", encoding="utf-8") as f:
+            for batch in table.to_batches(max_chunksize=batch_rows):
+                # ignore_metadata: a named index stays a column instead of being dropped
+                rows = batch.to_pandas(ignore_metadata=True)
+                text = rows.to_json(orient="records", lines=True, date_format="iso", force_ascii=False)
+                if text:
+                    f.write(text if text.endswith("\n") else text + "\n")
+    return _replace(path, write)
+
+
+WRITERS = {"arrow": write_arrow, "parquet": write_parquet, "ndjson": write_ndjson}
+
+
+def export(report, tables, directory=None, fmts=None):
+    """Write each {name: frame} table of `report` in the requested formats
+    (default: REPORT_EXPORT) plus a manifest. Returns the paths written;
+    nothing happens when no format is selected."""
+    fmts = formats() if fmts is None else fmts
+    if not fmts:
+        return []
+    out_dir = os.path.join(directory or EXPORT_DIR, report)
+    os.makedirs(out_dir, exist_ok=True)
+    paths, manifest = [], {"report": report, "generated": pd.Timestamp.now(tz="UTC").isoformat(),
+                           "tables": {}}
+    for name, frame in tables.items():
+        if frame is None:
+            continue
+        with run_trace.span("export", name, formats=",".join(fmts)) as attrs:
+            table = to_arrow(frame)
+            files = [WRITERS[fmt](table, os.path.join(out_dir, f"{name}.{fmt}")) for fmt in fmts]
+            attrs["rows"] = table.num_rows
+        paths += files
+        manifest["tables"][name] = {
+            "rows": table.num_rows,
+            "columns": {f.name: str(f.type) for f in table.schema},
+            "files": [os.path.basename(p) for p in files],
+        }
+    def write_manifest(tmp):
+        with open(tmp, "w") as f:
+            json.dump(manifest, f, indent=2)
+    _replace(os.path.join(out_dir, "manifest.json"), write_manifest)
+    print(f"✓ {report}: {len(manifest['tables'])} tables exported as {', '.join(fmts)} → {out_dir}")
+    return paths
+
+
+# -------------------------------
+# 3. Readers
+# -------------------------------
+def load(path):
+    """An exported .arrow file as a memory-mapped Arrow table (no copy;
+    pages are read as columns are touched), .parquet/.ndjson read normally"""
+    if path.endswith(".arrow"):
+        return pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+    if path.endswith(".parquet"):
+        return pq.read_table(path, memory_map=True)
+    return pa.Table.from_pandas(pd.read_json(path, lines=True), preserve_index=False)
+
+
+# -------------------------------
+# 4. Benchmark / CLI
+# -------------------------------
+def benchmark(rows=1_000_000, seed=0):
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame({
+        "symbol": pd.Categorical(rng.choice([f"S{i}" for i in range(5000)], rows)),
+        "price": rng.uniform(1, 500, rows),
+        "volume": rng.integers(0, 10**7, rows),
+        "pct_change": rng.normal(0, 2, rows),
+    })
+    t0 = time.perf_counter()
+    table = to_arrow(frame)
+    t1 = time.perf_counter()
+    shared = np.shares_memory(table["price"].chunk(0).to_numpy(), frame["price"].to_numpy())
+    print(f"{rows:,} rows → Arrow in {(t1 - t0) * 1000:.1f} ms (price column shared, not copied: {shared})")
+    root = tempfile.mkdtemp(prefix="exports-")
+    for fmt in FORMATS:
+        path = os.path.join(root, f"bench.{fmt}")
+        t0 = time.perf_counter()
+        WRITERS[fmt](table, path)
+        t1 = time.perf_counter()
+        loaded = load(path)
+        t2 = time.perf_counter()
+        print(f"{fmt:>8}: write {t1 - t0:.2f}s, {os.path.getsize(path) / 2**20:,.1f} MB, "
+              f"read {(t2 - t1) * 1000:,.1f} ms ({loaded.num_rows:,} rows)")
+        os.remove(path)
+    os.rmdir(root)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect exported report tables")
+    parser.add_argument("paths", nargs="*")
+    parser.add_argument("--bench", type=int, metavar="ROWS", default=0)
+    args = parser.parse_args()
+    if args.bench:
+        benchmark(args.bench)
+    for path in args.paths:
+        table = load(path)
+        print(f"{path}: {table.num_rows:,} rows")
+        print(table.schema)
+        print(table.slice(0, 10).to_pandas().to_string())
+    if not args.bench and not args.paths:
+        parser.print_help(sys.stderr)
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Vector Charts for the reportlab Reports
+Small charts drawn straight into the PDF as reportlab graphics, with no
+matplotlib import and no PNG round-trip:
+- bar_chart:  labelled vertical bars with a highlighted bar and zero line
+- sparkline:  a price path with a coloured last point, sized for a table cell
+- winloss:    up/down bars for a sequence of changes
+- heatmap:    a diverging colour grid (correlation matrices), binned with
+              lod_render so it never draws more cells than `max_cells` a side
+
+Each function returns a reportlab Drawing, which is a Flowable: it can be
+appended to a story or placed in a Table cell (one sparkline per row).
+draw_on_fpdf() replays a Drawing onto an FPDF page with FPDF's own vector
+primitives, so as.py gets the same charts without a raster.
+"""
+
+import math
+
+import numpy as np
+from reportlab.lib import colors
+from reportlab.lib.units import inch
+from reportlab.graphics.shapes import Drawing, Rect, Line, String, PolyLine, Circle, Group
+
+import lod_render
+
+UP = colors.HexColor("#228B22")
+DOWN = colors.HexColor("#B22222")
+BAR = colors.HexColor("#87CEEB")
+HIGHLIGHT = colors.HexColor("#2E8B57")
+AXIS = colors.HexColor("#808080")
+NEGATIVE = colors.HexColor("#2166AC")
+POSITIVE = colors.HexColor("#B2182B")
+
+
+def _clean(values):
+    return [float(v) for v in values if v is not None and not math.isnan(float(v))]
+
+
+# -------------------------------
+# 1. Bar chart
+# -------------------------------
+def _rotated(text, x, y, font_size, angle=45):
+    g = Group(String(0, 0, text, fontSize=font_size, textAnchor="end"))
+    g.translate(x, y)
+    g.rotate(angle)
+    return g
+
+
+def bar_chart(labels, values, width=6.5 * inch, height=3 * inch, title=None,
+              highlight=None, value_format="{:+.2f}%", font_size=7):
+    """Vertical bars from a zero baseline. `highlight` is the index of the
+    bar drawn in HIGHLIGHT (e.g. 0 for the top performer)."""
+    d = Drawing(width, height)
+    values = [float(v) for v in values]
+    top_pad = 16 if title else 6
+    bottom_pad = 34  # rotated labels
+    left_pad = 6
+    plot_h = height - top_pad - bottom_pad
+    if title:
+        d.add(String(width / 2, height - 11, title, fontName="Helvetica-Bold",
+                     fontSize=font_size + 3, textAnchor="middle"))
+    if not values:
+        return d
+
+    lo, hi = min(0.0, min(values)), max(0.0, max(values))
+    span = (hi - lo) or 1.0
+    y0 = bottom_pad + (0 - lo) / span * plot_h
+    slot = (width - 2 * left_pad) / len(values)
+    bar_w = slot * 0.7
+
+    for i, (label, v) in enumerate(zip(labels, values)):
+        x = left_pad + i * slot + (slot - bar_w) / 2
+        y = bottom_pad + (min(v, 0) - lo) / span * plot_h
+        h = abs(v) / span * plot_h
+        fill = HIGHLIGHT if i == highlight else BAR
+        d.add(Rect(x, y, bar_w, max(h, 0.5), fillColor=fill, strokeColor=None))
+        text_y = y + h + 2 if v >= 0 else y - font_size - 1
+        d.add(String(x + bar_w / 2, text_y, value_format.format(v), fontSize=font_size - 1,
+                     textAnchor="middle", fillColor=AXIS))
+        d.add(_rotated(str(label), x + bar_w / 2, bottom_pad - 4, font_size))
+
+    d.add(Line(left_pad, y0, width - left_pad, y0, strokeColor=AXIS, strokeWidth=0.5))
+    return d
+
+
+# -------------------------------
+# 2. Sparkline and win/loss
+# -------------------------------
+def sparkline(values, width=0.9 * inch, height=0.22 * inch, stroke_width=0.8):
+    """Line through `values` scaled to the box; last point green if the
+    series ended above where it started, red otherwise"""
+    d = Drawing(width, height)
+    values = _clean(values)
+    if len(values) < 2:
+        return d
+    lo, hi = min(values), max(values)
+    span = (hi - lo) or 1.0
+    pad = 2
+    step = (width - 2 * pad) / (len(values) - 1)
+    points = []
+    for i, v in enumerate(values):
+        points += [pad + i * step, pad + (v - lo) / span * (height - 2 * pad)]
+    color = UP if values[-1] >= values[0] else DOWN
+    d.add(PolyLine(points, strokeColor=color, strokeWidth=stroke_width))
+    d.add(Circle(points[-2], points[-1], 1.2, fillColor=color, strokeColor=None))
+    return d
+
+
+def winloss(values, width=0.9 * inch, height=0.22 * inch):
+    """One bar per value: up for gains, down for losses, nothing for zero"""
+    d = Drawing(width, height)
+    values = _clean(values)
+    if not values:
+        return d
+    mid = height / 2
+    slot = width / len(values)
+    for i, v in enumerate(values):
+        if v == 0:
+            continue
+        y, fill = (mid, UP) if v > 0 else (mid - (height / 2 - 1), DOWN)
+        d.add(Rect(i * slot + slot * 0.15, y, slot * 0.7, height / 2 - 1,
+                   fillColor=fill, strokeColor=None))
+    return d
+
+
+def sparkline_cells(closes, symbols, **kw):
+    """A sparkline per symbol from a closes frame (one column per symbol);
+    an empty Drawing where a symbol has no history"""
+    cells = []
+    for s in symbols:
+        series = closes[s].tolist() if s in getattr(closes, "columns", ()) else []
+        cells.append(sparkline(series, **kw))
+    return cells
+
+
+# -------------------------------
+# 3. Heatmap
+# -------------------------------
+def _diverging(v, lo, hi):
+    if v is None or math.isnan(v):
+        return colors.HexColor("#DDDDDD")
+    t = max(-1.0, min(1.0, (2 * v - hi - lo) / (hi - lo)))
+    end = POSITIVE if t >= 0 else NEGATIVE
+    return colors.linearlyInterpolatedColor(colors.white, end, 0, 1, abs(t))
+
+
+def heatmap(matrix, labels, width=6.5 * inch, height=6.5 * inch, title=None,
+            lo=-1.0, hi=1.0, max_cells=60, font_size=6):
+    """Square matrix as a colour grid: NEGATIVE at `lo`, white at the
+    midpoint, POSITIVE at `hi`. Larger matrices are binned (block means)
+    to `max_cells` per side; tick labels are thinned to what fits."""
+    matrix = np.asarray(matrix, dtype=np.float64)
+    labels = [str(l) for l in labels]
+    matrix, row_labels, _ = lod_render.bin_axis(matrix, labels, max_cells, axis=0)
+    matrix, col_labels, _ = lod_render.bin_axis(matrix, labels, max_cells, axis=1)
+
+    d = Drawing(width, height)
+    top_pad = 16 if title else 4
+    label_w = 60
+    legend_h = 22
+    side = min(width - label_w - 4, height - top_pad - label_w - legend_h)
+    x0, y0 = label_w, height - top_pad - side
+    if title:
+        d.add(String(width / 2, height - 11, title, fontName="Helvetica-Bold",
+                     fontSize=font_size + 4, textAnchor="middle"))
+    n_rows, n_cols = matrix.shape
+    cw, ch = side / n_cols, side / n_rows
+    for i in range(n_rows):
+        for j in range(n_cols):
+            d.add(Rect(x0 + j * cw, y0 + side - (i + 1) * ch, cw, ch,
+                       fillColor=_diverging(matrix[i, j], lo, hi), strokeColor=None))
+
+    slots = lod_render.label_slots(side, font_size, 72)
+    for i in lod_render.thin_ticks(n_rows, slots):
+        d.add(String(x0 - 3, y0 + side - (i + 0.5) * ch - font_size / 3, row_labels[i],
+                     fontSize=font_size, textAnchor="end"))
+    for j in lod_render.thin_ticks(n_cols, slots):
+        d.add(_rotated(col_labels[j], x0 + (j + 0.5) * cw, y0 - 4, font_size))
+
+    # Colour legend under the grid
+    steps = 21
+    lx, lw = x0 + side * 0.25, side * 0.5
+    for k in range(steps):
+        v = lo + (hi - lo) * k / (steps - 1)
+        d.add(Rect(lx + k * lw / steps, 4, lw / steps, 8, fillColor=_diverging(v, lo, hi),
+                   strokeColor=None))
+    for v, anchor in ((lo, "end"), (hi, "start")):
+        d.add(String(lx - 3 if v == lo else lx + lw + 3, 5, f"{v:+.1f}", fontSize=font_size,
+                     textAnchor=anchor, fillColor=AXIS))
+    return d
+
+
+# -------------------------------
+# 4. FPDF output
+# -------------------------------
+def _mul(m, t):
+    # Affine (a, b, c, d, e, f): apply t, then m
+    a, b, c, d, e, f = m
+    ta, tb, tc, td, te, tf = t
+    return (a * ta + c * tb, b * ta + d * tb, a * tc + c * td, b * tc + d * td,
+            a * te + c * tf + e, b * te + d * tf + f)
+
+
+def _rgb(color):
+    return [round(channel * 255) for channel in (color.red, color.green, color.blue)]
+
+
+def draw_on_fpdf(drawing, pdf, x, y, w):
+    """Draw `drawing` with its top-left corner at (x, y), `w` wide, in the
+    page's user units. Returns the y coordinate just below it."""
+    k = w / drawing.width
+
+    def page(m, px, py):
+        a, b, c, d, e, f = m
+        return x + (a * px + c * py + e) * k, y + (drawing.height - (b * px + d * py + f)) * k
+
+    def stroke(shape):
+        if shape.strokeColor is None:
+            return False
+        pdf.set_draw_color(*_rgb(shape.strokeColor))
+        pdf.set_line_width((shape.strokeWidth or 1) * k)
+        return True
+
+    def fill(shape):
+        if getattr(shape, "fillColor", None) is None:
+            return False
+        pdf.set_fill_color(*_rgb(shape.fillColor))
+        return True
+
+    def walk(node, m):
+        for shape in node.contents:
+            if isinstance(shape, Group):
+                walk(shape, _mul(m, shape.transform))
+            elif isinstance(shape, Rect):
+                corners = [page(m, shape.x + dx, shape.y + dy)
+                           for dx, dy in ((0, 0), (shape.width, 0), (shape.width, shape.height),
+                                          (0, shape.height))]
+                style = ("F" if fill(shape) else "") + ("D" if stroke(shape) else "")
+                if style:
+                    pdf.polygon(corners, style=style)
+            elif isinstance(shape, Line):
+                if stroke(shape):
+                    pdf.line(*page(m, shape.x1, shape.y1), *page(m, shape.x2, shape.y2))
+            elif isinstance(shape, PolyLine):
+                if stroke(shape):
+                    pts = shape.points
+                    pdf.polyline([page(m, pts[i], pts[i + 1]) for i in range(0, len(pts), 2)])
+            elif isinstance(shape, Circle):
+                style = ("F" if fill(shape) else "") + ("D" if stroke(shape) else "")
+                if style:
+                    pdf.circle(*page(m, shape.cx, shape.cy), shape.r * k, style=style)
+            elif isinstance(shape, String):
+                bold = "Bold" in (shape.fontName or "")
+                pdf.set_font("Helvetica", "B" if bold else "", shape.fontSize * k * pdf.k)
+                pdf.set_text_color(*_rgb(shape.fillColor or colors.black))
+                px, py = page(m, shape.x, shape.y)
+                width = pdf.get_string_width(shape.text)
+                shift = {"middle": width / 2, "end": width}.get(shape.textAnchor, 0)
+                angle = math.degrees(math.atan2(m[1], m[0]))
+                with pdf.rotation(angle, px, py):
+                    pdf.text(px - shift, py, shape.text)
+
+    walk(drawing, (1, 0, 0, 1, 0, 0))
+    pdf.set_text_color(0, 0, 0)
+    pdf.set_draw_color(0, 0, 0)
+    return y + drawing.height * k
@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""
+Stage Tracing and Metrics for the Report Pipelines
+Where a report run spends its time: spans around fetch (per symbol and
+per batch), parse, transform, chart, pdf, export and snapshot stages,
+plus counters for requests, retries, errors, cache hits/misses and
+rows processed. Each traced run writes
+
+  traces/<report>/<run>.json   every span (stage, name, parent, start,
+                               duration, status, attributes), per-stage
+                               totals, counters, peak RSS
+  traces/<report>/<run>.prom   the totals and counters in the
+                               OpenMetrics text format, for a textfile
+                               collector / pushgateway
+
+and prints a one-line breakdown. Stage seconds are exclusive (a pdf
+span nested in a build-cache render is not counted twice), so they add
+up to the traced part of the run.
+
+Nothing is recorded until a script calls start(): library modules can
+open spans unconditionally and they cost a None check when untraced.
+
+Switches:
+  REPORT_TRACE_DIR=traces   where the files go (default; empty = print only)
+  REPORT_PROFILE=3          cProfile each top-level span and keep the
+                            N slowest as <run>/<stage>-<name>.prof/.txt
+  REPORT_RETRIES=0          retries per failed fetch() call (backoff 0.5s, 1s, ...)
+
+Usage:
+  run_trace.start("top_20_penny_stocks")
+  hist = run_trace.fetch(ticker, t.history, period="1d")
+  with run_trace.span("transform", "rank") as attrs:
+      ...
+      attrs["rows"] = len(universe)      # also counted as rows{stage="transform"}
+  run_trace.count("cache_hits", cache="options")
+
+  python run_trace.py traces/top_20_penny_stocks/20261019-083000-1234.json
+  python run_trace.py --bench 100000
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import heapq
+import atexit
+import pstats
+import numbers
+import argparse
+import cProfile
+import itertools
+import threading
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+TRACE_DIR = os.environ.get("REPORT_TRACE_DIR", "traces")
+PROFILE = int(os.environ.get("REPORT_PROFILE", "0") or 0)
+RETRIES = int(os.environ.get("REPORT_RETRIES", "0") or 0)
+BACKOFF = 0.5
+
+_RUN = None
+
+
+# -------------------------------
+# 1. Run state
+# -------------------------------
+class _Run:
+    def __init__(self, report):
+        self.report = report
+        self.pid = os.getpid()
+        self.run_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{self.pid}"
+        self.started = time.time()
+        self.t0 = time.perf_counter()
+        self.ids = itertools.count(1)
+        self.spans = []
+        self.counters = {}
+        self.profiles = []      # heap of (duration, id, record, profiler), N slowest
+        self.profiling = False
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def stack(self):
+        if not hasattr(self.local, "stack"):
+            self.local.stack = []
+        return self.local.stack
+
+    def keep_profile(self, record, profiler):
+        with self.lock:
+            item = (record["duration"], record["id"], record, profiler)
+            if len(self.profiles) < PROFILE:
+                heapq.heappush(self.profiles, item)
+            elif item[0] > self.profiles[0][0]:
+                heapq.heapreplace(self.profiles, item)
+
+
+def start(report=None):
+    """Start tracing this process's run; files are written at exit"""
+    global _RUN
+    if _RUN is None:
+        report = report or os.path.splitext(os.path.basename(sys.argv[0] or "python"))[0]
+        _RUN = _Run(report)
+        atexit.register(finish)
+    return _RUN
+
+
+def active():
+    return _RUN is not None
+
+
+# -------------------------------
+# 2. Spans and counters
+# -------------------------------
+@contextmanager
+def span(stage, name=None, **attrs):
+    """Time a block as `stage` (fetch, parse, transform, chart, pdf, ...);
+    yields the attribute dict so the block can add rows, sizes, ... An
+    integer "rows" attribute is also added to the rows counter."""
+    run = _RUN
+    if run is None:
+        yield attrs
+        return
+    stack = run.stack()
+    record = {"id": next(run.ids), "parent": stack[-1]["id"] if stack else None,
+              "stage": stage, "name": None if name is None else str(name),
+              "thread": threading.current_thread().name, "attrs": attrs}
+    profiler = None
+    if PROFILE and not stack and not run.profiling and threading.current_thread() is threading.main_thread():
+        run.profiling = True
+        profiler = cProfile.Profile()
+        profiler.enable()
+    stack.append(record)
+    t0 = time.perf_counter()
+    try:
+        yield attrs
+        record["status"] = "ok"
+    except BaseException as exc:
+        record["status"] = "error"
+        record["error"] = f"{type(exc).__name__}: {exc}"[:200]
+        raise
+    finally:
+        t1 = time.perf_counter()
+        if profiler is not None:
+            profiler.disable()
+            run.profiling = False
+        stack.pop()
+        record["start"] = round(t0 - run.t0, 6)
+        record["duration"] = round(t1 - t0, 6)
+        with run.lock:
+            run.spans.append(record)
+        if profiler is not None:
+            run.keep_profile(record, profiler)
+        if isinstance(attrs.get("rows"), numbers.Integral):
+            count("rows", attrs["rows"], stage=stage)
+
+
+def traced(stage, name=None):
+    """Decorator form of span(); the name defaults to the function's"""
+    def wrap(fn):
+        def inner(*args, **kwargs):
+            with span(stage, name or fn.__name__):
+                return fn(*args, **kwargs)
+        inner.__name__, inner.__doc__, inner.__wrapped__ = fn.__name__, fn.__doc__, fn
+        return inner
+    return wrap
+
+
+def count(metric, n=1, **labels):
+    """Add n to a counter (requests, retries, errors, cache_hits,
+    cache_misses, rows) with optional labels (source=, cache=, stage=)"""
+    run = _RUN
+    if run is None or not n:
+        return
+    key = (metric, tuple(sorted((k, str(v)) for k, v in labels.items())))
+    with run.lock:
+        run.counters[key] = run.counters.get(key, 0) + n
+
+
+def fetch(name, call, *args, source="yahoo", retries=None, **kwargs):
+    """call(*args, **kwargs) as a fetch span counted as a request. A call
+    that raises is retried `retries` times (default REPORT_RETRIES) with
+    exponential backoff; the last error is re-raised."""
+    retries = RETRIES if retries is None else retries
+    with span("fetch", name, source=source) as attrs:
+        for attempt in range(retries + 1):
+            count("requests", source=source)
+            try:
+                return call(*args, **kwargs)
+            except Exception:
+                if attempt == retries:
+                    count("errors", source=source)
+                    raise
+                count("retries", source=source)
+                attrs["retries"] = attempt + 1
+                time.sleep(BACKOFF * 2 ** attempt)
+
+
+# -------------------------------
+# 3. Summaries and files
+# -------------------------------
+def stage_totals(spans):
+    """{stage: {calls, seconds (exclusive), max}} in descending seconds"""
+    child_time = {}
+    for s in spans:
+        if s["parent"] is not None:
+            child_time[s["parent"]] = child_time.get(s["parent"], 0.0) + s["duration"]
+    totals = {}
+    for s in spans:
+        t = totals.setdefault(s["stage"], {"calls": 0, "seconds": 0.0, "max": 0.0})
+        t["calls"] += 1
+        t["seconds"] += max(s["duration"] - child_time.get(s["id"], 0.0), 0.0)
+        t["max"] = max(t["max"], s["duration"])
+    return dict(sorted(((k, {**v, "seconds": round(v["seconds"], 6)}) for k, v in totals.items()),
+                       key=lambda kv: -kv[1]["seconds"]))
+
+
+def _peak_rss_mb():
+    # VmHWM is this process image's own peak; ru_maxrss also carries the
+    # high-water mark of the parent it was spawned from
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    scale = 1 / 1024 if sys.platform != "darwin" else 1 / 1024 ** 2
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale, 1)
+
+
+def _labels(pairs):
+    esc = lambda v: v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in pairs) + "}"
+
+
+def openmetrics(doc):
+    """OpenMetrics text for a trace document"""
+    report = [("report", doc["report"])]
+    lines = ["# TYPE report_run_seconds gauge", "# UNIT report_run_seconds seconds",
+             f"report_run_seconds{_labels(report)} {doc['duration']}"]
+    if doc.get("peak_rss_mb") is not None:
+        lines += ["# TYPE report_peak_rss_bytes gauge",
+                  f"report_peak_rss_bytes{_labels(report)} {int(doc['peak_rss_mb'] * 2 ** 20)}"]
+    lines += ["# TYPE report_stage_seconds counter", "# UNIT report_stage_seconds seconds",
+              "# HELP report_stage_seconds Exclusive time per stage."]
+    lines += [f"report_stage_seconds_total{_labels(report + [('stage', k)])} {v['seconds']}"
+              for k, v in doc["stages"].items()]
+    lines += ["# TYPE report_stage_calls counter"]
+    lines += [f"report_stage_calls_total{_labels(report + [('stage', k)])} {v['calls']}"
+              for k, v in doc["stages"].items()]
+    by_metric = {}
+    for c in doc["counters"]:
+        by_metric.setdefault(c["name"], []).append(c)
+    for metric, samples in sorted(by_metric.items()):
+        lines.append(f"# TYPE report_{metric} counter")
+        lines += [f"report_{metric}_total{_labels(report + sorted(c['labels'].items()))} {c['value']}"
+                  for c in samples]
+    return "\n".join(lines) + "\n# EOF\n"
+
+
+def _write(path, text):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def _save_profiles(run, directory):
+    paths = []
+    if not run.profiles:
+        return paths
+    os.makedirs(directory, exist_ok=True)
+    for duration, _, record, profiler in sorted(run.profiles, reverse=True):
+        label = "-".join(p for p in (record["stage"], record["name"]) if p)
+        base = os.path.join(directory, "".join(ch if ch.isalnum() or ch in "-_." else "_" for ch in label)[:80])
+        profiler.dump_stats(base + ".prof")
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(30)
+        _write(base + ".txt", f"{label}: {duration:.3f}s\n" + out.getvalue())
+        paths.append(base + ".prof")
+    return paths
+
+
+def document(run):
+    spans = sorted(run.spans, key=lambda s: s["start"])
+    return {
+        "report": run.report,
+        "run": run.run_id,
+        "started": time.strftime("%Y-%m-%dT%H:%M:%S%z", time.localtime(run.started)),
+        "duration": round(time.perf_counter() - run.t0, 6),
+        "peak_rss_mb": _peak_rss_mb(),
+        "stages": stage_totals(spans),
+        "counters": [{"name": m, "labels": dict(labels), "value": v}
+                     for (m, labels), v in sorted(run.counters.items())],
+        "spans": spans,
+    }
+
+
+def finish():
+    """Write this run's trace files and print the breakdown (runs at exit)"""
+    global _RUN
+    run, _RUN = _RUN, None
+    # Forked workers inherit the run but never own it
+    if run is None or run.pid != os.getpid():
+        return None
+    doc = document(run)
+    top = ", ".join(f"{k} {v['seconds']:.2f}s ({v['calls']})" for k, v in list(doc["stages"].items())[:4])
+    where = ""
+    if TRACE_DIR:
+        out_dir = os.path.join(TRACE_DIR, run.report)
+        os.makedirs(out_dir, exist_ok=True)
+        base = os.path.join(out_dir, run.run_id)
+        doc["profiles"] = _save_profiles(run, base) if PROFILE else []
+        _write(base + ".json", json.dumps(doc, indent=1, default=str))
+        _write(base + ".prom", openmetrics(doc))
+        where = f" → {base}.json"
+    print(f"✓ Trace {run.report}: {doc['duration']:.2f}s; {top or 'no spans'}{where}")
+    return doc
+
+
+# -------------------------------
+# 4. CLI / overhead benchmark
+# -------------------------------
+def show(path, slowest=10):
+    with open(path, encoding="utf-8") as f:
+        doc = json.load(f)
+    print(f"{doc['report']} run {doc['run']}: {doc['duration']:.2f}s, peak RSS {doc.get('peak_rss_mb')} MB")
+    for stage, t in doc["stages"].items():
+        print(f"  {stage:<12} {t['seconds']:>8.3f}s  {t['calls']:>5} calls  max {t['max']:.3f}s")
+    for c in doc["counters"]:
+        labels = ",".join(f"{k}={v}" for k, v in c["labels"].items())
+        print(f"  {c['name']}{'{' + labels + '}' if labels else ''} = {c['value']:,}")
+    print(f"  slowest spans:")
+    for s in sorted(doc["spans"], key=lambda s: -s["duration"])[:slowest]:
+        print(f"    {s['duration']:>8.3f}s  {s['stage']:<10} {s['name'] or ''} [{s['status']}]")
+
+
+def benchmark(n=100_000):
+    global _RUN
+    run = _RUN = _Run("bench")
+    t0 = time.perf_counter()
+    for i in range(n):
+        with span("transform", "outer"):
+            with span("fetch", i):
+                count("rows", 10, stage="fetch")
+    elapsed = time.perf_counter() - t0
+    doc = document(run)
+    _RUN = None
+    t0 = time.perf_counter()
+    for i in range(n):
+        with span("transform", "outer"):
+            pass
+    idle = time.perf_counter() - t0
+    print(f"{2 * n:,} spans + {n:,} counter updates: {elapsed:.2f}s "
+          f"({elapsed / (2 * n) * 1e6:.1f} µs per span); untraced span {idle / n * 1e6:.2f} µs; "
+          f"{len(json.dumps(doc)) / 2 ** 20:.1f} MB JSON")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show report run traces")
+    parser.add_argument("paths", nargs="*", help="trace .json files")
+    parser.add_argument("--slowest", type=int, default=10)
+    parser.add_argument("--bench", type=int, metavar="SPANS", default=0)
+    args = parser.parse_args()
+    if args.bench:
+        benchmark(args.bench)
+    for path in args.paths:
+        show(path, args.slowest)
+    if not args.bench and not args.paths:
+        parser.print_help(sys.stderr)
@@ -0,0 +1,580 @@
+#!/usr/bin/env python3
+"""
+SNAP Issuance Dashboard → Page-Streaming PDF
+Builds the dd.py dashboard one page at a time: each figure is built,
+written to the PdfPages stream and released before the next one starts,
+so memory stays flat whether the dashboard has 6 pages or 600
+(one per state plus the national rollups).
+
+Heavy intermediates (metrics, rankings, per-state county slices) are
+computed once in shared_context() and shared by every page. With
+workers > 1, contiguous page batches are rendered in a process pool and
+merged in order (requires pypdf).
+"""
+
+import os
+import gc
+import tempfile
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import matplotlib
+import matplotlib.pyplot as plt
+import seaborn as sns
+from matplotlib.backends.backend_pdf import PdfPages
+
+import lod_render
+import snap_stats
+import sketches
+import run_trace
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    from pypdf import PdfWriter
+    PYPDF_AVAILABLE = True
+except Exception:
+    PYPDF_AVAILABLE = False
+
+# Set style for better visualizations
+sns.set_style("whitegrid")
+plt.rcParams['figure.figsize'] = (11, 8.5)
+plt.rcParams['font.size'] = 9
+
+YEARS = ['FY2019', 'FY2020', 'FY2021']
+PAGES_PER_BATCH = 8
+GC_EVERY = 25
+
+
+# -------------------------------
+# 1. Shared intermediates
+# -------------------------------
+def year_sketches(df):
+    """One mergeable SummarySketch per fiscal year (see sketches.py)"""
+    return {year: sketches.SummarySketch().update(df[year]) for year in YEARS}
+
+
+def shared_context(df, counties=None, sketches_by_year=None):
+    """Compute everything pages read more than once.
+    `counties` is an optional State/County/FY2019.. frame for per-state pages;
+    `sketches_by_year` optional pre-built per-year sketches (else built from df)."""
+    ctx = {
+        'df': df,
+        'by_total': df.sort_values('Total_Issuance', ascending=False).reset_index(drop=True),
+        'by_growth': df.sort_values('Total_Growth', ascending=False).reset_index(drop=True),
+        'national_median': df[YEARS].median(),
+        'generated': datetime.now(),
+        'year_sketches': sketches_by_year or year_sketches(df),
+    }
+    ctx['total_rank'] = {s: i + 1 for i, s in enumerate(ctx['by_total']['State'])}
+    ctx['growth_rank'] = {s: i + 1 for i, s in enumerate(ctx['by_growth']['State'])}
+    if counties is not None and not len(counties):
+        counties = None
+    # Bootstrap CIs and robust outliers feed the summary, tables and state pages
+    ctx['growth_stats'] = snap_stats.growth_statistics(df, counties)
+    if counties is not None:
+        counties = counties.assign(Total=counties[YEARS].sum(axis=1))
+        # Row positions per state, so a state page slices without scanning
+        ctx['counties'] = counties
+        ctx['county_rows'] = counties.groupby('State', observed=True).indices
+        outliers = ctx['growth_stats']['county_outliers']
+        ctx['county_outliers'] = {state: set(group['County'].astype(str)) for state, group
+                                  in outliers.groupby(outliers['State'].astype(str), observed=True)}
+    return ctx
+
+
+# -------------------------------
+# 2. Rollup pages
+# -------------------------------
+def page_summary(ctx):
+    df, top = ctx['df'], ctx['by_total']
+    grow = ctx['by_growth']
+    fig = plt.figure(figsize=(11, 8.5))
+    fig.suptitle('SNAP Issuance Analysis Dashboard\nFY 2019-2021',
+                 fontsize=20, fontweight='bold', y=0.95)
+
+    ax = fig.add_subplot(111)
+    ax.axis('off')
+
+    top5_lines = "\n".join(
+        f"      {i + 1}. {top.loc[i, 'State']}: ${top.loc[i, 'Total_Issuance']:,.0f}"
+        for i in range(min(5, len(top))))
+    growth_lines = "\n".join(
+        f"      {i + 1}. {grow.loc[i, 'State']}: {grow.loc[i, 'Total_Growth']:.1f}%"
+        for i in range(min(3, len(grow))))
+    gstats = ctx['growth_stats']
+    mean, low, high = gstats['national']
+    outliers = gstats['state_outliers']
+    outlier_text = (", ".join(f"{r.State} ({r.Total_Growth:.0f}%)" for r in outliers.itertuples())
+                    if len(outliers) else "none")
+    county_text = ""
+    if 'county_national' in gstats:
+        c_mean, c_low, c_high = gstats['county_national']
+        county_text = (f"\n      - County growth: {c_mean:.1f}% average (CI {c_low:.1f}% – {c_high:.1f}%), "
+                       f"{len(gstats['county_outliers']):,} outlier counties")
+
+    summary_text = f"""
+    EXECUTIVE SUMMARY
+
+    Analysis Period: FY 2019 - FY 2021
+    Generated: {ctx['generated'].strftime('%B %d, %Y')}
+
+    KEY FINDINGS:
+
+    • Total SNAP Issuance (All States, 3 Years): ${df['Total_Issuance'].sum():,.0f}
+
+    • National Year-over-Year Growth:
+      - FY 2019 → 2020: {df['Growth_2019_2020'].mean():.1f}% average increase
+      - FY 2020 → 2021: {df['Growth_2020_2021'].mean():.1f}% average increase
+      - Overall Growth (2019-2021): {mean:.1f}% average
+        ({snap_stats.CONFIDENCE}% bootstrap CI: {low:.1f}% – {high:.1f}%)
+      - Growth outliers (robust |z| > {snap_stats.OUTLIER_Z}): {outlier_text}{county_text}
+
+    • Top 5 States by Total Issuance (FY 2019-2021):
+{top5_lines}
+
+    • Highest Growth States (FY 2019-2021):
+{growth_lines}
+
+    INSIGHTS:
+
+    • Significant increase in SNAP issuance across all states from 2019 to 2021,
+      likely reflecting economic impacts of the COVID-19 pandemic
+
+    • Large states (CA, TX, FL, NY) dominate total issuance volumes
+
+    • Growth rates vary significantly by state, indicating different regional
+      economic impacts and policy responses
+    """
+
+    ax.text(0.1, 0.5, summary_text, fontsize=11, verticalalignment='center',
+            fontfamily='monospace', bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.3))
+    return fig
+
+
+def page_top_states(ctx):
+    fig, ax = plt.subplots(figsize=(11, 8.5))
+    top15 = ctx['by_total'].head(15)
+
+    x = np.arange(len(top15))
+    width = 0.25
+
+    ax.bar(x - width, top15['FY2019']/1e9, width, label='FY 2019', alpha=0.8)
+    ax.bar(x, top15['FY2020']/1e9, width, label='FY 2020', alpha=0.8)
+    ax.bar(x + width, top15['FY2021']/1e9, width, label='FY 2021', alpha=0.8)
+
+    ax.set_xlabel('State', fontweight='bold', fontsize=12)
+    ax.set_ylabel('SNAP Issuance (Billions $)', fontweight='bold', fontsize=12)
+    ax.set_title('Top 15 States by Total SNAP Issuance (FY 2019-2021)',
+                 fontweight='bold', fontsize=14, pad=20)
+    ax.set_xticks(x)
+    ax.set_xticklabels(top15['State'], rotation=45, ha='right')
+    ax.legend(loc='upper right')
+    ax.grid(axis='y', alpha=0.3)
+
+    plt.tight_layout()
+    return fig
+
+
+def page_growth(ctx):
+    fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(11, 8.5))
+
+    # Top 15 by growth rate
+    top_growth = ctx['by_growth'].head(15)
+    ax1.barh(top_growth['State'], top_growth['Total_Growth'], color='steelblue', alpha=0.7)
+    ax1.set_xlabel('Total Growth Rate (%)', fontweight='bold')
+    ax1.set_title('Top 15 States by Growth Rate (FY 2019-2021)', fontweight='bold', fontsize=12)
+    ax1.grid(axis='x', alpha=0.3)
+
+    # Year-over-year growth comparison
+    growth_comparison = ctx['by_total'].head(10)[['State', 'Growth_2019_2020', 'Growth_2020_2021']]
+    x = np.arange(len(growth_comparison))
+    width = 0.35
+
+    ax2.bar(x - width/2, growth_comparison['Growth_2019_2020'], width,
+            label='2019→2020', alpha=0.8, color='coral')
+    ax2.bar(x + width/2, growth_comparison['Growth_2020_2021'], width,
+            label='2020→2021', alpha=0.8, color='lightseagreen')
+
+    ax2.set_xlabel('State', fontweight='bold')
+    ax2.set_ylabel('Growth Rate (%)', fontweight='bold')
+    ax2.set_title('Year-over-Year Growth: Top 10 States by Total Issuance',
+                  fontweight='bold', fontsize=12)
+    ax2.set_xticks(x)
+    ax2.set_xticklabels(growth_comparison['State'], rotation=45, ha='right')
+    ax2.legend()
+    ax2.grid(axis='y', alpha=0.3)
+    ax2.axhline(y=0, color='black', linestyle='-', linewidth=0.5)
+
+    plt.tight_layout()
+    return fig
+
+
+def _scaled_box(sketch, label, scale):
+    box = sketch.boxplot_stats(label)
+    for key in ('med', 'q1', 'q3', 'mean', 'whislo', 'whishi', 'fliers'):
+        box[key] = box[key] / scale
+    return box
+
+
+def page_distribution(ctx):
+    df = ctx['df']
+    fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(11, 8.5))
+    fig.suptitle('Statistical Distribution Analysis', fontweight='bold', fontsize=14)
+
+    # Box plots for each year, drawn from the per-year sketches
+    box_stats = [_scaled_box(ctx['year_sketches'][year], f"FY {year[2:]}", 1e6) for year in YEARS]
+    bp = ax1.bxp(box_stats, patch_artist=True)
+    for patch in bp['boxes']:
+        patch.set_facecolor('lightblue')
+    ax1.set_ylabel('SNAP Issuance (Millions $)', fontweight='bold')
+    ax1.set_title('Distribution by Fiscal Year', fontweight='bold')
+    ax1.grid(axis='y', alpha=0.3)
+
+    # Histogram of FY 2021
+    lod_render.histogram(ax2, df['FY2021']/1e6, bins=20, color='steelblue', alpha=0.7,
+                         edgecolor='black')
+    ax2.set_xlabel('SNAP Issuance (Millions $)', fontweight='bold')
+    ax2.set_ylabel('Number of States', fontweight='bold')
+    ax2.set_title('FY 2021 Issuance Distribution', fontweight='bold')
+    ax2.grid(axis='y', alpha=0.3)
+
+    # Scatter plot: FY2019 vs FY2021
+    ax3.scatter(df['FY2019']/1e6, df['FY2021']/1e6, alpha=0.6, s=50)
+    ax3.set_xlabel('FY 2019 Issuance (Millions $)', fontweight='bold')
+    ax3.set_ylabel('FY 2021 Issuance (Millions $)', fontweight='bold')
+    ax3.set_title('FY 2019 vs FY 2021 Comparison', fontweight='bold')
+
+    # Add diagonal line
+    max_val = max(df['FY2021'].max(), df['FY2019'].max()) / 1e6
+    ax3.plot([0, max_val], [0, max_val], 'r--', alpha=0.5, label='Equal Line')
+    ax3.legend()
+    ax3.grid(alpha=0.3)
+
+    # Growth rate distribution
+    lod_render.histogram(ax4, df['Total_Growth'], bins=20, color='coral', alpha=0.7,
+                         edgecolor='black')
+    ax4.set_xlabel('Total Growth Rate (%)', fontweight='bold')
+    ax4.set_ylabel('Number of States', fontweight='bold')
+    ax4.set_title('Growth Rate Distribution (2019-2021)', fontweight='bold')
+    ax4.axvline(x=df['Total_Growth'].mean(), color='red', linestyle='--',
+                linewidth=2, label=f'Mean: {df["Total_Growth"].mean():.1f}%')
+    ax4.legend()
+    ax4.grid(axis='y', alpha=0.3)
+
+    plt.tight_layout()
+    return fig
+
+
+def page_regional(ctx):
+    df = ctx['df']
+    fig = plt.figure(figsize=(11, 8.5))
+    fig.suptitle('Regional and Comparative Analysis', fontweight='bold', fontsize=14)
+
+    # Top 10 states pie chart for FY 2021
+    ax1 = plt.subplot(2, 2, (1, 2))
+    top10_fy2021 = df.nlargest(10, 'FY2021')
+    others = df['FY2021'].sum() - top10_fy2021['FY2021'].sum()
+
+    pie_data = list(top10_fy2021['FY2021']) + [others]
+    pie_labels = list(top10_fy2021['State']) + ['Others']
+
+    colors = plt.cm.Set3(np.linspace(0, 1, len(pie_data)))
+    ax1.pie(pie_data, labels=pie_labels, autopct='%1.1f%%', startangle=90, colors=colors)
+    ax1.set_title('FY 2021 Issuance Share (Top 10 States + Others)', fontweight='bold', pad=20)
+
+    # Heatmap of year-over-year data: every county (rolled up/binned to fit) or top 20 states
+    ax2 = plt.subplot(2, 1, 2)
+    counties = ctx.get('counties')
+    if counties is not None:
+        matrix = counties[YEARS].to_numpy(dtype=float).T
+        labels, groups = counties['County'].to_numpy(), counties['State'].to_numpy()
+        title = f'Normalized Issuance Heatmap ({len(counties):,} Counties)'
+    else:
+        top20 = ctx['by_total'].head(20)
+        matrix = top20[YEARS].to_numpy(dtype=float).T
+        labels, groups = top20['State'].to_numpy(), None
+        title = 'Normalized Issuance Heatmap (Top 20 States)'
+
+    # Normalize each column for better visualization
+    im, note = lod_render.heatmap(ax2, matrix, ['FY 2019', 'FY 2020', 'FY 2021'], labels,
+                                  col_groups=groups, normalize_axis=0)
+    ax2.set_title(title + (f"\n{note}" if note else ''), fontweight='bold', pad=10)
+
+    plt.colorbar(im, ax=ax2, label='Normalized Issuance')
+
+    plt.tight_layout()
+    return fig
+
+
+def page_tables(ctx):
+    df = ctx['df']
+    fig, ax = plt.subplots(figsize=(11, 8.5))
+    ax.axis('tight')
+    ax.axis('off')
+
+    fig.suptitle('Statistical Summary Tables', fontweight='bold', fontsize=14, y=0.98)
+
+    # Summary statistics
+    summary_data = []
+    for year in YEARS:
+        sketch = ctx['year_sketches'][year]
+        desc = sketch.describe()
+        summary_data.append([
+            year,
+            f"${sketch.moments.sum/1e9:.2f}B",
+            f"${desc['mean']/1e6:.2f}M",
+            f"${desc['50%']/1e6:.2f}M",
+            f"${desc['std']/1e6:.2f}M",
+            f"${desc['min']/1e6:.2f}M",
+            f"${desc['max']/1e9:.2f}B"
+        ])
+
+    table1 = ax.table(cellText=summary_data,
+                      colLabels=['Year', 'Total', 'Mean', 'Median', 'Std Dev', 'Min', 'Max'],
+                      cellLoc='center',
+                      loc='upper center',
+                      bbox=[0.1, 0.7, 0.8, 0.25])
+    table1.auto_set_font_size(False)
+    table1.set_fontsize(10)
+    table1.scale(1, 2)
+
+    # Style header
+    for i in range(7):
+        table1[(0, i)].set_facecolor('#4CAF50')
+        table1[(0, i)].set_text_props(weight='bold', color='white')
+
+    # Top/Bottom performers
+    top5 = ctx['by_growth'].head(5)
+    bottom5 = ctx['by_growth'].tail(5).iloc[::-1]
+
+    ax.text(0.5, 0.6, 'Top 5 Growth States (2019-2021)',
+            ha='center', fontweight='bold', fontsize=12, transform=ax.transAxes)
+
+    z = ctx['growth_stats']['state_z']
+    performers_data = [[row['State'], f"{row['Total_Growth']:.1f}%", f"{z[row['State']]:+.1f}"]
+                       for _, row in top5.iterrows()]
+
+    table2 = ax.table(cellText=performers_data,
+                      colLabels=['State', 'Growth Rate', 'Robust z'],
+                      cellLoc='center',
+                      loc='center',
+                      bbox=[0.1, 0.35, 0.35, 0.2])
+    table2.auto_set_font_size(False)
+    table2.set_fontsize(9)
+
+    for i in range(3):
+        table2[(0, i)].set_facecolor('#2196F3')
+        table2[(0, i)].set_text_props(weight='bold', color='white')
+
+    ax.text(0.5, 0.3, 'Bottom 5 Growth States (2019-2021)',
+            ha='center', fontweight='bold', fontsize=12, transform=ax.transAxes)
+
+    performers_data2 = [[row['State'], f"{row['Total_Growth']:.1f}%", f"{z[row['State']]:+.1f}"]
+                        for _, row in bottom5.iterrows()]
+
+    table3 = ax.table(cellText=performers_data2,
+                      colLabels=['State', 'Growth Rate', 'Robust z'],
+                      cellLoc='center',
+                      loc='center',
+                      bbox=[0.55, 0.35, 0.35, 0.2])
+    table3.auto_set_font_size(False)
+    table3.set_fontsize(9)
+
+    for i in range(3):
+        table3[(0, i)].set_facecolor('#FF9800')
+        table3[(0, i)].set_text_props(weight='bold', color='white')
+
+    mean, low, high = ctx['growth_stats']['national']
+    ax.text(0.5, 0.15,
+            f"Mean state growth {mean:.1f}% ({snap_stats.CONFIDENCE}% bootstrap CI "
+            f"{low:.1f}% – {high:.1f}%, {snap_stats.N_BOOT:,} resamples). "
+            f"Robust z = 0.6745·(x − median)/MAD; |z| > {snap_stats.OUTLIER_Z} is an outlier.",
+            ha='center', fontsize=9, style='italic', transform=ax.transAxes)
+
+    return fig
+
+
+# -------------------------------
+# 3. Per-state pages
+# -------------------------------
+def page_state(ctx, state):
+    df = ctx['df']
+    row = df.loc[df['State'] == state].iloc[0]
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(11, 8.5),
+                                   gridspec_kw={'width_ratios': [1, 1.6]})
+    fig.suptitle(f"{state} – SNAP Issuance FY 2019-2021\n"
+                 f"Rank #{ctx['total_rank'][state]} by total, "
+                 f"#{ctx['growth_rank'][state]} by growth ({row['Total_Growth']:.1f}%)",
+                 fontweight='bold', fontsize=14)
+
+    # State vs national median
+    x = np.arange(len(YEARS))
+    width = 0.35
+    ax1.bar(x - width/2, row[YEARS].astype(float).values/1e6, width, label=state, color='steelblue')
+    ax1.bar(x + width/2, ctx['national_median'].values/1e6, width, label='National median',
+            color='lightgray')
+    ax1.set_xticks(x)
+    ax1.set_xticklabels(['FY 2019', 'FY 2020', 'FY 2021'])
+    ax1.set_ylabel('SNAP Issuance (Millions $)', fontweight='bold')
+    ax1.set_title('Issuance vs National Median', fontweight='bold')
+    ax1.legend()
+    ax1.grid(axis='y', alpha=0.3)
+
+    # County breakdown when county-level data was ingested
+    rows = ctx.get('county_rows', {}).get(state)
+    if rows is not None and len(rows):
+        gstats = ctx['growth_stats']
+        counties = ctx['counties'].iloc[rows].nlargest(25, 'Total')
+        # Growth outliers among all counties are drawn in a darker colour
+        flagged = ctx['county_outliers'].get(state, ())
+        colors = ['darkred' if c in flagged else 'coral' for c in counties['County'].astype(str)]
+        ax2.barh(counties['County'].astype(str), counties['Total']/1e6, color=colors, alpha=0.8)
+        ax2.invert_yaxis()
+        ax2.set_xlabel('Total Issuance FY 2019-2021 (Millions $)', fontweight='bold')
+        title = f'Top {len(counties)} of {len(rows)} Counties'
+        per_state = gstats.get('per_state')
+        if per_state is not None and state in per_state.index:
+            ci = per_state.loc[state]
+            title += (f"\nMean county growth {ci['mean']:.1f}% "
+                      f"({snap_stats.CONFIDENCE}% CI {ci['ci_low']:.1f}% – {ci['ci_high']:.1f}%)")
+        if 'county_national' in gstats:
+            title += f"\nAll counties {gstats['county_national'][0]:.1f}%; {len(flagged)} outliers here (dark)"
+        ax2.set_title(title, fontweight='bold')
+        ax2.tick_params(axis='y', labelsize=7)
+        ax2.grid(axis='x', alpha=0.3)
+    else:
+        ax2.axis('off')
+        ax2.text(0.05, 0.5,
+                 "\n".join([f"{y[:2]} {y[2:]}: ${row[y]:,.0f}" for y in YEARS] +
+                           ["", f"2019→2020: {row['Growth_2019_2020']:+.1f}%",
+                            f"2020→2021: {row['Growth_2020_2021']:+.1f}%"]),
+                 fontsize=12, fontfamily='monospace', va='center')
+
+    plt.tight_layout()
+    return fig
+
+
+ROLLUP_PAGES = [page_summary, page_top_states, page_growth,
+                page_distribution, page_regional, page_tables]
+
+
+def page_specs(ctx, per_state=False):
+    """Ordered list of (builder, args) – one entry per output page"""
+    specs = [(builder, ()) for builder in ROLLUP_PAGES]
+    if per_state:
+        specs += [(page_state, (state,)) for state in sorted(ctx['df']['State'])]
+    return specs
+
+
+# -------------------------------
+# 4. Streaming writers
+# -------------------------------
+def _set_metadata(pdf):
+    d = pdf.infodict()
+    d['Title'] = 'SNAP Issuance Analysis Dashboard FY 2019-2021'
+    d['Author'] = 'Data Analysis System'
+    d['Subject'] = 'Statistical Analysis and Visualization'
+    d['Keywords'] = 'SNAP, Food Assistance, Statistical Analysis, Dashboard'
+    d['CreationDate'] = datetime.now()
+
+
+def _stream_pages(ctx, specs, filename, metadata=True):
+    with PdfPages(filename) as pdf:
+        for i, (builder, args) in enumerate(specs, 1):
+            with run_trace.span("chart", builder.__name__.replace("page_", "") + "".join(f" {a}" for a in args)):
+                fig = builder(ctx, *args)
+                pdf.savefig(fig, bbox_inches='tight')
+            # Release the figure and everything it references before the next page
+            fig.clf()
+            plt.close(fig)
+            del fig
+            if i % GC_EVERY == 0:
+                gc.collect()
+        if metadata:
+            _set_metadata(pdf)
+    return len(specs)
+
+
+_WORKER_CTX = None
+
+
+def _init_worker(ctx):
+    # Each worker receives the shared context once, not once per page
+    global _WORKER_CTX
+    matplotlib.use('Agg')
+    _WORKER_CTX = ctx
+
+
+def _render_batch(job):
+    index, specs, tmp_dir = job
+    part = os.path.join(tmp_dir, f"part-{index:05d}.pdf")
+    _stream_pages(_WORKER_CTX, specs, part, metadata=False)
+    return part
+
+
+def _merge_parts(parts, filename):
+    writer = PdfWriter()
+    for part in parts:
+        writer.append(part)
+    writer.add_metadata({
+        '/Title': 'SNAP Issuance Analysis Dashboard FY 2019-2021',
+        '/Author': 'Data Analysis System',
+        '/Subject': 'Statistical Analysis and Visualization',
+        '/Keywords': 'SNAP, Food Assistance, Statistical Analysis, Dashboard',
+    })
+    with open(filename, 'wb') as f:
+        writer.write(f)
+
+
+def peak_memory_mb():
+    """Peak RSS of this process and of finished worker processes, in MB"""
+    if resource is None:
+        return None, None
+    # ru_maxrss is KB on Linux, bytes on macOS
+    scale = 1 / 1024 if os.uname().sysname != 'Darwin' else 1 / 1024 ** 2
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale
+    return own, children
+
+
+def build_dashboard(df, filename, counties=None, per_state=False, workers=1, sketches_by_year=None):
+    """Write the dashboard page by page. Returns the number of pages written."""
+    with run_trace.span("transform", "shared context", rows=len(df)):
+        ctx = shared_context(df, counties, sketches_by_year)
+    specs = page_specs(ctx, per_state=per_state)
+
+    if workers > 1 and not PYPDF_AVAILABLE:
+        print("Warning: pypdf not installed, rendering pages sequentially")
+        workers = 1
+    # Workers are forked: they share ctx copy-on-write and never re-run the
+    # calling script (spawn would re-import dd.py, which runs at import)
+    if workers > 1 and 'fork' not in multiprocessing.get_all_start_methods():
+        print("Warning: no fork start method on this platform, rendering pages sequentially")
+        workers = 1
+
+    if workers <= 1:
+        pages = _stream_pages(ctx, specs, filename)
+    else:
+        batches = [specs[i:i + PAGES_PER_BATCH] for i in range(0, len(specs), PAGES_PER_BATCH)]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            jobs = [(i, batch, tmp_dir) for i, batch in enumerate(batches)]
+            mp_ctx = multiprocessing.get_context('fork')
+            with ProcessPoolExecutor(max_workers=workers, mp_context=mp_ctx,
+                                     initializer=_init_worker, initargs=(ctx,)) as pool:
+                parts = list(pool.map(_render_batch, jobs))
+            _merge_parts(parts, filename)
+        pages = len(specs)
+
+    own, children = peak_memory_mb()
+    if own is not None:
+        msg = f"✓ Peak memory: {own:,.0f} MB"
+        if workers > 1:
+            msg += f" (largest worker: {children:,.0f} MB)"
+        print(msg)
+    return pages
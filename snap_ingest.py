@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+SNAP Issuance Ingestion → Partitioned Parquet Cache
+Streams raw USDA SNAP exports (CSV/TSV/Excel) in fixed-size chunks,
+normalizes them to a long format and writes a Parquet cache partitioned
+by fiscal year. dd.py memory-maps the cache instead of re-parsing the
+source, so peak memory depends on the chunk size, not the file size.
+
+Long format:
+- State        category
+- County       category ("" for state-level rows)
+- Period       category ("FY2019" for annual columns, "2021-03" for monthly rows)
+- Fiscal_Year  int16 (partition key)
+- Issuance     int64 (or float32 with --float32)
+
+Usage: python snap_ingest.py FY19-21.csv --cache snap_cache
+Requires: pandas, pyarrow (openpyxl for .xlsx inputs)
+"""
+
+import os
+import re
+import json
+import shutil
+import argparse
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pyarrow.dataset as ds
+
+import run_trace
+
+DEFAULT_CHUNKSIZE = 200_000
+MANIFEST = "_manifest.json"
+LONG_COLUMNS = ["State", "County", "Period", "Fiscal_Year", "Issuance"]
+PARTITIONING = ds.partitioning(pa.schema([("Fiscal_Year", pa.int16())]), flavor="hive")
+
+# Wide USDA exports label each year "FY-2019 Issuance" / "FY2019" / "FY 2019"
+FY_COLUMN = re.compile(r"FY[- ]?(\d{4})", re.IGNORECASE)
+
+# Header aliases seen across USDA releases → canonical names
+ALIASES = {
+    "state": "State", "state name": "State", "state/territory": "State",
+    "county": "County", "county name": "County", "project area": "County",
+    "month": "Period", "date": "Period", "period": "Period",
+    "issuance": "Issuance", "benefits": "Issuance", "total issuance": "Issuance",
+    "snap issuance": "Issuance", "benefit amount": "Issuance",
+}
+
+
+# -------------------------------
+# 1. Chunked readers
+# -------------------------------
+def _sniff_sep(path):
+    if path.lower().endswith((".tsv", ".tab", ".txt")):
+        return "\t"
+    with open(path, "r", encoding="utf-8-sig", errors="replace") as f:
+        head = f.readline()
+    return "\t" if head.count("\t") > head.count(",") else ","
+
+
+def _iter_csv(path, chunksize):
+    sep = _sniff_sep(path)
+    header = pd.read_csv(path, sep=sep, nrows=0, encoding="utf-8-sig").columns
+    # Text keys are categorical; amounts are parsed as float64 so "1,032,064,886"
+    # and blank cells survive, then narrowed in _normalize_chunk
+    dtypes = {c: "category" for c in header if _canonical(c) in ("State", "County")}
+    reader = pd.read_csv(path, sep=sep, thousands=",", chunksize=chunksize,
+                         dtype=dtypes, encoding="utf-8-sig", low_memory=True)
+    for chunk in reader:
+        yield chunk
+
+
+def _iter_excel(path, chunksize):
+    # pandas.read_excel loads the whole sheet; openpyxl's read-only mode streams rows
+    from openpyxl import load_workbook
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = [str(h) if h is not None else "" for h in next(rows)]
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= chunksize:
+                yield pd.DataFrame(batch, columns=header)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=header)
+    finally:
+        wb.close()
+
+
+def iter_chunks(path, chunksize=DEFAULT_CHUNKSIZE):
+    """Yield raw DataFrame chunks from a CSV/TSV or Excel export"""
+    if path.lower().endswith((".xlsx", ".xlsm")):
+        return _iter_excel(path, chunksize)
+    return _iter_csv(path, chunksize)
+
+
+# -------------------------------
+# 2. Normalization to long format
+# -------------------------------
+def _canonical(col):
+    name = str(col).strip()
+    return ALIASES.get(name.lower(), name)
+
+
+def _to_amount(series):
+    if series.dtype == object:
+        series = pd.to_numeric(series.astype(str).str.replace(r"[$,\s]", "", regex=True),
+                               errors="coerce")
+    return series.astype("float64")
+
+
+def _fiscal_year(dates):
+    # Federal fiscal years start in October: 2020-10 belongs to FY2021
+    return (dates.dt.year + (dates.dt.month >= 10)).astype("Int16")
+
+
+def _normalize_chunk(chunk, amount_dtype):
+    chunk = chunk.loc[:, [c for c in chunk.columns
+                          if not str(c).startswith("Unnamed") and str(c).strip()]]
+    chunk = chunk.rename(columns=_canonical)
+    if "State" not in chunk.columns:
+        raise ValueError(f"No State column in input (columns: {list(chunk.columns)})")
+    if "County" not in chunk.columns:
+        chunk["County"] = ""
+
+    fy_cols = {c: int(FY_COLUMN.search(str(c)).group(1))
+               for c in chunk.columns if FY_COLUMN.search(str(c))}
+    if fy_cols:
+        # Wide annual export: one column per fiscal year
+        long = chunk.melt(id_vars=["State", "County"], value_vars=list(fy_cols),
+                          var_name="Period", value_name="Issuance")
+        long["Fiscal_Year"] = long["Period"].map(fy_cols).astype("Int16")
+        long["Period"] = "FY" + long["Fiscal_Year"].astype(str)
+    elif {"Period", "Issuance"} <= set(chunk.columns):
+        # Already long (monthly county rows)
+        long = chunk[["State", "County", "Period", "Issuance"]].copy()
+        periods = pd.to_datetime(long["Period"], errors="coerce")
+        long["Fiscal_Year"] = _fiscal_year(periods)
+        long["Period"] = periods.dt.strftime("%Y-%m")
+    else:
+        raise ValueError("Input is neither wide (FY columns) nor long (Period + Issuance)")
+
+    long["Issuance"] = _to_amount(long["Issuance"])
+    long = long.dropna(subset=["Issuance", "Fiscal_Year"])
+    long["State"] = long["State"].astype(str).str.strip().astype("category")
+    long["County"] = long["County"].astype(object).fillna("").astype(str).str.strip().astype("category")
+    long["Period"] = long["Period"].astype("category")
+    long["Fiscal_Year"] = long["Fiscal_Year"].astype("int16")
+    if amount_dtype == "float32":
+        long["Issuance"] = long["Issuance"].astype("float32")
+    else:
+        long["Issuance"] = long["Issuance"].round().astype("int64")
+    return long[LONG_COLUMNS].reset_index(drop=True)
+
+
+# -------------------------------
+# 3. Cache writer
+# -------------------------------
+def _source_fingerprint(path):
+    st = os.stat(path)
+    return {"source": os.path.abspath(path), "size": st.st_size, "mtime": st.st_mtime}
+
+
+def default_cache_dir(source):
+    base = os.path.splitext(os.path.basename(source))[0]
+    return os.path.join(os.path.dirname(os.path.abspath(source)), f"{base}_parquet")
+
+
+def ingest(source, cache_dir=None, chunksize=DEFAULT_CHUNKSIZE, amount_dtype="int64"):
+    """Stream `source` into a Parquet cache partitioned by Fiscal_Year.
+    Only one chunk is held in memory at a time. Returns the cache directory."""
+    cache_dir = cache_dir or default_cache_dir(source)
+    tmp_dir = cache_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    rows = 0
+    for i, chunk in enumerate(iter_chunks(source, chunksize)):
+        long = _normalize_chunk(chunk, amount_dtype)
+        if long.empty:
+            continue
+        table = pa.Table.from_pandas(long, preserve_index=False)
+        pq.write_to_dataset(table, tmp_dir, partition_cols=["Fiscal_Year"],
+                            basename_template=f"chunk-{i:05d}-{{i}}.parquet")
+        rows += len(long)
+        run_trace.count("rows", len(long), stage="parse")
+        del chunk, long, table
+
+    os.makedirs(tmp_dir, exist_ok=True)
+    manifest = dict(_source_fingerprint(source), rows=rows, amount_dtype=amount_dtype,
+                    columns=LONG_COLUMNS)
+    with open(os.path.join(tmp_dir, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    # Swap in the finished cache so readers never see a half-written one
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    os.replace(tmp_dir, cache_dir)
+    return cache_dir
+
+
+def is_cache(path):
+    return os.path.isdir(path) and os.path.exists(os.path.join(path, MANIFEST))
+
+
+def cache_is_fresh(source, cache_dir):
+    if not is_cache(cache_dir):
+        return False
+    with open(os.path.join(cache_dir, MANIFEST)) as f:
+        manifest = json.load(f)
+    fp = _source_fingerprint(source)
+    return all(manifest.get(k) == v for k, v in fp.items())
+
+
+def ensure_cache(source, cache_dir=None, **kwargs):
+    """Return a cache directory for `source`, re-ingesting only when the source changed.
+    `source` may also be an existing cache directory."""
+    if is_cache(source):
+        return source
+    cache_dir = cache_dir or default_cache_dir(source)
+    if cache_is_fresh(source, cache_dir):
+        run_trace.count("cache_hits", cache="snap_ingest")
+        return cache_dir
+    run_trace.count("cache_misses", cache="snap_ingest")
+    with run_trace.span("parse", os.path.basename(source)):
+        return ingest(source, cache_dir, **kwargs)
+
+
+# -------------------------------
+# 4. Cache readers
+# -------------------------------
+def open_cache(cache_dir):
+    return ds.dataset(cache_dir, format="parquet", partitioning=PARTITIONING)
+
+
+def load_long(cache_dir, columns=None, fiscal_years=None):
+    """Memory-map the cache and return the long-format rows as a DataFrame"""
+    filters = [("Fiscal_Year", "in", list(fiscal_years))] if fiscal_years else None
+    table = pq.read_table(cache_dir, columns=columns or LONG_COLUMNS, filters=filters,
+                          memory_map=True, partitioning=PARTITIONING)
+    return table.to_pandas()
+
+
+def load_wide(cache_dir, fiscal_years=(2019, 2020, 2021), keys=("State",)):
+    """Totals per `keys` × fiscal year in dd.py's shape: State, FY2019, FY2020, ...
+    Aggregates batch by batch, so county/month caches never load in full."""
+    keys = list(keys)
+    dataset = open_cache(cache_dir)
+    cols = keys + ["Fiscal_Year", "Issuance"]
+    flt = ds.field("Fiscal_Year").isin(list(fiscal_years)) if fiscal_years else None
+    if "County" in keys:
+        county_flt = ds.field("County") != ""
+        flt = county_flt if flt is None else flt & county_flt
+
+    totals = None
+    for batch in dataset.to_batches(columns=cols, filter=flt):
+        part = batch.to_pandas().groupby(keys + ["Fiscal_Year"], observed=True)["Issuance"].sum()
+        totals = part if totals is None else totals.add(part, fill_value=0)
+
+    if totals is None:
+        return pd.DataFrame(columns=keys + [f"FY{y}" for y in fiscal_years or []])
+    wide = totals.unstack("Fiscal_Year")
+    wide.columns = [f"FY{int(y)}" for y in wide.columns]
+    wide = wide.reset_index()
+    for key in keys:
+        wide[key] = wide[key].astype(str)
+    return wide
+
+
+def load_counties(cache_dir, fiscal_years=(2019, 2020, 2021)):
+    """County × fiscal-year totals (empty when the source was state-level only)"""
+    return load_wide(cache_dir, fiscal_years, keys=("State", "County"))
+
+
+# -------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest a USDA SNAP export into a Parquet cache")
+    parser.add_argument("source", help="CSV/TSV/XLSX export")
+    parser.add_argument("--cache", help="cache directory (default: <source>_parquet)")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--float32", action="store_true", help="store amounts as float32")
+    args = parser.parse_args()
+
+    out = ingest(args.source, args.cache, chunksize=args.chunksize,
+                 amount_dtype="float32" if args.float32 else "int64")
+    with open(os.path.join(out, MANIFEST)) as f:
+        print(f"✓ Cached {json.load(f)['rows']:,} rows → {out}")
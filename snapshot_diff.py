@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Day-over-Day Diffs from the Snapshot Store
+What changed since the previous stored run, without re-fetching it:
+- compare(): today's and the prior table (both in rank order) joined on
+  symbol through one hash pass (pd.factorize), giving rank, prior
+  rank, rank change and top-N entries/exits as array operations over
+  the union of both tables
+- crossings(): symbols whose value moved across a threshold (the $5
+  penny line in cl.py)
+- summary() turns a comparison into a few "label: symbols" lines and
+  changes_table() lays them out as a small reportlab table, so each
+  report gets a compact "changes" section
+
+Usage:
+  prior, since = previous("winners_losers")
+  rows = summary(compare(universe, prior, top_n=10), top_n=10)
+  story.append(changes_table(rows, since))
+
+Benchmark: python snapshot_diff.py --bench 500000
+"""
+
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+from reportlab.lib import colors
+from reportlab.lib.units import inch
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import Paragraph, Table, TableStyle
+
+import snapshot_store
+
+KEY = snapshot_store.KEY
+
+
+# -------------------------------
+# 1. Prior snapshot
+# -------------------------------
+def previous(name, today=None):
+    """The last stored snapshot dated before today: (frame, date), or
+    (empty frame, None) when there is none"""
+    prior = snapshot_store.latest(name, before=today or pd.Timestamp.today().normalize())
+    if prior.empty:
+        return prior, None
+    return prior, prior["date"].iloc[0]
+
+
+# -------------------------------
+# 2. Comparison
+# -------------------------------
+def compare(today, prior, key=KEY, top_n=None, value=None):
+    """One row per symbol in either table, indexed by symbol in today's
+    order (then prior-only symbols): rank, prev_rank (NaN if new),
+    rank_change (positive = moved up), and with `top_n` the booleans
+    entered/exited for the top N. `value` also carries that column and
+    its prior value."""
+    cur_keys = today[key].astype(str).to_numpy(dtype=object)
+    old_keys = prior[key].astype(str).to_numpy(dtype=object) if len(prior) else np.array([], dtype=object)
+    # One hash pass over both key columns; then each symbol's position in
+    # the other table (-1 if absent) is an array lookup
+    codes, uniques = pd.factorize(np.concatenate([cur_keys, old_keys]))
+    cur_codes, old_codes = codes[:len(cur_keys)], codes[len(cur_keys):]
+    where_old = np.full(len(uniques), -1)
+    where_old[old_codes[::-1]] = np.arange(len(old_keys))[::-1]   # first occurrence wins
+    where_cur = np.full(len(uniques), -1)
+    where_cur[cur_codes[::-1]] = np.arange(len(cur_keys))[::-1]
+    in_old, in_cur = where_old[cur_codes], where_cur[old_codes]
+    gone = np.flatnonzero(in_cur < 0)
+
+    keys = pd.Index(np.concatenate([cur_keys, old_keys[gone]]), name=key)
+    rank = np.concatenate([np.arange(1, len(cur_keys) + 1), np.full(len(gone), np.nan)])
+    prev_rank = np.concatenate([np.where(in_old >= 0, in_old + 1.0, np.nan), gone + 1.0])
+    out = pd.DataFrame({"rank": rank, "prev_rank": prev_rank}, index=keys)
+    out["rank_change"] = out["prev_rank"] - out["rank"]
+    if top_n is not None:
+        now_in = out["rank"].to_numpy() <= top_n
+        was_in = out["prev_rank"].to_numpy() <= top_n
+        out["entered"] = now_in & ~was_in
+        out["exited"] = was_in & ~now_in
+    if value is not None:
+        cur_v = today[value].to_numpy(dtype="float64")
+        old_v = prior[value].to_numpy(dtype="float64") if len(prior) else np.array([])
+        out[value] = np.concatenate([cur_v, np.full(len(gone), np.nan)])
+        prev = np.full(len(keys), np.nan)
+        hit = np.flatnonzero(in_old >= 0)
+        prev[hit] = old_v[in_old[hit]]
+        prev[len(cur_keys):] = old_v[gone]
+        out[f"prev_{value}"] = prev
+    return out
+
+
+def crossings(diff, value, threshold):
+    """(fell_below, rose_above): rows of a compare(..., value=value) result
+    present in both tables whose `value` crossed `threshold`"""
+    both = diff.dropna(subset=[value, f"prev_{value}"])
+    now, before = both[value].to_numpy(), both[f"prev_{value}"].to_numpy()
+    return both[(now < threshold) & (before >= threshold)], both[(now >= threshold) & (before < threshold)]
+
+
+# -------------------------------
+# 3. Summary lines
+# -------------------------------
+def _names(frame, fmt, limit):
+    if frame.empty:
+        return None
+    items = [fmt(sym, r) for sym, r in frame.head(limit).iterrows()]
+    more = len(frame) - limit
+    return ", ".join(items) + (f" (+{more} more)" if more > 0 else "")
+
+
+def summary(diff, top_n=None, movers=3, limit=8, label=None):
+    """[(label, text)] lines: entries, exits and the biggest rank moves.
+    Without `top_n` entries/exits mean new or missing symbols."""
+    label = label or (f"top {top_n}" if top_n is not None else "the list")
+    if top_n is None:
+        entered, exited = diff[diff["prev_rank"].isna()], diff[diff["rank"].isna()]
+    else:
+        entered, exited = diff[diff["entered"]], diff[diff["exited"]]
+    moved = diff.dropna(subset=["rank_change"])
+    moved = moved[moved["rank_change"] != 0].sort_values("rank_change", ascending=False, kind="stable")
+    rows = [
+        (f"New in {label}", _names(entered, lambda s, r: f"{s} (#{r['rank']:.0f})", limit)),
+        (f"Left {label}", _names(exited, lambda s, r: f"{s} (was #{r['prev_rank']:.0f})", limit)),
+        ("Biggest climbers", _names(moved[moved["rank_change"] > 0].head(movers),
+                                    lambda s, r: f"{s} {r['rank_change']:+.0f} to #{r['rank']:.0f}", movers)),
+        ("Biggest fallers", _names(moved[moved["rank_change"] < 0].iloc[::-1].head(movers),
+                                   lambda s, r: f"{s} {r['rank_change']:+.0f} to #{r['rank']:.0f}", movers)),
+    ]
+    return [(k, v) for k, v in rows if v]
+
+
+def crossing_lines(fell, rose, value, threshold, fmt="${:.2f}"):
+    t = fmt.format(threshold)
+    show = lambda s, r: f"{s} {fmt.format(r[f'prev_{value}'])} to {fmt.format(r[value])}"
+    rows = [(f"Fell below {t}", _names(fell, show, 8)), (f"Rose above {t}", _names(rose, show, 8))]
+    return [(k, v) for k, v in rows if v]
+
+
+# -------------------------------
+# 4. Rendering
+# -------------------------------
+def changes_table(rows, since=None, width=6.5 * inch, header_bg=colors.HexColor("#555555")):
+    """Two-column reportlab table of summary lines; a one-line note when
+    there is nothing to compare"""
+    styles = getSampleStyleSheet()
+    if since is None:
+        return Paragraph("<i>No earlier snapshot to compare with yet.</i>", styles['Normal'])
+    if not rows:
+        return Paragraph(f"<i>No changes since {since:%b %d, %Y}.</i>", styles['Normal'])
+    cell = styles['Normal'].clone('ChangeCell', fontSize=8, leading=10)
+    data = [[Paragraph(f"<b>Since {since:%b %d, %Y}</b>", cell), ""]]
+    data += [[Paragraph(f"<b>{k}</b>", cell), Paragraph(v.replace("&", "&amp;"), cell)] for k, v in rows]
+    table = Table(data, colWidths=[1.5 * inch, width - 1.5 * inch], hAlign='CENTER')
+    table.setStyle(TableStyle([
+        ('SPAN', (0, 0), (-1, 0)),
+        ('BACKGROUND', (0, 0), (-1, 0), header_bg),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.HexColor("#f9f9f9"), colors.white]),
+    ]))
+    return table
+
+
+# -------------------------------
+# 5. Benchmark
+# -------------------------------
+def benchmark(n=500_000, seed=0):
+    rng = np.random.default_rng(seed)
+    symbols = np.array([f"S{i}" for i in range(n)], dtype=object)
+    prior = pd.DataFrame({"symbol": symbols[rng.permutation(n)], "price": rng.uniform(1, 10, n)})
+    keep = rng.random(n) > 0.01
+    fresh = np.array([f"N{i}" for i in range(n // 100)], dtype=object)
+    today = pd.DataFrame({"symbol": np.concatenate([symbols[keep], fresh])})
+    today = today.sample(frac=1, random_state=seed).reset_index(drop=True)
+    today["price"] = rng.uniform(1, 10, len(today))
+
+    t0 = time.perf_counter()
+    diff = compare(today, prior, top_n=100, value="price")
+    fell, rose = crossings(diff, "price", 5)
+    t1 = time.perf_counter()
+    # Same answer through a merge, for comparison
+    a = today.assign(rank=np.arange(1, len(today) + 1))
+    b = prior.assign(prev_rank=np.arange(1, n + 1))
+    merged = a.merge(b, on="symbol", how="outer", suffixes=("", "_prev"))
+    t2 = time.perf_counter()
+    assert len(merged) == len(diff)
+    print(f"{len(today):,} vs {n:,} symbols: compare + crossings {t1 - t0:.2f}s "
+          f"(outer merge alone {t2 - t1:.2f}s); {int(diff['entered'].sum())} entered top 100, "
+          f"{len(fell):,} fell below $5, {len(rose):,} rose above")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Day-over-day snapshot diffs")
+    parser.add_argument("name", nargs="?", help="snapshot dataset to diff (today vs prior)")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--bench", type=int, metavar="SYMBOLS", default=0)
+    args = parser.parse_args()
+    if args.bench:
+        benchmark(args.bench)
+    elif args.name:
+        days = snapshot_store.dates(args.name)
+        if len(days) < 2:
+            print(f"{args.name}: fewer than two snapshot days")
+        else:
+            today = snapshot_store.read(args.name, days[-1], days[-1])
+            prior, since = previous(args.name, days[-1])
+            for label, text in summary(compare(today, prior, top_n=args.top), args.top):
+                print(f"{label}: {text}")
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Append-Only Snapshot Store for the daily report tables
+Every report run appends the typed table behind its PDF/CSV to a
+Parquet dataset partitioned by month, instead of throwing it away:
+
+  snapshots/<name>/month=2026-10/part-20261019-153012123456.parquet
+
+- append() never rewrites anything: one zstd file per run, carrying
+  its `date` column (several runs a day leave several parts; reads keep
+  the last one per day unless asked for all)
+- each row gets its snapshot time and 1-based rank (table order), so
+  "top N" questions are a filter on rank
+- read() goes through pyarrow.dataset with memory-mapped local files:
+  date ranges prune whole month directories and, through the Parquet
+  min/max statistics, whole files; only the requested columns are
+  decoded and row filters are pushed down to the reader
+- compact() folds the daily parts of closed months into one file per
+  month (opening a file costs more than reading a day's rows), and
+  backfill() writes many days of history straight in that form
+- presence() / history() answer "how often was AMC in the top 10 over
+  the last year" and build date × symbol matrices from the snapshots
+
+Datasets written by the reports: winners_losers (sr.py), penny_stocks
+(cl.py), indices / most_active / options (ip.py), top20_sales
+(car_sales_report.py). SNAPSHOT_DIR sets the root; an empty value
+turns recording off.
+
+Usage:
+  snapshot_store.append("penny_stocks", df)
+  snapshot_store.presence("winners_losers", top_n=10, start="2025-10-19")
+
+  python snapshot_store.py winners_losers --symbol AMC --top 10 --days 365
+  python snapshot_store.py --bench 252
+"""
+
+import os
+import time
+import shutil
+import argparse
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
+
+import run_trace
+
+SNAPSHOT_DIR = os.environ.get("SNAPSHOT_DIR", "snapshots")
+KEY = "symbol"
+PARTITIONING = ds.partitioning(pa.schema([("month", pa.string())]), flavor="hive")
+# Memory-mapped reads: pages are mapped on access instead of copied
+FILESYSTEM = pafs.LocalFileSystem(use_mmap=True)
+
+
+def _path(name, directory=None):
+    return os.path.join(directory if directory is not None else SNAPSHOT_DIR, name)
+
+
+def _day(value):
+    return pd.Timestamp(value).date() if value is not None else None
+
+
+def _month(day):
+    return f"{day:%Y-%m}"
+
+
+# -------------------------------
+# 1. Writes
+# -------------------------------
+def _table(out):
+    """Frame → Arrow table with the store's column types"""
+    for c in out.columns[out.dtypes == object]:
+        if c != "date":
+            out[c] = out[c].astype("string")
+    table = pa.Table.from_pandas(out, preserve_index=False)
+    return table.set_column(table.schema.get_field_index("date"), "date",
+                            table["date"].cast(pa.date32()))
+
+
+def _write(table, path):
+    tmp = path + ".tmp"
+    pq.write_table(table, tmp, compression="zstd")
+    os.replace(tmp, path)
+    return path
+
+
+def append(name, frame, date=None, directory=None):
+    """Append one run's table (rows in report order) to dataset `name`,
+    dated today or `date`. Returns the file written."""
+    taken = pd.Timestamp.now(tz="UTC")
+    date = _day(date) or pd.Timestamp.today().date()
+    out = frame.reset_index(drop=True).copy()
+    out.columns = [str(c) for c in out.columns]
+    out.insert(0, "date", date)
+    out.insert(1, "rank", np.arange(1, len(out) + 1, dtype="int32"))
+    out["snapshot_time"] = taken
+    part_dir = os.path.join(_path(name, directory), f"month={_month(date)}")
+    os.makedirs(part_dir, exist_ok=True)
+    return _write(_table(out), os.path.join(part_dir, f"part-{date:%Y%m%d}-{taken:%H%M%S%f}.parquet"))
+
+
+def record(name, frame, date=None):
+    """append() for the report scripts: a no-op when SNAPSHOT_DIR is empty,
+    compacts closed months as it goes, and a failed write never stops a report"""
+    if not SNAPSHOT_DIR or frame is None or frame.empty:
+        return None
+    try:
+        with run_trace.span("snapshot", name, rows=len(frame)):
+            path = append(name, frame, date)
+            compact(name)
+        return path
+    except Exception as e:
+        print(f"snapshot {name} not recorded: {e}")
+        return None
+
+
+def backfill(name, frame, date_column="date", directory=None):
+    """Write many days at once: `frame` holds a `date_column` and rows in
+    rank order within each date. One file per month. Returns the days written."""
+    dates = pd.to_datetime(frame[date_column]).dt.normalize()
+    out = frame.drop(columns=[date_column]).reset_index(drop=True)
+    out.columns = [str(c) for c in out.columns]
+    out.insert(0, "date", dates.to_numpy())
+    out.insert(1, "rank", (frame.groupby(dates.values, sort=False).cumcount() + 1).to_numpy(dtype="int32"))
+    # Backfilled days count as recorded at the US close
+    out["snapshot_time"] = (dates + pd.Timedelta(hours=21)).dt.tz_localize("UTC").to_numpy()
+    stamp = pd.Timestamp.now(tz="UTC")
+    for month, part in out.groupby(dates.dt.to_period("M").values, sort=True):
+        month = str(month)
+        part_dir = os.path.join(_path(name, directory), f"month={month}")
+        os.makedirs(part_dir, exist_ok=True)
+        _write(_table(part.sort_values(["date", "rank"], kind="stable")),
+               os.path.join(part_dir, f"part-{month.replace('-', '')}-backfill{stamp:%H%M%S%f}.parquet"))
+    return int(dates.nunique())
+
+
+def compact(name, directory=None, today=None):
+    """Fold each closed month's part files into one (sorted by date, run
+    and rank). The current month keeps its daily parts. Returns the
+    months rewritten."""
+    root = _path(name, directory)
+    current = _month(_day(today) or pd.Timestamp.today().date())
+    done = []
+    for entry in sorted(os.listdir(root)) if os.path.isdir(root) else []:
+        month = entry.split("=", 1)[-1]
+        part_dir = os.path.join(root, entry)
+        parts = sorted(f for f in os.listdir(part_dir) if f.endswith(".parquet"))
+        if month >= current or len(parts) < 2:
+            continue
+        table = pa.concat_tables([pq.read_table(os.path.join(part_dir, f)) for f in parts],
+                                 promote_options="permissive")
+        table = table.sort_by([("date", "ascending"), ("snapshot_time", "ascending"),
+                               ("rank", "ascending")])
+        stamp = pd.Timestamp.now(tz="UTC")
+        _write(table, os.path.join(part_dir, f"part-{month.replace('-', '')}-compact{stamp:%H%M%S%f}.parquet"))
+        for f in parts:
+            os.remove(os.path.join(part_dir, f))
+        done.append(month)
+    return done
+
+
+# -------------------------------
+# 2. Reads
+# -------------------------------
+def dataset(name, directory=None):
+    if directory is None and not SNAPSHOT_DIR:
+        return None
+    path = _path(name, directory)
+    if not os.path.isdir(path):
+        return None
+    return ds.dataset(path, format="parquet", partitioning=PARTITIONING, filesystem=FILESYSTEM,
+                      ignore_prefixes=[".", "_"])
+
+
+def _range(start, end):
+    expr = ds.scalar(True)
+    if start is not None:
+        start = _day(start)
+        expr &= (ds.field("month") >= _month(start)) & (ds.field("date") >= start)
+    if end is not None:
+        end = _day(end)
+        expr &= (ds.field("month") <= _month(end)) & (ds.field("date") <= end)
+    return expr
+
+
+def read(name, start=None, end=None, columns=None, filter=None, all_runs=False, directory=None):
+    """Snapshots of `name` dated start..end (inclusive), as a frame with a
+    `date` column. `filter` is a pyarrow expression pushed to the scan;
+    by default only each day's last run is kept."""
+    data = dataset(name, directory)
+    if data is None:
+        return pd.DataFrame(columns=["date"] + list(columns or []))
+    expr = _range(start, end)
+    if filter is not None:
+        expr &= filter
+    wanted = None
+    if columns is not None:
+        wanted = list(dict.fromkeys(["date", *columns] + ([] if all_runs else ["snapshot_time"])))
+    frame = data.to_table(columns=wanted, filter=expr).to_pandas()
+    frame = frame.drop(columns="month", errors="ignore")
+    frame["date"] = pd.to_datetime(frame["date"])
+    if not all_runs and len(frame):
+        if filter is None:
+            last = frame.groupby("date")["snapshot_time"].transform("max")
+        else:
+            # A day's last run may have no rows passing the filter
+            runs = data.to_table(columns=["date", "snapshot_time"], filter=_range(start, end)).to_pandas()
+            runs = runs.groupby(pd.to_datetime(runs["date"]))["snapshot_time"].max()
+            last = runs.reindex(frame["date"])
+        frame = frame.loc[frame["snapshot_time"].values == last.values]
+        if columns is not None and "snapshot_time" not in columns:
+            frame = frame.drop(columns="snapshot_time")
+    return frame.sort_values(["date", "rank"] if "rank" in frame else ["date"],
+                             kind="stable").reset_index(drop=True)
+
+
+def dates(name, start=None, end=None, directory=None):
+    """Distinct snapshot dates, from the date column alone"""
+    data = dataset(name, directory)
+    if data is None:
+        return pd.DatetimeIndex([])
+    column = data.to_table(columns=["date"], filter=_range(start, end))["date"]
+    return pd.DatetimeIndex(sorted(set(column.unique().to_pylist())))
+
+
+def latest(name, before=None, directory=None):
+    """The most recent day's snapshot (strictly before `before` if given)"""
+    end = pd.Timestamp(before) - pd.Timedelta(days=1) if before is not None else None
+    days = dates(name, end=end, directory=directory)
+    if not len(days):
+        return pd.DataFrame()
+    return read(name, days[-1], days[-1], directory=directory)
+
+
+def presence(name, top_n=10, start=None, end=None, key=KEY, symbols=None, filter=None,
+             directory=None):
+    """Per symbol: days in the top `top_n` ranks, days recorded, and the
+    share, over start..end. `filter` narrows the rows counted (e.g.
+    ds.field("penny") for penny_stocks, which also records larger caps)."""
+    expr = ds.field("rank") <= top_n
+    if symbols is not None:
+        expr &= ds.field(key).isin(list(symbols))
+    if filter is not None:
+        expr &= filter
+    hits = read(name, start, end, columns=[key, "rank"], filter=expr, directory=directory)
+    days = len(dates(name, start, end, directory))
+    counts = hits.groupby(key, observed=True).agg(days=("date", "nunique"),
+                                                  best_rank=("rank", "min"),
+                                                  last_seen=("date", "max"))
+    counts["share"] = counts["days"] / max(days, 1)
+    counts.attrs["days_recorded"] = days
+    return counts.sort_values(["days", "best_rank"], ascending=[False, True])
+
+
+def history(name, value, start=None, end=None, key=KEY, directory=None):
+    """Dates × symbols matrix of one column (e.g. rank or price)"""
+    frame = read(name, start, end, columns=[key, value], directory=directory)
+    return frame.pivot_table(index="date", columns=key, values=value, aggfunc="last", observed=True)
+
+
+# -------------------------------
+# 3. Benchmark / CLI
+# -------------------------------
+def benchmark(days=252, symbols=500, seed=0):
+    rng = np.random.default_rng(seed)
+    days_index = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=days)
+    names = np.array([f"S{i}" for i in range(symbols)])
+    pct = rng.normal(0, 3, (days, symbols))
+    order = np.argsort(-pct, axis=1)
+    frame = pd.DataFrame({
+        "date": np.repeat(days_index, symbols),
+        "symbol": names[order].ravel(),
+        "last": rng.uniform(1, 500, days * symbols),
+        "pct_change": np.take_along_axis(pct, order, axis=1).ravel(),
+    })
+    root = tempfile.mkdtemp(prefix="snapshots-")
+    try:
+        t0 = time.perf_counter()
+        backfill("bench", frame, directory=root)
+        t1 = time.perf_counter()
+        append("bench", frame.loc[frame["date"] == days_index[-1]].drop(columns="date"),
+               date=days_index[-1], directory=root)
+        t2 = time.perf_counter()
+        counts = presence("bench", top_n=10, start=days_index[0], symbols=["S1"], directory=root)
+        t3 = time.perf_counter()
+        ranks = history("bench", "rank", start=days_index[-21], directory=root)
+        t4 = time.perf_counter()
+        size = sum(os.path.getsize(os.path.join(d, f)) for d, _, fs in os.walk(root) for f in fs)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    print(f"{days} days × {symbols} symbols: backfill {t1 - t0:.2f}s, {size / 2**20:.1f} MB on disk")
+    print(f"append one run: {(t2 - t1) * 1000:.1f} ms")
+    print(f"top-10 presence of S1 over {counts.attrs['days_recorded']} days: "
+          f"{int(counts['days'].sum())} days in {(t3 - t2) * 1000:.1f} ms")
+    print(f"20-day rank matrix {ranks.shape}: {(t4 - t3) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query the report snapshot store")
+    parser.add_argument("name", nargs="?")
+    parser.add_argument("--symbol", action="append")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--dir", default=SNAPSHOT_DIR)
+    parser.add_argument("--bench", type=int, metavar="DAYS", default=0)
+    args = parser.parse_args()
+
+    if args.bench:
+        benchmark(args.bench)
+    elif args.name:
+        start = pd.Timestamp.today().normalize() - pd.Timedelta(days=args.days)
+        t0 = time.perf_counter()
+        counts = presence(args.name, args.top, start=start, symbols=args.symbol, directory=args.dir)
+        print(f"{args.name}: top {args.top} over {counts.attrs['days_recorded']} recorded days "
+              f"since {start.date()} ({(time.perf_counter() - t0) * 1000:.1f} ms)")
+        print(counts.head(30).to_string())
+    else:
+        for name in sorted(os.listdir(args.dir)) if os.path.isdir(args.dir) else []:
+            days = dates(name, directory=args.dir)
+            print(f"{name}: {len(dataset(name, args.dir).files)} files, {len(days)} days"
+                  + (f" ({days[0].date()} – {days[-1].date()})" if len(days) else ""))
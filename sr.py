@@ -14,6 +14,16 @@ from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, Tabl
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 
+import pdf_compact
+import rl_charts
+import snapshot_store
+import snapshot_diff
+import report_export
+import run_trace
+
+# Stage timings and counters for this run (see run_trace.py)
+run_trace.start("top_winners_losers")
+
 # -----------------------------
 # 1. Define sample tickers
 # -----------------------------
@@ -24,37 +34,63 @@ tickers = [
 ]
 
 # -----------------------------
-# 2. Fetch last 2 days of prices
+# 2. Fetch last month of prices (last 2 days for the change, all for the sparkline)
 # -----------------------------
 data = []
+closes = {}
 for ticker in tickers:
     try:
         t = yf.Ticker(ticker)
-        hist = t.history(period="2d")
+        hist = run_trace.fetch(ticker, t.history, period="1mo")
         if len(hist) < 2:
             continue
+        closes[ticker] = hist['Close'].tolist()
         prev_close = hist['Close'].iloc[-2]
         last_close = hist['Close'].iloc[-1]
         change = last_close - prev_close
         pct_change = (change / prev_close) * 100
-        data.append([ticker, f"${last_close:.2f}", f"{change:+.2f}", f"{pct_change:+.2f}%"])
+        data.append([ticker, float(last_close), float(change), float(pct_change)])
     except Exception:
         continue
 
 # -----------------------------
 # 3. Create DataFrame
 # -----------------------------
-df = pd.DataFrame(data, columns=["Ticker","Last Price","Change","% Change"])
-top_winners = df.sort_values("% Change", ascending=False).head(10)
-top_losers  = df.sort_values("% Change").head(10)
+with run_trace.span("transform", "rank", rows=len(data)):
+    universe = pd.DataFrame(data, columns=["symbol", "last", "change", "pct_change"])
+    universe = universe.sort_values("pct_change", ascending=False, kind="stable")
+    # Whole universe, best to worst: rank 1 is the top winner (see snapshot_store.py)
+    snapshot_store.record("winners_losers", universe)
+
+def display(table):
+    return pd.DataFrame({"Ticker": table["symbol"],
+                         "Last Price": [f"${x:.2f}" for x in table["last"]],
+                         "Change": [f"{x:+.2f}" for x in table["change"]],
+                         "% Change": [f"{x:+.2f}%" for x in table["pct_change"]]})
+
+top_winners = display(universe.head(10))
+top_losers  = display(universe.iloc[::-1].head(10))
+
+# Changes since the last stored run: top-10 entries/exits and rank moves (see snapshot_diff.py)
+with run_trace.span("transform", "diff"):
+    prior, since = snapshot_diff.previous("winners_losers")
+    changes = snapshot_diff.summary(snapshot_diff.compare(universe, prior, top_n=10), top_n=10,
+                                    label="top 10 winners")
+    changes += snapshot_diff.summary(snapshot_diff.compare(universe.iloc[::-1], prior.iloc[::-1], top_n=10),
+                                     top_n=10, movers=0, label="top 10 losers")
+
+# One-month trend per row, drawn as a vector sparkline (see rl_charts.py)
+def with_trend(table):
+    return table.assign(Trend=[rl_charts.sparkline(closes.get(t, [])) for t in table["Ticker"]])
 
 # -----------------------------
 # 4. Export to PDF
 # -----------------------------
-def export_pdf(winners, losers, filename="Top_Winners_Losers.pdf"):
+def export_pdf(winners, losers, changes=(), since=None, filename="Top_Winners_Losers.pdf"):
     doc = SimpleDocTemplate(filename, pagesize=LETTER,
                             rightMargin=0.75*inch, leftMargin=0.75*inch,
-                            topMargin=1*inch, bottomMargin=0.75*inch)
+                            topMargin=1*inch, bottomMargin=0.75*inch,
+                            **pdf_compact.reportlab_options())
     styles = getSampleStyleSheet()
     story = []
 
@@ -73,11 +109,12 @@ def export_pdf(winners, losers, filename="Top_Winners_Losers.pdf"):
         story.append(Spacer(1, 0.1*inch))
         header = [[Paragraph(f"<b>{c}</b>", styles['Normal']) for c in df.columns]]
         data_table = header + df.values.tolist()
-        table = Table(data_table, hAlign='CENTER', colWidths=[1.2*inch,1.2*inch,1.2*inch,1.2*inch])
+        table = Table(data_table, hAlign='CENTER', colWidths=[1.2*inch,1.2*inch,1.2*inch,1.2*inch,1.1*inch])
         style_cmds = [
             ('BACKGROUND', (0,0), (-1,0), header_bg),
             ('TEXTCOLOR', (0,0), (-1,0), colors.white),
             ('ALIGN', (0,0), (-1,-1), 'CENTER'),
+            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
             ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
         ]
         # Alternate row colors
@@ -89,8 +126,13 @@ def export_pdf(winners, losers, filename="Top_Winners_Losers.pdf"):
         story.append(Spacer(1, 0.25*inch))
 
     # Add winners & losers
-    add_table(top_winners, "Top 10 Winners", header_bg=colors.HexColor("#228B22"))
-    add_table(top_losers, "Top 10 Losers", header_bg=colors.HexColor("#8B0000"))
+    add_table(with_trend(top_winners), "Top 10 Winners", header_bg=colors.HexColor("#228B22"))
+    add_table(with_trend(top_losers), "Top 10 Losers", header_bg=colors.HexColor("#8B0000"))
+
+    # Day-over-day changes
+    story.append(Paragraph("Changes", styles['Heading2']))
+    story.append(Spacer(1, 0.1*inch))
+    story.append(snapshot_diff.changes_table(changes, since, width=5.9*inch))
 
     # Footer
     footer_style = ParagraphStyle('Footer', parent=styles['Normal'], fontSize=9,
@@ -102,10 +144,13 @@ def export_pdf(winners, losers, filename="Top_Winners_Losers.pdf"):
     story.append(footer)
 
     # Build PDF
-    doc.build(story)
+    with pdf_compact.output(filename):
+        doc.build(story)
     print(f"PDF report saved as → {filename}")
 
 # -----------------------------
 # 5. Run PDF export
 # -----------------------------
-export_pdf(top_winners, top_losers)
+export_pdf(top_winners, top_losers, changes, since)
+# Typed table, best to worst, with REPORT_EXPORT=arrow,parquet,ndjson (see report_export.py)
+report_export.export("top_winners_losers", {"universe": universe})
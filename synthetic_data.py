@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+"""
+Synthetic Datasets at Any Scale
+Seeded, vectorized generators for the three workloads, in the shapes the
+report scripts read, so every code path can be exercised offline at
+production size (same seed → same data):
+
+- market   OHLCV for N symbols: geometric random walks from $0.5 to $500,
+           heavy-tailed volume across symbols (a few names trade most of
+           the shares), volume that rises with the size of the move, a
+           U-shaped intraday profile, indices (^...) without volume;
+           option chains priced with Black-Scholes on a volatility smile,
+           open interest and volume concentrated at the money
+- snap     SNAP issuance for N areas × M periods: 53 states, or counties
+           spread over them, as a wide USDA export (State[, County],
+           FY-2019 Issuance, ...) or long monthly rows (State, County,
+           Month, Issuance); both are what dd.py ingests via SNAP_SOURCE
+- cars     registration records (Model, Month, Region), one car per row,
+           over a catalog of Chinese/English model strings in the style of
+           car_sales_report.py ("小米 SU7 (Xiaomi)", "Model Y (Tesla)",
+           bare "海豹06"), Zipf-skewed so a few models dominate
+
+Arrays are drawn in one pass per field; strings are built once per
+distinct value and broadcast through categorical codes.
+
+Plugging in:
+  python synthetic_data.py snap FY19-21.csv --areas 3000
+  SNAP_SOURCE=FY19-21.csv python dd.py
+  python synthetic_data.py cars registrations.parquet --rows 10000000
+  CAR_SALES_SOURCE=registrations.parquet python car_sales_report.py
+  python synthetic_data.py market market_data --symbols 10000
+  python bench.py --run cl.py --fixtures market_data    # offline yfinance replay
+"""
+
+import os
+import json
+import time
+import zlib
+import argparse
+
+import numpy as np
+import pandas as pd
+
+FIELDS = ["Open", "High", "Low", "Close", "Volume"]
+MARKET_TZ = "America/New_York"
+SESSION_MINUTES = 390
+TRADING_DAYS = 252
+
+STATES = (
+    "Alabama", "Alaska", "Arizona", "Arkansas", "California", "Colorado", "Connecticut", "Delaware",
+    "District of Columbia", "Florida", "Georgia", "Guam", "Hawaii", "Idaho", "Illinois", "Indiana",
+    "Iowa", "Kansas", "Kentucky", "Louisiana", "Maine", "Maryland", "Massachusetts", "Michigan",
+    "Minnesota", "Mississippi", "Missouri", "Montana", "Nebraska", "Nevada", "New Hampshire",
+    "New Jersey", "New Mexico", "New York", "North Carolina", "North Dakota", "Ohio", "Oklahoma",
+    "Oregon", "Pennsylvania", "Rhode Island", "South Carolina", "South Dakota", "Tennessee", "Texas",
+    "Utah", "Vermont", "Virginia", "Virgin Islands", "Washington", "West Virginia", "Wisconsin",
+    "Wyoming",
+)
+
+# (Chinese name, English name); either may be missing, as in real exports
+MODELS = (
+    ("", "Model Y (Tesla)"), ("", "Model 3 (Tesla)"), ("星愿", "Xingyuan"), ("小米 YU7", "Xiaomi"),
+    ("小米 SU7", "Xiaomi"), ("海狮06", "Haishi06"), ("元UP", "Yuan UP"), ("海豚", "Haitun / Dolphin"),
+    ("海豹06", "Haibao06"), ("海鸥", "Seagull"), ("秦L", "Qin L"), ("秦PLUS 新能源", "Qin PLUS NEV"),
+    ("宝马3系", "BMW 3 Series"), ("宝马5系", "BMW 5 Series"), ("途观L", "Tiguan L"),
+    ("问界M8", "Wenjie M8"), ("问界M9", "Wenjie M9"), ("小鹏 MONA M03", "Xpeng"), ("小鹏 P7+", "Xpeng"),
+    ("凯美瑞", "Camry"), ("奔驰 C级", "Mercedes C-Class"), ("奔驰 E级", "Mercedes E-Class"),
+    ("宏光 MINI EV", "Hongguang MINI EV"), ("零跑 B01", "Leapmotor B01"), ("零跑 C10", "Leapmotor C10"),
+    ("特斯拉 Model Y", ""), ("卡罗拉", "Corolla"), ("思域", "Civic"), ("", "ID.4"), ("理想L6", "Li L6"),
+)
+TRIMS = ("", " Pro", " Max", " Ultra", " 长续航", " 四驱", " DM-i", " EV", " 2025款", " 智驾版")
+REGIONS = ("广东", "浙江", "江苏", "上海", "北京", "山东", "四川", "河南", "湖北", "福建",
+           "湖南", "安徽", "河北", "重庆", "天津", "陕西", "辽宁", "云南", "广西", "江西")
+
+
+def seed_of(name):
+    """Stable per-name seed (crc32), so one symbol's data never depends on the others"""
+    return zlib.crc32(str(name).encode())
+
+
+def safe_name(symbol):
+    """File name for a symbol (^GSPC → _GSPC, GC=F → GC_F)"""
+    return "".join(c if c.isalnum() or c in "-_" else "_" for c in symbol)
+
+
+def _rng(seed):
+    return seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+
+
+# -------------------------------
+# 1. Market data
+# -------------------------------
+def symbols(n):
+    """n distinct ticker-like symbols: AAAA, AAAB, ..."""
+    codes = np.arange(n)
+    letters = np.array(list("ABCDEFGHIJKLMNOPQRSTUVWXYZ"))
+    width = max(4, int(np.ceil(np.log(max(n, 2)) / np.log(26))))
+    digits = np.stack([(codes // 26 ** p) % 26 for p in range(width - 1, -1, -1)], axis=1)
+    return ["".join(row) for row in letters[digits]]
+
+
+def _walk(steps, n, rng, vol, start=None):
+    """steps × n price paths, their per-step returns and the start prices"""
+    start = 10 ** rng.uniform(-0.3, 2.7, n) if start is None else np.asarray(start, dtype=float)
+    returns = rng.normal(0, 1, (steps, n)) * vol
+    return start * np.exp(np.cumsum(returns, axis=0)), returns, start
+
+
+def _ohlcv(close, returns, start, vol, rng, liquidity, profile=None, no_volume=None):
+    """(steps, n, 5) OHLCV from closes: opens at the previous close, highs
+    and lows around the bar, volume ~ liquidity × profile × (1 + |move|)"""
+    steps, n = close.shape
+    opens = np.vstack([start, close[:-1]])
+    wiggle = np.abs(rng.normal(0, 0.5, (steps, n))) * vol * close
+    surprise = np.abs(returns) / vol
+    volume = liquidity * rng.lognormal(-0.045, 0.3, (steps, n)) * (0.6 + 0.4 * surprise)
+    if profile is not None:
+        volume *= profile[:, None]
+    volume = volume.round()
+    if no_volume is not None:
+        volume[:, no_volume] = 0
+    return np.stack([opens, np.maximum(opens, close) + wiggle, np.minimum(opens, close) - wiggle,
+                     close, volume], axis=2)
+
+
+def _wide(values, index, names):
+    """yf.download(group_by="ticker") layout: (symbol, field) columns"""
+    steps, n, _ = values.shape
+    # Two blocks (float prices, int64 volume) instead of a per-column cast
+    prices = pd.DataFrame(values[:, :, :4].reshape(steps, n * 4), index=index,
+                          columns=pd.MultiIndex.from_product([names, FIELDS[:4]]))
+    volume = pd.DataFrame(values[:, :, 4].astype("int64"), index=index,
+                          columns=pd.MultiIndex.from_product([names, FIELDS[4:]]))
+    return pd.concat([prices, volume], axis=1).reindex(columns=pd.MultiIndex.from_product([names, FIELDS]))
+
+
+def daily_bars(names, days=TRADING_DAYS, seed=0, end=None, start_prices=None):
+    """Daily OHLCV for `names` (list, or a count), yf.download(group_by="ticker")-shaped.
+    Crypto (*-USD) trades every calendar day, so it gets 7/5 as many rows."""
+    names = symbols(names) if isinstance(names, int) else list(names)
+    rng = _rng(seed)
+    end = pd.Timestamp.today().normalize() if end is None else pd.Timestamp(end)
+    crypto = bool(names) and all(s.endswith("-USD") for s in names)
+    steps = int(days * 7 / 5) if crypto else days
+    index = pd.date_range(end=end, periods=steps, freq="D" if crypto else "B", name="Date")
+    n = len(names)
+    vol = rng.uniform(0.01, 0.05, n)
+    close, returns, start = _walk(steps, n, rng, vol, start_prices)
+    # Heavy-tailed liquidity: the median name trades ~1M shares a day, the top ones 100x that
+    liquidity = rng.lognormal(14, 1.5, n)
+    values = _ohlcv(close, returns, start, vol, rng, liquidity,
+                    no_volume=[s.startswith("^") for s in names])
+    return _wide(values, index, names)
+
+
+def minute_bars(names, seed=0, day=None, minutes=SESSION_MINUTES, start_prices=None):
+    """One regular session of 1-minute bars (yf.download(interval="1m",
+    group_by="ticker") layout, ET timestamps), volume U-shaped over the day"""
+    names = symbols(names) if isinstance(names, int) else list(names)
+    rng = _rng(seed)
+    day = pd.Timestamp.today().normalize() if day is None else pd.Timestamp(day).normalize()
+    open_time = pd.Timestamp(day.date()).tz_localize(MARKET_TZ) + pd.Timedelta(hours=9, minutes=30)
+    index = pd.date_range(open_time, periods=minutes, freq="min", name="Datetime")
+    n = len(names)
+    vol = rng.uniform(0.0005, 0.002, n)
+    close, returns, start = _walk(minutes, n, rng, vol, start_prices)
+    t = np.linspace(-1, 1, minutes)
+    profile = 1 + 2 * t ** 2
+    liquidity = rng.lognormal(14, 1.5, n) / minutes / profile.mean()
+    values = _ohlcv(close, returns, start, vol, rng, liquidity, profile,
+                    no_volume=[s.startswith("^") for s in names])
+    return _wide(values, index, names)
+
+
+def expiries(count=4, today=None):
+    """The next `count` Friday expiries as YYYY-MM-DD strings"""
+    today = pd.Timestamp.today().normalize() if today is None else pd.Timestamp(today).normalize()
+    first = today + pd.Timedelta(days=(4 - today.dayofweek) % 7 or 7)
+    return [str((first + pd.Timedelta(weeks=w)).date()) for w in range(count)]
+
+
+def option_chains(names, spots, expiry_dates, strikes=21, seed=0):
+    """Store-shaped chains (option_store.COLUMNS, contractSymbol index):
+    `strikes` calls and puts from 80% to 120% of spot per symbol and expiry,
+    priced at an implied vol with a smile and term structure"""
+    import options_analytics
+    rng = _rng(seed)
+    names = np.asarray(names, dtype=object)
+    spots = np.asarray(spots, dtype=float)
+    n, e = len(names), len(expiry_dates)
+    base_vol = rng.uniform(0.2, 0.6, n)
+    liquidity = rng.lognormal(6, 1.5, n)                     # contracts of open interest at the money
+    T = np.maximum(options_analytics.years_to_expiry(pd.Series(pd.to_datetime(expiry_dates))), 1 / 365)
+    # symbol × expiry × strike grids
+    k = np.round(spots[:, None, None] * np.linspace(0.8, 1.2, strikes)[None, None, :], 2) \
+        * np.ones((1, e, 1))
+    moneyness = np.log(k / spots[:, None, None])
+    iv = base_vol[:, None, None] * (1 + 2.5 * moneyness ** 2 - 0.3 * moneyness) \
+        * (1 + 0.1 / np.sqrt(T * 52))[None, :, None]
+    t_grid = np.broadcast_to(T[None, :, None], k.shape)
+    atm = np.exp(-np.abs(moneyness) / 0.05)                  # activity decays away from the money
+    near = np.exp(-T * 8)[None, :, None]                     # and with time to expiry
+    size = k.size
+    stamp = [pd.Timestamp(d).strftime("%y%m%d") for d in expiry_dates]
+    roots = np.repeat(names, e * strikes)
+    stamps = np.tile(np.repeat(stamp, strikes), n)
+    fetched = pd.Timestamp.now(tz="UTC")
+    frames = []
+    for option_type, is_call, skew in (("Call", True, 1.0), ("Put", False, 0.8)):
+        price = np.maximum(options_analytics.bs_price(spots[:, None, None], k, t_grid, iv, is_call), 0.01)
+        oi = (liquidity[:, None, None] * atm * near * skew * rng.lognormal(0, 0.5, k.shape)).round()
+        volume = (oi * rng.uniform(0.05, 0.6, k.shape)).round()
+        spread = np.maximum(0.01, price * rng.uniform(0.01, 0.06, k.shape))
+        strike_code = np.char.zfill((k.ravel() * 1000).round().astype("int64").astype(str), 8)
+        contract = (roots + stamps + ("C" if is_call else "P")).astype(str)
+        frames.append(pd.DataFrame({
+            "contractSymbol": np.char.add(contract, strike_code),
+            "underlying": roots, "type": option_type,
+            "expiry": pd.to_datetime(np.tile(np.repeat(expiry_dates, strikes), n)),
+            "strike": k.ravel(), "lastPrice": price.ravel().round(2),
+            "bid": np.maximum(price - spread / 2, 0).ravel().round(2),
+            "ask": (price + spread / 2).ravel().round(2),
+            "volume": volume.ravel(), "openInterest": oi.ravel().astype("int64"),
+            "impliedVolatility": iv.ravel(), "spot": np.repeat(spots, e * strikes),
+            "lastTradeDate": fetched - pd.to_timedelta(rng.integers(0, 3600, size), unit="s"),
+            "fetched": fetched,
+        }))
+    chains = pd.concat(frames, ignore_index=True)
+    chains["underlying"] = chains["underlying"].astype("category")
+    chains["type"] = pd.Categorical(chains["type"], categories=["Call", "Put"])
+    return chains.set_index("contractSymbol")
+
+
+def single_history(symbol, days=TRADING_DAYS, end=None):
+    """One symbol's daily bars (Date index, OHLCV columns), seeded by its name"""
+    return daily_bars([symbol], days, seed_of(symbol), end)[symbol]
+
+
+def single_minutes(symbol, day=None, last=None):
+    """One symbol's session of minute bars, continuing from `last` when given"""
+    return minute_bars([symbol], seed_of(symbol), day, start_prices=None if last is None else [last])[symbol]
+
+
+def write_market(directory, names, days=TRADING_DAYS, option_symbols=100, strikes=21, seed=0):
+    """Market data for `names` as a replay fixture directory (the layout
+    bench.py --record writes): history/, minute/, calls/, puts/ Parquet per
+    symbol plus meta.json. Chains for the first `option_symbols` names, one
+    expiry each (the layout holds one chain per symbol)."""
+    names = symbols(names) if isinstance(names, int) else list(names)
+    for kind in ("history", "minute", "calls", "puts"):
+        os.makedirs(os.path.join(directory, kind), exist_ok=True)
+    daily = daily_bars(names, days, seed)
+    last = daily.xs("Close", axis=1, level=1).iloc[-1]
+    minute = minute_bars(names, seed + 1, start_prices=last.to_numpy())
+    for sym in names:
+        name = safe_name(sym)
+        daily[sym].to_parquet(os.path.join(directory, "history", name + ".parquet"))
+        minute[sym].to_parquet(os.path.join(directory, "minute", name + ".parquet"))
+    dates = expiries(1)
+    optioned = names[:option_symbols]
+    chains = option_chains(optioned, last[optioned].to_numpy(), dates, strikes, seed + 2).reset_index()
+    for sym, chain in chains.groupby("underlying", observed=True):
+        for option_type, kind in (("Call", "calls"), ("Put", "puts")):
+            part = chain[chain["type"] == option_type].drop(columns=["underlying", "type", "expiry", "spot",
+                                                                     "fetched"])
+            part.reset_index(drop=True).to_parquet(os.path.join(directory, kind, safe_name(sym) + ".parquet"))
+    meta = {"recorded": "synthetic", "seed": seed, "last_session": str(daily.index[-1].date()),
+            "info": {s: {"longName": f"{s} Inc", "previousClose": float(p)}
+                     for s, p in daily.xs("Close", axis=1, level=1).iloc[-2].items()},
+            "options": {s: dates for s in optioned}}
+    with open(os.path.join(directory, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=1)
+    return directory
+
+
+# -------------------------------
+# 2. SNAP issuance
+# -------------------------------
+def snap_issuance(areas=53, periods=3, monthly=False, seed=0, last_year=2021):
+    """Issuance for `areas` areas × `periods` periods.
+    areas <= 53: one row per state; more: counties spread over the 53
+    states (bigger states get more counties). Annual (default): wide
+    USDA columns "FY-2019 Issuance", ...; monthly: long rows (State,
+    County, Month, Issuance) for the `periods` months up to September of
+    `last_year` (the end of that fiscal year)."""
+    rng = _rng(seed)
+    # State programs: lognormal sizes around $1-2B a year
+    state_size = rng.lognormal(21, 1.0, len(STATES))
+    if areas <= len(STATES):
+        state = np.arange(areas)
+        size = state_size[:areas]
+    else:
+        state = np.concatenate([np.arange(len(STATES)),
+                                rng.choice(len(STATES), areas - len(STATES), p=state_size / state_size.sum())])
+        share = rng.lognormal(0, 1.2, areas)
+        size = state_size[state] * share / np.bincount(state, share)[state]
+    county = None if areas <= len(STATES) else _county_names(state, rng)
+
+    steps = periods
+    trend = rng.normal(0.25 if not monthly else 0.02, 0.12 if not monthly else 0.01, (steps, 1)) \
+        + rng.normal(0, 0.03 if not monthly else 0.005, (steps, len(STATES)))[:, state]
+    trend[0] = 0
+    area_noise = rng.normal(0, 0.05 if not monthly else 0.02, (steps, areas))
+    issuance = size * np.exp(np.cumsum(trend + area_noise, axis=0))     # steps × areas
+    if monthly:
+        issuance = issuance / 12
+
+    frame = pd.DataFrame({"State": pd.Categorical.from_codes(state, STATES)})
+    if county is not None:
+        frame["County"] = county
+    if not monthly:
+        for i, year in enumerate(range(last_year - periods + 1, last_year + 1)):
+            frame[f"FY-{year} Issuance"] = issuance[i].round().astype("int64")
+        return frame
+    months = pd.period_range(end=pd.Period(f"{last_year}-09", "M"), periods=periods, freq="M").astype(str)
+    long = frame.loc[np.tile(np.arange(areas), periods)].reset_index(drop=True)
+    long["Month"] = pd.Categorical(np.repeat(months, areas), categories=months)
+    long["Issuance"] = issuance.ravel().round().astype("int64")
+    return long
+
+
+def _county_names(state, rng):
+    """'<State> County 001', numbered within each state"""
+    order = np.argsort(state, kind="stable")
+    counts = np.bincount(state, minlength=len(STATES))
+    number = np.empty(len(state), dtype="int64")
+    number[order] = np.arange(len(state)) - np.repeat(np.cumsum(counts) - counts, counts)
+    labels = np.char.add("County ", np.char.zfill((number + 1).astype(str), 3))
+    return pd.Categorical(labels)
+
+
+# -------------------------------
+# 3. Car registrations
+# -------------------------------
+def car_models(count=500, seed=0):
+    """`count` distinct model strings: series × trim, written the ways
+    registrations spell them ("中文 (English)", Chinese only, English only)"""
+    rng = _rng(seed)
+    base = np.array([f"{zh} ({en})" if zh and en else (zh or en) for zh, en in MODELS], dtype=object)
+    zh_only = np.array([zh or en for zh, en in MODELS], dtype=object)
+    i = np.arange(count)
+    series, trim = i % len(MODELS), (i // len(MODELS)) % len(TRIMS)
+    generation = i // (len(MODELS) * len(TRIMS))
+    spelled = np.where(rng.random(count) < 0.2, zh_only[series], base[series])
+    names = [f"{s}{t}" if g == 0 else f"{s}{t} {g + 1}代" for s, t, g in
+             zip(spelled, np.asarray(TRIMS, dtype=object)[trim], generation)]
+    return list(dict.fromkeys(names))
+
+
+def car_registrations(rows, models=500, months=12, seed=0, end="2025-12"):
+    """`rows` registration records (Model, Month, Region), one car each.
+    Model popularity is Zipf-like; sales of every model grow month on month."""
+    rng = _rng(seed)
+    catalog = car_models(models, seed)
+    # Zipf-like weights: shuffle which names are popular so it isn't catalog order
+    weights = 1 / np.arange(1, len(catalog) + 1) ** 1.1
+    weights = rng.permutation(weights)
+    labels = pd.period_range(end=pd.Period(end, "M"), periods=months, freq="M").astype(str)
+    month_weights = np.linspace(1, 1.5, months)
+    region_weights = 1 / np.arange(1, len(REGIONS) + 1) ** 0.7
+    pick = lambda w, n: rng.choice(len(w), n, p=w / w.sum())
+    return pd.DataFrame({
+        "Model": pd.Categorical.from_codes(pick(weights, rows), categories=catalog),
+        "Month": pd.Categorical.from_codes(pick(month_weights, rows), categories=list(labels)),
+        "Region": pd.Categorical.from_codes(pick(region_weights, rows), categories=list(REGIONS)),
+    })
+
+
+# -------------------------------
+# 4. Writers / CLI
+# -------------------------------
+def write(frame, path):
+    """Write `frame` by extension: .parquet, .csv or .tsv/.txt (tab-separated)"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = path + ".tmp"
+    if path.lower().endswith((".parquet", ".pq")):
+        frame.to_parquet(tmp, index=False)
+    elif path.lower().endswith((".tsv", ".txt")):
+        frame.to_csv(tmp, sep="\t", index=False)
+    elif path.lower().endswith(".csv"):
+        frame.to_csv(tmp, index=False)
+    else:
+        raise ValueError(f"unknown output format for {path} (use .parquet, .csv or .tsv)")
+    os.replace(tmp, path)
+    return path
+
+
+def snap_file(path, areas=53, periods=3, monthly=False, seed=0):
+    return write(snap_issuance(areas, periods, monthly, seed), path)
+
+
+def car_file(path, rows, models=500, months=12, seed=0):
+    return write(car_registrations(rows, models, months, seed), path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write synthetic market, SNAP or car-sales data")
+    parser.add_argument("kind", choices=["market", "snap", "cars"])
+    parser.add_argument("output", help="directory (market) or .parquet/.csv/.tsv file")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--symbols", type=int, default=1000, help="market: symbols")
+    parser.add_argument("--days", type=int, default=TRADING_DAYS, help="market: daily bars per symbol")
+    parser.add_argument("--option-symbols", type=int, default=100, help="market: symbols with chains")
+    parser.add_argument("--areas", type=int, default=53, help="snap: states (<=53) or counties")
+    parser.add_argument("--periods", type=int, default=3,
+                        help="snap: fiscal years up to FY2021, or months with --monthly "
+                             "(dd.py reads FY2019-FY2021: 36 months)")
+    parser.add_argument("--monthly", action="store_true", help="snap: long monthly rows")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="cars: registration records")
+    parser.add_argument("--models", type=int, default=500, help="cars: distinct model strings")
+    parser.add_argument("--months", type=int, default=12, help="cars: months covered")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    if args.kind == "market":
+        write_market(args.output, args.symbols, args.days, args.option_symbols, seed=args.seed)
+        what, use = f"{args.symbols:,} symbols × {args.days} days", f"python bench.py --run cl.py --fixtures {args.output}"
+    elif args.kind == "snap":
+        snap_file(args.output, args.areas, args.periods, args.monthly, args.seed)
+        what = f"{args.areas:,} areas × {args.periods} {'months' if args.monthly else 'fiscal years'}"
+        use = f"SNAP_SOURCE={args.output} python dd.py"
+    else:
+        car_file(args.output, args.rows, args.models, args.months, args.seed)
+        what, use = f"{args.rows:,} registrations", f"CAR_SALES_SOURCE={args.output} python car_sales_report.py"
+    print(f"✓ {what} → {args.output} in {time.perf_counter() - t0:.1f}s")
+    print(f"  {use}")
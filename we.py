@@ -4,12 +4,14 @@ Daily Market Report → Colorful PDF
 Indices: Dow Jones, S&P 500, NASDAQ-100
 Most-active stocks (by volume)
 Most-active options (proxy via high-volume underlyings)
+Typed tables exported with REPORT_EXPORT=arrow,parquet,ndjson (see report_export.py)
 
 PDF generated with reportlab – fully styled, easy to read.
 """
 
 import yfinance as yf
 import pandas as pd
+import numpy as np
 from datetime import datetime
 import warnings
 warnings.filterwarnings("ignore")
@@ -26,17 +28,31 @@ from reportlab.lib.enums import TA_CENTER, TA_RIGHT, TA_LEFT
 import requests
 from bs4 import BeautifulSoup
 
+import pdf_compact
+import rl_charts
+import indicators
+import options_analytics
+import option_store
+import intraday
+import report_export
+import run_trace
+
+# Typed tables behind the PDF, by name: exported with REPORT_EXPORT (see report_export.py)
+TABLES = {}
+
 # ----------------------------------------------------------------------
 # Helper: fetch most-active stocks from Yahoo Finance "Most Active" page
 # ----------------------------------------------------------------------
 def scrape_most_active_stocks(limit=10):
     url = "https://finance.yahoo.com/most-active"
     headers = {"User-Agent": "Mozilla/5.0"}
-    resp = requests.get(url, headers=headers, timeout=15)
+    resp = run_trace.fetch("most-active page", requests.get, url, headers=headers, timeout=15,
+                           source="yahoo-web")
     resp.raise_for_status()
-    soup = BeautifulSoup(resp.text, "lxml")
-    table = soup.find("table")
-    df = pd.read_html(str(table))[0]
+    with run_trace.span("parse", "most-active page"):
+        soup = BeautifulSoup(resp.text, "lxml")
+        table = soup.find("table")
+        df = pd.read_html(str(table))[0]
 
     # Keep only needed columns
     df = df[['Symbol', 'Name', 'Price (Intraday)', 'Change', '% Change', 'Volume (Intraday)']]
@@ -48,57 +64,84 @@ def scrape_most_active_stocks(limit=10):
 # 1. Indices
 # ----------------------------------------------------------------------
 def get_index_data():
+    """Index quotes plus a technical-indicator table from the same history"""
     indices = {
         '^DJI': 'Dow Jones Industrial Average',
         '^GSPC': 'S&P 500',
         '^NDX': 'NASDAQ 100'
     }
     rows = []
+    history = {}
     for symbol, name in indices.items():
         try:
             t = yf.Ticker(symbol)
-            hist = t.history(period="2d")
+            # Enough bars to warm up the 20-day indicator windows
+            hist = run_trace.fetch(symbol, t.history, period="3mo")
             if len(hist) < 2:
                 continue
+            history[name] = hist
             close = hist['Close'].iloc[-1]
             prev = hist['Close'].iloc[-2]
             change = close - prev
-            pct = change / prev * 100
-            vol = hist['Volume'].iloc[-1]
-            rows.append([name, f"{close:,.2f}", f"{change:+,.2f}", f"{pct:+.2f}%", f"{vol:,.0f}"])
+            rows.append([symbol, name, close, change, change / prev * 100, hist['Volume'].iloc[-1]])
         except Exception:
-            rows.append([name, "N/A", "N/A", "N/A", "N/A"])
-    return pd.DataFrame(rows, columns=['Index', 'Close', 'Change', '% Change', 'Volume'])
+            rows.append([symbol, name, np.nan, np.nan, np.nan, np.nan])
+    typed = pd.DataFrame(rows, columns=['symbol', 'name', 'close', 'change', 'pct_change', 'volume'])
+    TABLES['indices'] = typed
+    fmt = lambda values, spec, suffix="": ["N/A" if pd.isna(v) else format(v, spec) + suffix for v in values]
+    df = pd.DataFrame({'Index': typed['name'], 'Close': fmt(typed['close'], ",.2f"),
+                       'Change': fmt(typed['change'], "+,.2f"),
+                       '% Change': fmt(typed['pct_change'], "+.2f", "%"),
+                       'Volume': fmt(typed['volume'], ",.0f")})
+    return df, get_index_technicals(history)
+
+def get_index_technicals(history):
+    """SMA/EMA/RSI/Bollinger/ATR per index; rolling state persists between runs (see indicators.py)"""
+    if not history:
+        return pd.DataFrame(columns=indicators.REPORT_COLUMNS)
+    with run_trace.span("transform", "index technicals"):
+        latest = indicators.history_technicals(history, state_path=indicators.INDEX_STATE)
+    TABLES['technicals'] = latest.rename_axis("index")
+    return indicators.report_rows(latest)
 
 # ----------------------------------------------------------------------
 # 2. Most-active options (proxy)
 # ----------------------------------------------------------------------
 def get_most_active_options(limit=10):
     high_opt = ['SPY', 'QQQ', 'IWM', 'AAPL', 'TSLA', 'NVDA', 'AMD', 'AMC', 'META', 'AMZN']
-    all_opts = []
-    for sym in high_opt:
-        try:
-            t = yf.Ticker(sym)
-            expirations = t.options
-            if not expirations:
-                continue
-            exp = expirations[0]                     # nearest expiry
-            chain = t.option_chain(exp)
-            calls = chain.calls.copy()
-            puts = chain.puts.copy()
-            calls['type'] = 'Call'
-            puts['type'] = 'Put'
-            df = pd.concat([calls, puts], ignore_index=True)
-            df['underlying'] = sym
-            df['totalVolume'] = df['volume'].fillna(0).astype(int)
-            all_opts.append(df)
-        except Exception:
-            continue
-    if not all_opts:
-        return pd.DataFrame()
-    full = pd.concat(all_opts, ignore_index=True)
-    top = full.sort_values('totalVolume', ascending=False).head(limit)
-    return top[['underlying', 'strike', 'type', 'lastPrice', 'totalVolume', 'contractSymbol']]
+    # Nearest expiry per symbol through the columnar store (see option_store.py);
+    # contracts whose quotes did not change are not rewritten
+    store = option_store.OptionStore()
+    store.refresh(high_opt, max_expiries=1)
+    store.save()
+    chains = store.nearest(high_opt).reset_index()
+    if chains.empty:
+        return pd.DataFrame(), pd.DataFrame()
+    # IV and Greeks for every contract in one vectorized pass (see options_analytics.py)
+    with run_trace.span("transform", "option analytics", rows=len(chains)):
+        full = options_analytics.chain_analytics(chains)
+        ratios = options_analytics.put_call_ratios(full)
+    top = full.nlargest(limit, 'volume').rename(columns={'volume': 'totalVolume'})
+    TABLES['options'] = top[['contractSymbol', 'underlying', 'type', 'strike', 'lastPrice', 'totalVolume',
+                             'iv', 'delta']]
+    TABLES['put_call'] = ratios
+    return (top[['underlying', 'strike', 'type', 'lastPrice', 'totalVolume', 'iv', 'delta', 'contractSymbol']],
+            options_analytics.put_call_table(ratios))
+
+# ----------------------------------------------------------------------
+# Intraday (minute bars)
+# ----------------------------------------------------------------------
+def get_intraday_data(symbols, names=None):
+    """Last, session VWAP, range and 1h change from 1-minute bars, with a
+    5-minute sparkline per row (see intraday.py)"""
+    bars = intraday.fetch_minute_bars(symbols)
+    if bars.empty:
+        return pd.DataFrame(columns=intraday.REPORT_COLUMNS + ['Trend'])
+    intraday.save_bars(bars)
+    table, df = intraday.report_rows(bars, symbols, names)
+    TABLES['intraday'] = table
+    df['Trend'] = rl_charts.sparkline_cells(intraday.close_matrix(bars, "5min"), list(df.index))
+    return df.reset_index(drop=True)
 
 # ----------------------------------------------------------------------
 # PDF Builder
@@ -106,7 +149,8 @@ def get_most_active_options(limit=10):
 def build_pdf(filename="Market_Report.pdf"):
     doc = SimpleDocTemplate(filename, pagesize=LETTER,
                             rightMargin=0.75*inch, leftMargin=0.75*inch,
-                            topMargin=1*inch, bottomMargin=0.75*inch)
+                            topMargin=1*inch, bottomMargin=0.75*inch,
+                            **pdf_compact.reportlab_options())
     styles = getSampleStyleSheet()
     story = []
 
@@ -131,7 +175,10 @@ def build_pdf(filename="Market_Report.pdf"):
 
         # Header row
         header = [[Paragraph(f"<b>{c}</b>", styles['Normal']) for c in df.columns]]
-        data = header + df.values.tolist()
+        # Cells wrapped in <para> markup are rendered as Paragraphs, not literal text
+        body = [[Paragraph(v, styles['Normal']) if isinstance(v, str) and v.startswith("<para") else v
+                 for v in row] for row in df.values.tolist()]
+        data = header + body
 
         t = Table(data, colWidths=col_widths)
         style_cmds = [
@@ -153,7 +200,7 @@ def build_pdf(filename="Market_Report.pdf"):
         story.append(Spacer(1, 0.25*inch))
 
     # ---- 1. Indices ----
-    idx_df = get_index_data()
+    idx_df, tech_df = get_index_data()
     idx_df_styled = idx_df.copy()
     # Right-align numeric columns
     for col in ['Close', 'Change', '% Change', 'Volume']:
@@ -162,6 +209,14 @@ def build_pdf(filename="Market_Report.pdf"):
               "Major US Indices",
               col_widths=[3.2*inch, 1.1*inch, 1*inch, 0.9*inch, 1.2*inch],
               header_bg=colors.HexColor("#003366"))
+    if not tech_df.empty:
+        tech_styled = tech_df.copy()
+        for col in tech_styled.columns[1:]:
+            tech_styled[col] = tech_styled[col].apply(lambda x: f"<para align=right>{x}</para>")
+        add_table(tech_styled,
+                  "Index Technicals (Daily)",
+                  col_widths=[2.2*inch] + [0.87*inch] * 6,
+                  header_bg=colors.HexColor("#003366"))
 
     # ---- 2. Most-active stocks ----
     try:
@@ -177,8 +232,8 @@ def build_pdf(filename="Market_Report.pdf"):
         for s in fallback:
             try:
                 t = yf.Ticker(s)
-                info = t.info
-                hist = t.history(period="1d")
+                info = run_trace.fetch(f"{s} info", lambda: t.info)
+                hist = run_trace.fetch(s, t.history, period="1d")
                 if hist.empty: continue
                 close = hist['Close'].iloc[-1]
                 vol = hist['Volume'].iloc[-1]
@@ -192,32 +247,67 @@ def build_pdf(filename="Market_Report.pdf"):
         stocks_df = pd.DataFrame(rows,
                     columns=['Symbol','Name','Price','Change','% Change','Volume'])
 
+    TABLES['most_active'] = pd.DataFrame({
+        'symbol': stocks_df['Symbol'].astype(str).to_numpy(),
+        'name': stocks_df['Name'].astype(str).to_numpy(),
+        'price': report_export.parse_numbers(stocks_df['Price']),
+        'change': report_export.parse_numbers(stocks_df['Change']),
+        'pct_change': report_export.parse_numbers(stocks_df['% Change']),
+        'volume': report_export.parse_numbers(stocks_df['Volume']),
+    })
+
     # Style numeric columns
     stock_styled = stocks_df.copy()
     for col in ['Price','Change','% Change','Volume']:
         stock_styled[col] = stock_styled[col].apply(lambda x: f"<para align=right>{x}</para>")
+    # One-month vector sparkline per row (see rl_charts.py)
+    closes = intraday.daily_closes(stocks_df['Symbol'])
+    with run_trace.span("chart", "sparklines"):
+        stock_styled['Trend'] = rl_charts.sparkline_cells(closes, stocks_df['Symbol'])
     add_table(stock_styled,
               "Top 12 Most Actively Traded Stocks (by Volume)",
-              col_widths=[0.8*inch, 2.4*inch, 0.9*inch, 0.9*inch, 0.9*inch, 1.2*inch],
+              col_widths=[0.7*inch, 1.7*inch, 0.8*inch, 0.8*inch, 0.8*inch, 1.1*inch, 1.1*inch],
               header_bg=colors.HexColor("#006400"))
 
+    # ---- 2b. Intraday ----
+    intra_df = get_intraday_data(['^DJI', '^GSPC', '^NDX'] + list(stocks_df['Symbol']),
+                                 names={'^DJI': 'Dow Jones', '^GSPC': 'S&P 500', '^NDX': 'NASDAQ 100'})
+    if not intra_df.empty:
+        intra_styled = intra_df.copy()
+        for col in ['Last', 'VWAP', 'vs VWAP', 'Day Range', '1h Chg']:
+            intra_styled[col] = intra_styled[col].apply(lambda x: f"<para align=right>{x}</para>")
+        add_table(intra_styled,
+                  "Intraday: Session VWAP, Range & 1h Change (1-min bars)",
+                  col_widths=[1.1*inch, 0.9*inch, 0.9*inch, 0.8*inch, 1.5*inch, 0.7*inch, 1.1*inch],
+                  header_bg=colors.HexColor("#4B0082"))
+
     # ---- 3. Most-active options ----
-    opt_df = get_most_active_options(limit=12)
+    opt_df, pc_df = get_most_active_options(limit=12)
     if not opt_df.empty:
         opt_disp = opt_df.copy()
         opt_disp['Strike'] = opt_disp['strike'].apply(lambda x: f"{x:.2f}")
         opt_disp['Last'] = opt_disp['lastPrice'].apply(lambda x: f"{x:.2f}")
         opt_disp['Volume'] = opt_disp['totalVolume'].apply(lambda x: f"{x:,.0f}")
+        opt_disp['IV'] = opt_disp['iv'].apply(lambda x: "N/A" if pd.isna(x) else f"{x:.1%}")
+        opt_disp['Delta'] = opt_disp['delta'].apply(lambda x: "N/A" if pd.isna(x) else f"{x:+.2f}")
         opt_disp['Contract'] = opt_disp['contractSymbol'].str[-15:]
-        opt_disp = opt_disp[['underlying','Strike','type','Last','Volume','Contract']]
-        opt_disp.columns = ['Underlying','Strike','Type','Last','Volume','Contract']
+        opt_disp = opt_disp[['underlying','Strike','type','Last','Volume','IV','Delta','Contract']]
+        opt_disp.columns = ['Underlying','Strike','Type','Last','Volume','IV','Delta','Contract']
 
-        for col in ['Strike','Last','Volume']:
+        for col in ['Strike','Last','Volume','IV','Delta']:
             opt_disp[col] = opt_disp[col].apply(lambda x: f"<para align=right>{x}</para>")
 
         add_table(opt_disp,
                   "Top 12 Most Active Options Contracts (Nearest Expiry)",
-                  col_widths=[0.9*inch, 0.8*inch, 0.6*inch, 0.7*inch, 1*inch, 2*inch],
+                  col_widths=[0.9*inch, 0.8*inch, 0.6*inch, 0.7*inch, 0.9*inch, 0.7*inch, 0.6*inch, 1.6*inch],
+                  header_bg=colors.HexColor("#8B0000"))
+
+        pc_disp = pc_df.copy()
+        for col in pc_disp.columns[1:]:
+            pc_disp[col] = pc_disp[col].apply(lambda x: f"<para align=right>{x}</para>")
+        add_table(pc_disp,
+                  "Put/Call Ratios & ATM Implied Volatility (Nearest Expiry)",
+                  col_widths=[0.9*inch, 0.9*inch, 0.9*inch, 0.7*inch, 0.95*inch, 0.95*inch, 0.7*inch, 0.8*inch],
                   header_bg=colors.HexColor("#8B0000"))
     else:
         story.append(Paragraph("<b>Options data unavailable at this time.</b>", styles['Normal']))
@@ -239,9 +329,13 @@ def build_pdf(filename="Market_Report.pdf"):
     story.append(footer)
 
     # ---- Build PDF ----
-    doc.build(story)
+    with pdf_compact.output(filename):
+        doc.build(story)
     print(f"PDF report saved as → {filename}")
+    report_export.export("daily_market_report", TABLES)
 
 # ----------------------------------------------------------------------
 if __name__ == "__main__":
+    # Stage timings and counters for this run (see run_trace.py)
+    run_trace.start("daily_market_report")
     build_pdf("Daily_Market_Report.pdf")